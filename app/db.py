@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 Base = declarative_base()
@@ -20,10 +20,29 @@ Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
 
 DATABASE_URL = _sqlite_url_from_path(DB_PATH)
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # needed for SQLite with FastAPI
-)
+
+def _configure_sqlite(dbapi_connection, _):
+    cursor = dbapi_connection.cursor()
+    # Only takes effect on a new database; existing ones need a one-off VACUUM.
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    # WAL lets readers (including online snapshots) run alongside the collector's writes.
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def create_sqlite_engine(db_path: str) -> Engine:
+    """Engine for the database at `db_path`, with the app's connection pragmas."""
+    sqlite_engine = create_engine(
+        _sqlite_url_from_path(db_path),
+        connect_args={"check_same_thread": False},  # needed for SQLite with FastAPI
+    )
+    event.listen(sqlite_engine, "connect", _configure_sqlite)
+    return sqlite_engine
+
+
+engine = create_sqlite_engine(DB_PATH)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
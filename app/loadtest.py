@@ -0,0 +1,514 @@
+"""
+API load test against a seeded database.
+
+Seeds a SQLite database, starts uvicorn on it, runs a stub collector that writes
+candles and status rows in a separate process, and drives concurrent HTTP
+clients against the read endpoints. Prints latency percentiles, error and
+lock-timeout rates and throughput per endpoint, and writes them as JSON so runs
+can be compared:
+
+    python -m app.loadtest --symbols 5000 --history-days 90 --clients 32 \\
+        --output data/loadtest/baseline.json
+    python -m app.loadtest ... --compare data/loadtest/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing as mp
+import os
+import platform
+import queue
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EXCHANGES = ("NYSE", "NASDAQ", "XETRA", "LSE", "TSE", "HKEX", "ASX", "TSX")
+# Endpoint name -> weight in the request mix.
+DEFAULT_MIX = {"symbols": 4, "status": 4, "summary": 1, "dashboard": 1}
+LOCKED_DETAIL = "database is locked"
+
+_TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+@dataclass(frozen=True)
+class LoadTestConfig:
+    db_path: str
+    symbols: int = 1000
+    history_days: int = 30
+    clients: int = 16
+    duration_seconds: float = 30.0
+    warmup_seconds: float = 2.0
+    writer_batch: int = 20
+    writer_pause_ms: float = 10.0
+    writer_failure_rate: float = 0.1
+    mix: dict[str, int] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    seed: int = 0
+    label: str = ""
+
+
+@dataclass
+class EndpointStats:
+    requests: int
+    throughput_rps: float
+    error_rate: float
+    lock_timeout_rate: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+@dataclass
+class WriterStats:
+    writes: int
+    failures: int
+    lock_timeouts: int
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+def percentiles(latencies_ms: list[float]) -> dict[str, float]:
+    if not latencies_ms:
+        return {"p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    values = np.asarray(latencies_ms)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p90_ms": round(float(p90), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def seed_database(config: LoadTestConfig, *, now: datetime | None = None) -> int:
+    """
+    Create the schema and fill it with `config.symbols` symbols spread over
+    `EXCHANGES`, hourly candles for `config.history_days` and status rows (some
+    failing, some stale). Returns the number of candles written.
+    """
+
+    # A dedicated engine: app.db may already be bound to another DB_PATH.
+    from app.db import Base, create_sqlite_engine
+    import app.models  # noqa: F401
+
+    Path(config.db_path).parent.mkdir(parents=True, exist_ok=True)
+    engine = create_sqlite_engine(config.db_path)
+    Base.metadata.create_all(bind=engine)
+    now = (now or datetime.now(tz=UTC)).replace(minute=0, second=0, microsecond=0)
+    rng = random.Random(config.seed)
+    hours = config.history_days * 24
+    stamps = [(now - timedelta(hours=hours - i)).strftime(_TS_FORMAT) for i in range(hours)]
+
+    raw = engine.raw_connection()
+    try:
+        conn: sqlite3.Connection = raw.driver_connection
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO symbols (id, symbol, exchange, timezone, is_active) VALUES (?, ?, ?, ?, ?)",
+            (
+                (i, f"SYM{i:06d}", EXCHANGES[i % len(EXCHANGES)], "UTC", rng.random() > 0.05)
+                for i in range(1, config.symbols + 1)
+            ),
+        )
+        statuses = []
+        for i in range(1, config.symbols + 1):
+            failures = rng.choice((0, 0, 0, 0, 1, 3)) if rng.random() < 0.2 else 0
+            last_success = now - timedelta(hours=rng.randint(0, 48))
+            statuses.append(
+                (
+                    i,
+                    now.strftime(_TS_FORMAT),
+                    last_success.strftime(_TS_FORMAT),
+                    "seeded failure" if failures else None,
+                    failures,
+                    now.strftime(_TS_FORMAT),
+                )
+            )
+        conn.executemany(
+            "INSERT INTO collector_status (symbol_id, last_attempt_at_utc, last_success_at_utc, "
+            "last_error, consecutive_failures, updated_at_utc) VALUES (?, ?, ?, ?, ?, ?)",
+            statuses,
+        )
+
+        def candles():
+            for symbol_id in range(1, config.symbols + 1):
+                price = 10.0 + rng.random() * 90.0
+                for ts in stamps:
+                    price *= 1.0 + rng.gauss(0.0, 0.01)
+                    yield (symbol_id, "1h", ts, price, price, price, price, 1000.0, 0)
+
+        conn.executemany(
+            "INSERT INTO candles (symbol_id, interval, ts_utc, open, high, low, close, volume, "
+            "revision) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            candles(),
+        )
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+    finally:
+        raw.close()
+        engine.dispose()
+    return config.symbols * hours
+
+
+def _stub_writer(config: LoadTestConfig, stop, results) -> None:
+    """
+    Stub collector: for batches of symbols, the same attempt / upsert / status
+    commits as a sequential collector tick, without calling a provider.
+    """
+
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import Session
+
+    from app.db import create_sqlite_engine
+    from app.models import Symbol
+    from app.services.ingest import upsert_candles
+    from app.services.status import record_attempt, record_failure, record_success
+
+    rng = random.Random(config.seed + 1)
+    latencies: list[float] = []
+    failures = lock_timeouts = 0
+    engine = create_sqlite_engine(config.db_path)
+    db = Session(engine, autoflush=False)
+    try:
+        symbols = db.query(Symbol).order_by(Symbol.id).all()
+        next_ts = datetime.now(tz=UTC).replace(minute=0, second=0, microsecond=0)
+        cursor = 0
+        while not stop.is_set():
+            batch = symbols[cursor : cursor + config.writer_batch]
+            cursor += config.writer_batch
+            if cursor >= len(symbols):
+                cursor = 0
+                next_ts += timedelta(hours=1)
+            for symbol in batch:
+                t0 = time.perf_counter()
+                try:
+                    record_attempt(db, symbol.id)
+                    if rng.random() < config.writer_failure_rate:
+                        raise RuntimeError("stub provider error")
+                    price = 10.0 + rng.random() * 90.0
+                    row = {"ts_utc": next_ts, "open": price, "high": price, "low": price}
+                    upsert_candles(db, symbol, "1h", [{**row, "close": price, "volume": 1.0}])
+                    record_success(db, symbol.id)
+                except OperationalError as e:
+                    db.rollback()
+                    if LOCKED_DETAIL in str(e):
+                        lock_timeouts += 1
+                    else:
+                        failures += 1
+                except Exception as e:
+                    record_failure(db, symbol.id, e)
+                    failures += 1
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+            if config.writer_pause_ms > 0:
+                time.sleep(config.writer_pause_ms / 1000.0)
+    finally:
+        db.close()
+        engine.dispose()
+        stats = percentiles(latencies)
+        results.put(
+            WriterStats(
+                writes=len(latencies),
+                failures=failures,
+                lock_timeouts=lock_timeouts,
+                p50_ms=stats["p50_ms"],
+                p99_ms=stats["p99_ms"],
+                max_ms=stats["max_ms"],
+            )
+        )
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(config: LoadTestConfig, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DB_PATH": config.db_path,
+        # Keep background jobs from skewing the measurement.
+        "MAINTENANCE_EVERY_HOURS": "0",
+        "SNAPSHOT_EVERY_HOURS": "0",
+    }
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+
+
+async def _wait_ready(client: httpx.AsyncClient, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + 30.0
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            if (await client.get("/api/collector/summary")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not become ready")
+
+
+def _request_for(name: str, rng: random.Random) -> tuple[str, dict]:
+    """Paths and filters a dashboard or API consumer would send."""
+
+    if name == "symbols":
+        params = {"limit": rng.choice((50, 100, 500))}
+        if rng.random() < 0.5:
+            params["exchange"] = rng.choice(EXCHANGES)
+        return "/api/symbols", params
+    if name == "status":
+        params = {"sort": rng.choice(("id", "failures", "stale")), "limit": 100}
+        if rng.random() < 0.3:
+            params["errors"] = "true"
+        return "/api/collector/status", params
+    if name == "summary":
+        return "/api/collector/summary", {}
+    if name == "dashboard":
+        return "/", {"sort": rng.choice(("id", "failures", "stale"))}
+    raise ValueError(f"unknown endpoint {name!r}")
+
+
+async def _client_loop(
+    client: httpx.AsyncClient,
+    names: list[str],
+    weights: list[int],
+    rng: random.Random,
+    measure_from: float,
+    stop_at: float,
+    samples: dict[str, list],
+) -> None:
+    # Closed loop: each client sends its next request when the previous one returns.
+    while time.perf_counter() < stop_at:
+        name = rng.choices(names, weights)[0]
+        path, params = _request_for(name, rng)
+        t0 = time.perf_counter()
+        try:
+            r = await client.get(path, params=params)
+            if r.status_code == 503 and LOCKED_DETAIL in r.text:
+                outcome = "lock_timeout"
+            elif r.status_code >= 400:
+                outcome = "error"
+            else:
+                outcome = "ok"
+        except httpx.HTTPError:
+            outcome = "error"
+        if t0 >= measure_from:
+            samples[name].append(((time.perf_counter() - t0) * 1000.0, outcome))
+
+
+def summarize(samples: dict[str, list], duration_seconds: float) -> dict[str, EndpointStats]:
+    """Per-endpoint stats plus an `all` row over every request."""
+
+    result = {}
+    everything = [s for rows in samples.values() for s in rows]
+    for name, rows in [*samples.items(), ("all", everything)]:
+        n = len(rows)
+        errors = sum(1 for _, outcome in rows if outcome == "error")
+        locked = sum(1 for _, outcome in rows if outcome == "lock_timeout")
+        result[name] = EndpointStats(
+            requests=n,
+            throughput_rps=round(n / duration_seconds, 2) if duration_seconds > 0 else 0.0,
+            error_rate=round(errors / n, 4) if n else 0.0,
+            lock_timeout_rate=round(locked / n, 4) if n else 0.0,
+            **percentiles([latency for latency, _ in rows]),
+        )
+    return result
+
+
+async def _drive(config: LoadTestConfig, base_url: str, process: subprocess.Popen) -> dict:
+    names = list(config.mix)
+    weights = [config.mix[n] for n in names]
+    samples: dict[str, list] = {name: [] for name in names}
+    limits = httpx.Limits(max_connections=config.clients, max_keepalive_connections=config.clients)
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0, limits=limits) as client:
+        await _wait_ready(client, process)
+        start = time.perf_counter()
+        measure_from = start + config.warmup_seconds
+        stop_at = measure_from + config.duration_seconds
+        await asyncio.gather(
+            *(
+                _client_loop(
+                    client,
+                    names,
+                    weights,
+                    random.Random(config.seed + 100 + i),
+                    measure_from,
+                    stop_at,
+                    samples,
+                )
+                for i in range(config.clients)
+            )
+        )
+    return summarize(samples, config.duration_seconds)
+
+
+def run_load_test(config: LoadTestConfig, *, reuse: bool = False) -> dict:
+    """Seed (unless `reuse` and the database exists), then measure; returns the report."""
+
+    db = Path(config.db_path)
+    if not (reuse and db.exists()):
+        for path in (db, db.with_name(db.name + "-wal"), db.with_name(db.name + "-shm")):
+            path.unlink(missing_ok=True)
+        t0 = time.perf_counter()
+        candles = seed_database(config)
+        logger.info("seeded %s candles in %.1fs", candles, time.perf_counter() - t0)
+
+    port = _free_port()
+    server = _start_server(config, port)
+    ctx = mp.get_context("spawn")
+    stop, results = ctx.Event(), ctx.Queue()
+    writer = ctx.Process(target=_stub_writer, args=(config, stop, results), daemon=True)
+    try:
+        writer.start()
+        endpoints = asyncio.run(_drive(config, f"http://127.0.0.1:{port}", server))
+    finally:
+        stop.set()
+        try:
+            writer_stats = results.get(timeout=30) if writer.pid is not None else None
+        except queue.Empty:
+            writer_stats = None
+        writer.join(timeout=10)
+        server.terminate()
+        server.wait(timeout=10)
+
+    return {
+        "label": config.label,
+        "started_at_utc": datetime.now(tz=UTC).isoformat(),
+        "config": asdict(config),
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "cpus": os.cpu_count(),
+            "platform": platform.platform(),
+        },
+        "endpoints": {name: asdict(stats) for name, stats in endpoints.items()},
+        "writer": asdict(writer_stats) if writer_stats is not None else None,
+    }
+
+
+def compare(report: dict, baseline: dict) -> list[str]:
+    """One line per endpoint with p50/p99/throughput relative to `baseline`."""
+
+    def delta(new: float, old: float) -> str:
+        if not old:
+            return "   n/a"
+        return f"{(new - old) / old * 100:+6.1f}%"
+
+    lines = []
+    for name, stats in report["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(name)
+        if old is None:
+            continue
+        lines.append(
+            f"{name:<10} p50 {delta(stats['p50_ms'], old['p50_ms'])}  "
+            f"p99 {delta(stats['p99_ms'], old['p99_ms'])}  "
+            f"rps {delta(stats['throughput_rps'], old['throughput_rps'])}"
+        )
+    return lines
+
+
+def format_report(report: dict) -> list[str]:
+    lines = [
+        f"{'endpoint':<10} {'requests':>8} {'rps':>8} {'p50 ms':>8} {'p90 ms':>8} "
+        f"{'p99 ms':>8} {'max ms':>8} {'errors':>7} {'locked':>7}"
+    ]
+    for name, s in report["endpoints"].items():
+        lines.append(
+            f"{name:<10} {s['requests']:>8} {s['throughput_rps']:>8.1f} {s['p50_ms']:>8.1f} "
+            f"{s['p90_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['max_ms']:>8.1f} "
+            f"{s['error_rate']:>7.2%} {s['lock_timeout_rate']:>7.2%}"
+        )
+    w = report["writer"]
+    if w is not None:
+        lines.append(
+            f"writer: {w['writes']} writes, p50 {w['p50_ms']:.1f} ms, p99 {w['p99_ms']:.1f} ms, "
+            f"{w['lock_timeouts']} lock timeouts, {w['failures']} failures"
+        )
+    return lines
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.loadtest", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", default="data/loadtest/loadtest.db", help="database to seed and serve")
+    parser.add_argument("--reuse", action="store_true", help="skip seeding if --db exists")
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--history-days", type=int, default=30)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds first")
+    parser.add_argument("--writer-batch", type=int, default=20, help="symbols per writer batch")
+    parser.add_argument("--writer-pause-ms", type=float, default=10.0)
+    parser.add_argument(
+        "--mix",
+        default=",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+        help="endpoint weights, e.g. symbols=4,status=4,summary=1,dashboard=1",
+    )
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    mix = {}
+    for part in args.mix.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight or 1)
+
+    config = LoadTestConfig(
+        db_path=str(Path(args.db).resolve()),
+        symbols=args.symbols,
+        history_days=args.history_days,
+        clients=args.clients,
+        duration_seconds=args.duration,
+        warmup_seconds=args.warmup,
+        writer_batch=args.writer_batch,
+        writer_pause_ms=args.writer_pause_ms,
+        mix=mix,
+        label=args.label,
+    )
+    Path(config.db_path).parent.mkdir(parents=True, exist_ok=True)
+    report = run_load_test(config, reuse=args.reuse)
+
+    print("\n".join(format_report(report)))
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        print(f"\ncompared with {baseline.get('label') or args.compare}:")
+        print("\n".join(compare(report, baseline)))
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
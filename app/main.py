@@ -1,20 +1,49 @@
+import asyncio
 from contextlib import asynccontextmanager
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Annotated
+from urllib.parse import urlencode
 
-from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
 from pydantic import BaseModel, ConfigDict, Field
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import Session
-from starlette.responses import HTMLResponse, JSONResponse
+from starlette.responses import HTMLResponse, JSONResponse, Response
 from starlette.staticfiles import StaticFiles
 from starlette.templating import Jinja2Templates
 
 from app.db import Base, engine, get_db
 import app.models  # noqa: F401
 from app.models import CollectorStatus, Symbol
+from app.services.analytics import (
+    ANALYTICS,
+    DEFAULT_LIMIT as ANALYTICS_DEFAULT_LIMIT,
+    MAX_LIMIT as ANALYTICS_MAX_LIMIT,
+    AnalyticsUnavailableError,
+    UnknownAnalyticsQueryError,
+)
+from app.services.coldstore import read_candles
 from app.services.collector import COLLECTOR
-from app.services.intervals import InvalidIntervalError
+from app.services.gaps import find_gaps, repair_gaps
+from app.services.indicators import (
+    INDICATOR_CACHE,
+    InvalidIndicatorError,
+    indicator_points,
+)
+from app.services.intervals import InvalidIntervalError, validate_interval
+from app.services.listing import (
+    DEFAULT_PAGE_SIZE,
+    InvalidCursorError,
+    InvalidSortError,
+    SymbolFilters,
+    list_symbol_status,
+    status_counts,
+)
+from app.services.maintenance import MAINTENANCE, MaintenanceBusyError
+from app.services.matrix import InvalidMatrixFieldError, UnknownSymbolsError, get_matrix_npz
+from app.services.refresh import REFRESHER, RefreshResult
+from app.services.runlog import RUN_LOG, InvalidBucketError, query_runs, run_stats
+from app.services.tracing import TRACE_BUFFER_SIZE, TRACER
 
 
 templates = Jinja2Templates(directory="app/web/templates")
@@ -24,8 +53,16 @@ templates = Jinja2Templates(directory="app/web/templates")
 async def lifespan(_: FastAPI):
     Base.metadata.create_all(bind=engine)
     _ensure_symbols_columns()
+    _ensure_candles_columns()
+    _ensure_listing_indexes()
+    _ensure_collector_status_rows()
+    await RUN_LOG.start()
+    await MAINTENANCE.start()
     yield
     await COLLECTOR.stop()
+    await MAINTENANCE.stop()
+    await RUN_LOG.stop()
+    ANALYTICS.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -40,6 +77,76 @@ def invalid_interval_handler(_: Request, exc: InvalidIntervalError):
     )
 
 
+@app.exception_handler(InvalidMatrixFieldError)
+def invalid_matrix_field_handler(_: Request, exc: InvalidMatrixFieldError):
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"detail": str(exc)},
+    )
+
+
+@app.exception_handler(OperationalError)
+def operational_error_handler(_: Request, exc: OperationalError):
+    # A writer held the lock past busy_timeout: tell clients to retry instead of a bare 500.
+    if "database is locked" in str(exc.orig):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": "database is locked"},
+            headers={"Retry-After": "1"},
+        )
+    raise exc
+
+
+@app.exception_handler(InvalidIndicatorError)
+def invalid_indicator_handler(_: Request, exc: InvalidIndicatorError):
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"detail": str(exc)},
+    )
+
+
+@app.exception_handler(InvalidCursorError)
+@app.exception_handler(InvalidSortError)
+@app.exception_handler(InvalidBucketError)
+def invalid_listing_handler(_: Request, exc: ValueError):
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"detail": str(exc)},
+    )
+
+
+@app.exception_handler(MaintenanceBusyError)
+def maintenance_busy_handler(_: Request, exc: MaintenanceBusyError):
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"detail": str(exc)},
+    )
+
+
+@app.exception_handler(AnalyticsUnavailableError)
+def analytics_unavailable_handler(_: Request, exc: AnalyticsUnavailableError):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+    )
+
+
+@app.exception_handler(UnknownAnalyticsQueryError)
+def unknown_analytics_query_handler(_: Request, exc: UnknownAnalyticsQueryError):
+    return JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content={"detail": str(exc)},
+    )
+
+
+@app.exception_handler(UnknownSymbolsError)
+def unknown_symbols_handler(_: Request, exc: UnknownSymbolsError):
+    return JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content={"detail": str(exc)},
+    )
+
+
 class SymbolCreate(BaseModel):
     symbol: str = Field(min_length=1, max_length=64)
     exchange: str | None = Field(default=None, max_length=64)
@@ -69,6 +176,52 @@ def _ensure_symbols_columns() -> None:
             )
 
 
+def _ensure_candles_columns() -> None:
+    with engine.begin() as conn:
+        cols = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(candles)").all()}
+        if "content_hash" not in cols:
+            conn.exec_driver_sql("ALTER TABLE candles ADD COLUMN content_hash VARCHAR(16)")
+        if "revision" not in cols:
+            conn.exec_driver_sql(
+                "ALTER TABLE candles ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"
+            )
+
+
+def _ensure_listing_indexes() -> None:
+    # create_all only adds indexes together with new tables.
+    for table in (Symbol.__table__, CollectorStatus.__table__):
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _ensure_collector_status_rows() -> None:
+    # Status-sorted listings inner-join collector_status; backfill rows for
+    # symbols created before the API started adding them.
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO collector_status (symbol_id, consecutive_failures, updated_at_utc) "
+            "SELECT s.id, 0, CURRENT_TIMESTAMP FROM symbols s "
+            "WHERE NOT EXISTS (SELECT 1 FROM collector_status c WHERE c.symbol_id = s.id)"
+        )
+
+
+def _listing_filters(
+    exchange: str | None,
+    active: bool | None,
+    errors: bool | None,
+) -> SymbolFilters:
+    return SymbolFilters(exchange=exchange or None, active=active, errors=errors)
+
+
+def _form_flag(value: str | None) -> bool | None:
+    # The dashboard filter form submits "" for "all".
+    if not value:
+        return None
+    if value not in ("true", "false"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="expected true or false")
+    return value == "true"
+
+
 @app.post("/api/symbols", response_model=SymbolRead, status_code=status.HTTP_201_CREATED)
 def create_symbol(payload: SymbolCreate, db: Annotated[Session, Depends(get_db)]):
     symbol = Symbol(
@@ -93,8 +246,81 @@ def create_symbol(payload: SymbolCreate, db: Annotated[Session, Depends(get_db)]
 
 
 @app.get("/api/symbols", response_model=list[SymbolRead])
-def list_symbols(db: Annotated[Session, Depends(get_db)]):
-    return db.query(Symbol).order_by(Symbol.id.asc()).all()
+def list_symbols(
+    response: Response,
+    db: Annotated[Session, Depends(get_db)],
+    exchange: str | None = None,
+    active: bool | None = None,
+    errors: bool | None = None,
+    sort: str = "id",
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = DEFAULT_PAGE_SIZE,
+):
+    """
+    One page of symbols; the cursor for the next page is returned in `X-Next-Cursor`.
+    """
+    page = list_symbol_status(
+        db,
+        filters=_listing_filters(exchange, active, errors),
+        sort=sort,
+        cursor=cursor,
+        limit=limit,
+    )
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return [symbol for symbol, _ in page.rows]
+
+
+class RefreshRead(BaseModel):
+    symbol_id: int
+    interval: str
+    rows_written: int
+    refreshed_at_utc: datetime
+    error: str | None = None
+    cached: bool = False
+    conflict: bool = False
+    queued: bool = False
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BulkRefresh(BaseModel):
+    symbol_ids: list[int] = Field(min_length=1, max_length=500)
+    interval: str = "1h"
+
+
+@app.post("/api/symbols/refresh", response_model=list[RefreshRead])
+async def refresh_symbols(payload: BulkRefresh, db: Annotated[Session, Depends(get_db)]):
+    validate_interval(payload.interval)
+    symbol_ids = list(dict.fromkeys(payload.symbol_ids))
+    known = {row[0] for row in db.query(Symbol.id).filter(Symbol.id.in_(symbol_ids)).all()}
+    missing = [i for i in symbol_ids if i not in known]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"unknown symbol ids: {missing}",
+        )
+    return await REFRESHER.refresh_many(symbol_ids, payload.interval)
+
+
+@app.post("/api/symbols/{symbol_id}/refresh", response_model=RefreshRead)
+async def refresh_symbol(
+    symbol_id: int,
+    db: Annotated[Session, Depends(get_db)],
+    response: Response,
+    interval: str = "1h",
+):
+    validate_interval(interval)
+    if db.get(Symbol, symbol_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="not found")
+    result: RefreshResult = await REFRESHER.refresh(symbol_id, interval)
+    if result.conflict:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=result.error)
+    if result.error is not None:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=result.error)
+    if result.queued:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return result
 
 
 @app.delete("/api/symbols/{symbol_id}", response_model=SymbolRead)
@@ -107,10 +333,160 @@ def delete_symbol(symbol_id: int, db: Annotated[Session, Depends(get_db)]):
     return symbol
 
 
+class CandleRead(BaseModel):
+    ts_utc: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+@app.get("/api/symbols/{symbol_id}/candles", response_model=list[CandleRead])
+def list_candles(
+    symbol_id: int,
+    db: Annotated[Session, Depends(get_db)],
+    interval: str = "1h",
+    start: datetime | None = None,
+    end: datetime | None = None,
+):
+    validate_interval(interval)
+    if db.get(Symbol, symbol_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="not found")
+    return read_candles(db, symbol_id, interval, start=start, end=end)
+
+
+class GapRead(BaseModel):
+    start_utc: datetime
+    end_utc: datetime
+    missing_candles: int
+
+
+@app.get("/api/symbols/{symbol_id}/gaps", response_model=list[GapRead])
+def list_gaps(
+    symbol_id: int,
+    db: Annotated[Session, Depends(get_db)],
+    interval: str = "1h",
+    lookback_days: Annotated[float, Query(gt=0, le=730)] = 30,
+):
+    """Missing candles between stored ones, excluding known unrepairable ranges."""
+    validate_interval(interval)
+    symbol = db.get(Symbol, symbol_id)
+    if symbol is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="not found")
+    gaps = find_gaps(db, symbol, interval, lookback=timedelta(days=lookback_days))
+    return [
+        GapRead(start_utc=g.start_utc, end_utc=g.end_utc, missing_candles=len(g.missing))
+        for g in gaps
+    ]
+
+
+class GapRepairRequest(BaseModel):
+    symbol_ids: list[int] | None = Field(default=None, max_length=10000)
+    interval: str = "1h"
+    lookback_days: float = Field(default=30, gt=0, le=730)
+
+
+class GapRepairRead(BaseModel):
+    symbols: int
+    gaps: int
+    windows: int
+    rows_written: int
+    unrepairable: int
+    errors: int
+    not_owned: int
+    busy: int
+
+
+@app.post("/api/gaps/repair", response_model=GapRepairRead)
+async def repair_symbol_gaps(payload: GapRepairRequest, db: Annotated[Session, Depends(get_db)]):
+    """
+    Refetch missing candle ranges now (all active symbols unless `symbol_ids` is given).
+
+    Symbols in partitions leased by other workers are skipped, as are series the
+    collector is fetching at the moment.
+    """
+    validate_interval(payload.interval)
+    return await repair_gaps(
+        db,
+        symbol_ids=payload.symbol_ids,
+        interval=payload.interval,
+        provider=COLLECTOR.provider,
+        lookback=timedelta(days=payload.lookback_days),
+        guard=COLLECTOR,
+    )
+
+
+@app.get("/api/matrix")
+def price_matrix(
+    db: Annotated[Session, Depends(get_db)],
+    symbols: str,
+    field: str = "close",
+    interval: str = "1h",
+    start: datetime | None = None,
+    end: datetime | None = None,
+):
+    """
+    Aligned symbols x timestamps matrix as `.npz` with arrays `values`,
+    `symbols` and `timestamps` (UTC epoch seconds).
+    """
+    names = list(dict.fromkeys(s.strip() for s in symbols.split(",") if s.strip()))
+    if not names:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="symbols is required")
+    payload = get_matrix_npz(db, names, field, interval=interval, start=start, end=end)
+    return Response(
+        content=payload,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="matrix_{field}.npz"'},
+    )
+
+
+class IndicatorPoint(BaseModel):
+    ts_utc: datetime
+    value: float | None
+
+
+class IndicatorRead(BaseModel):
+    symbol: str
+    interval: str
+    indicator: str
+    window: int
+    points: list[IndicatorPoint]
+
+
+@app.get("/api/indicators", response_model=IndicatorRead)
+def indicators(
+    db: Annotated[Session, Depends(get_db)],
+    symbol: str,
+    indicator: str,
+    window: int = 20,
+    interval: str = "1h",
+    start: datetime | None = None,
+    end: datetime | None = None,
+):
+    """
+    Rolling `returns`, `volatility` (std of log returns) or `vwap` over `window`
+    bars. Warm-up bars have `value: null`.
+    """
+    row = db.query(Symbol).filter(Symbol.symbol == symbol).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="not found")
+    series = INDICATOR_CACHE.get(db, row.id, interval, indicator, window)
+    return IndicatorRead(
+        symbol=row.symbol,
+        interval=interval,
+        indicator=indicator,
+        window=window,
+        points=indicator_points(series, start=start, end=end),
+    )
+
+
 class CollectorRuntimeStatus(BaseModel):
     is_running: bool
     last_run: datetime | None
     last_error: str | None
+    worker_id: str | None = None
+    partitions: list[int] = []
 
 
 @app.post("/api/collector/start", response_model=CollectorRuntimeStatus)
@@ -138,15 +514,35 @@ class CollectorSymbolStatus(BaseModel):
 
 
 @app.get("/api/collector/status", response_model=list[CollectorSymbolStatus])
-def collector_status(db: Annotated[Session, Depends(get_db)]):
-    rows = (
-        db.query(Symbol, CollectorStatus)
-        .outerjoin(CollectorStatus, CollectorStatus.symbol_id == Symbol.id)
-        .order_by(Symbol.id.asc())
-        .all()
+def collector_status(
+    response: Response,
+    db: Annotated[Session, Depends(get_db)],
+    exchange: str | None = None,
+    active: bool | None = None,
+    errors: bool | None = None,
+    sort: str = "id",
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = DEFAULT_PAGE_SIZE,
+):
+    """
+    One page of per-symbol collector status.
+
+    - Filters: `exchange`, `active`, `errors` (true: failing symbols only)
+    - `sort`: `id`, `failures` (most first) or `stale` (oldest success first)
+    - The cursor for the next page is returned in `X-Next-Cursor`
+    """
+    page = list_symbol_status(
+        db,
+        filters=_listing_filters(exchange, active, errors),
+        sort=sort,
+        cursor=cursor,
+        limit=limit,
     )
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+
     payload: list[CollectorSymbolStatus] = []
-    for symbol, status in rows:
+    for symbol, status in page.rows:
         if status is None:
             payload.append(
                 CollectorSymbolStatus(
@@ -175,15 +571,303 @@ def collector_status(db: Annotated[Session, Depends(get_db)]):
     return payload
 
 
+class StatusSummary(BaseModel):
+    total: int
+    active: int
+    inactive: int
+    failing: int
+    by_exchange: dict[str, int]
+
+
+@app.get("/api/collector/summary", response_model=StatusSummary)
+def collector_summary(db: Annotated[Session, Depends(get_db)]):
+    return status_counts(db)
+
+
+class ExchangeLagRead(BaseModel):
+    exchange: str
+    weight: float
+    samples: int
+    p50_seconds: float | None
+    p99_seconds: float | None
+    max_seconds: float | None
+    backlog: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+@app.get("/api/collector/lag", response_model=list[ExchangeLagRead])
+def collector_lag():
+    """
+    Freshness lag per exchange: seconds from a candle's close until the collector
+    stored it (recent writes), plus work the last tick left for the next one.
+    """
+    return COLLECTOR.lag.snapshot(COLLECTOR.exchange_weights)
+
+
+class CollectorRunRead(BaseModel):
+    id: int
+    symbol_id: int
+    exchange: str
+    interval: str
+    source: str
+    started_at_utc: datetime
+    duration_ms: float
+    rows_written: int
+    outcome: str
+    error: str | None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class RunStatsRead(BaseModel):
+    bucket_start_utc: datetime
+    exchange: str
+    runs: int
+    failures: int
+    rows_written: int
+    avg_duration_ms: float
+    max_duration_ms: float
+
+
+@app.get("/api/collector/runs", response_model=list[CollectorRunRead])
+def collector_runs(
+    response: Response,
+    db: Annotated[Session, Depends(get_db)],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    symbol_id: int | None = None,
+    exchange: str | None = None,
+    outcome: str | None = None,
+    cursor: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = DEFAULT_PAGE_SIZE,
+):
+    """
+    Raw fetch history inside the retention window, newest first.
+
+    The cursor for the next page is returned in `X-Next-Cursor`.
+    """
+    runs = query_runs(
+        db,
+        start=start,
+        end=end,
+        symbol_id=symbol_id,
+        exchange=exchange,
+        outcome=outcome,
+        before_id=cursor,
+        limit=limit,
+    )
+    if len(runs) == limit:
+        response.headers["X-Next-Cursor"] = str(runs[-1].id)
+    return runs
+
+
+@app.get("/api/collector/runs/stats", response_model=list[RunStatsRead])
+def collector_run_stats(
+    db: Annotated[Session, Depends(get_db)],
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exchange: str | None = None,
+    bucket: str = "hour",
+):
+    """
+    Fetch counts, failures and latency per `bucket` (`hour` or `day`) and exchange,
+    covering both raw runs and compacted hourly rollups.
+    """
+    return run_stats(db, start=start, end=end, exchange=exchange, bucket=bucket)
+
+
+class SnapshotRead(BaseModel):
+    path: str
+    started_at_utc: datetime
+    duration_seconds: float
+    pages: int
+    bytes: int
+    steps: int
+    bytes_per_second: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class OptimizeRead(BaseModel):
+    started_at_utc: datetime
+    vacuum_supported: bool
+    freed_pages: int
+    freelist_pages: int
+    vacuum_seconds: float
+    analyze_seconds: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class MaintenanceStatusRead(BaseModel):
+    running: str | None
+    last_snapshot: SnapshotRead | None
+    last_optimize: OptimizeRead | None
+    last_error: str | None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+@app.get("/api/maintenance/status", response_model=MaintenanceStatusRead)
+def maintenance_status():
+    return MAINTENANCE.status()
+
+
+@app.post("/api/maintenance/snapshot", response_model=SnapshotRead)
+async def maintenance_snapshot():
+    """Online backup of the database into `SNAPSHOT_DIR` while the collector keeps writing."""
+    return await asyncio.to_thread(MAINTENANCE.snapshot)
+
+
+@app.post("/api/maintenance/optimize", response_model=OptimizeRead)
+async def maintenance_optimize():
+    """Paced incremental vacuum followed by ANALYZE."""
+    return await asyncio.to_thread(MAINTENANCE.optimize)
+
+
+class AnalyticsSyncRead(BaseModel):
+    full: bool
+    rows_copied: int
+    last_candle_id: int
+    synced_at_utc: datetime
+    duration_seconds: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AnalyticsRead(BaseModel):
+    query: str
+    synced_at_utc: datetime | None
+    elapsed_ms: float
+    rows: list[dict]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+@app.post("/api/analytics/sync", response_model=AnalyticsSyncRead)
+async def analytics_sync(full: bool = False):
+    """Bring the columnar analytics copy up to date (`full=true` rebuilds it)."""
+    return await asyncio.to_thread(ANALYTICS.sync, full=full)
+
+
+@app.get("/api/analytics/{query}", response_model=AnalyticsRead)
+def analytics_query(
+    query: str,
+    interval: str | None = None,
+    exchange: str | None = None,
+    symbol_id: int | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: Annotated[int, Query(ge=1, le=ANALYTICS_MAX_LIMIT)] = ANALYTICS_DEFAULT_LIMIT,
+):
+    """
+    Aggregate queries over the full candle history (`coverage`, `volume`,
+    `cross_section`), answered from the DuckDB copy instead of SQLite.
+    """
+    return ANALYTICS.query(
+        query,
+        interval=interval,
+        exchange=exchange,
+        symbol_id=symbol_id,
+        start=start,
+        end=end,
+        limit=limit,
+    )
+
+
+class TracePhase(BaseModel):
+    name: str
+    count: int
+    total_ms: float
+    max_ms: float
+
+
+class TraceSymbol(BaseModel):
+    symbol: str
+    total_ms: float
+
+
+class TickTraceRead(BaseModel):
+    tick_id: int
+    started_at_utc: datetime
+    duration_ms: float | None
+    phases: list[TracePhase]
+    slowest_symbols: list[TraceSymbol]
+    profile_path: str | None
+
+
+@app.get("/api/debug/traces", response_model=list[TickTraceRead])
+def debug_traces(
+    limit: Annotated[int, Query(ge=1, le=max(1, TRACE_BUFFER_SIZE))] = 10,
+    top: Annotated[int, Query(ge=1, le=1000)] = 10,
+):
+    payload: list[TickTraceRead] = []
+    for trace in TRACER.recent(limit):
+        phases = sorted(trace.phases.items(), key=lambda item: item[1].total_ms, reverse=True)
+        slowest = sorted(trace.symbols.items(), key=lambda item: item[1], reverse=True)[:top]
+        payload.append(
+            TickTraceRead(
+                tick_id=trace.tick_id,
+                started_at_utc=trace.started_at_utc,
+                duration_ms=trace.duration_ms,
+                phases=[
+                    TracePhase(
+                        name=name,
+                        count=stats.count,
+                        total_ms=stats.total_ms,
+                        max_ms=stats.max_ms,
+                    )
+                    for name, stats in phases
+                ],
+                slowest_symbols=[
+                    TraceSymbol(symbol=symbol, total_ms=total_ms) for symbol, total_ms in slowest
+                ],
+                profile_path=trace.profile_path,
+            )
+        )
+    return payload
+
+
+@app.post("/api/debug/profile", status_code=status.HTTP_202_ACCEPTED)
+def debug_profile():
+    TRACER.request_profile()
+    return {"detail": "next collector tick with due work will be profiled"}
+
+
 @app.get("/", response_class=HTMLResponse)
-def dashboard(request: Request, db: Annotated[Session, Depends(get_db)]):
-    symbols = db.query(Symbol).order_by(Symbol.id.asc()).all()
+def dashboard(
+    request: Request,
+    db: Annotated[Session, Depends(get_db)],
+    exchange: str | None = None,
+    active: str | None = None,
+    errors: str | None = None,
+    sort: str = "id",
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 50,
+):
+    filters = _listing_filters(exchange, _form_flag(active), _form_flag(errors))
+    page = list_symbol_status(db, filters=filters, sort=sort, cursor=cursor, limit=limit)
     status_obj = COLLECTOR.status()
+
+    params = {k: v for k, v in request.query_params.items() if k != "cursor"}
+    first_url = f"{request.url.path}?{urlencode(params)}"
+    next_url = None
+    if page.next_cursor:
+        next_url = f"{request.url.path}?{urlencode({**params, 'cursor': page.next_cursor})}"
+
     return templates.TemplateResponse(
         request,
         "index.html",
         {
-            "symbols": symbols,
+            "rows": page.rows,
+            "counts": status_counts(db),
+            "filters": filters,
+            "sort": sort,
+            "limit": limit,
+            "first_url": first_url,
+            "next_url": next_url,
+            "first_page": cursor is None,
             "collector": status_obj,
         },
     )
@@ -7,7 +7,9 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     String,
     UniqueConstraint,
 )
@@ -18,6 +20,10 @@ from app.db import Base
 
 class Symbol(Base):
     __tablename__ = "symbols"
+    __table_args__ = (
+        Index("ix_symbols_exchange_id", "exchange", "id"),
+        Index("ix_symbols_is_active_id", "is_active", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     symbol: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
@@ -34,6 +40,18 @@ class Symbol(Base):
         cascade="all, delete-orphan",
         uselist=False,
     )
+    candle_blocks: Mapped[list["CandleBlock"]] = relationship(
+        back_populates="symbol",
+        cascade="all, delete-orphan",
+    )
+    unrepairable_ranges: Mapped[list["UnrepairableRange"]] = relationship(
+        back_populates="symbol",
+        cascade="all, delete-orphan",
+    )
+    refresh_requests: Mapped[list["RefreshRequest"]] = relationship(
+        back_populates="symbol",
+        cascade="all, delete-orphan",
+    )
 
 
 class Candle(Base):
@@ -59,11 +77,55 @@ class Candle(Base):
     close: Mapped[float] = mapped_column(Float, nullable=False)
     volume: Mapped[float] = mapped_column(Float, nullable=False)
 
+    # Hash of the OHLCV values; re-fetched rows are only rewritten when it changes.
+    content_hash: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    revision: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
     symbol: Mapped["Symbol"] = relationship(back_populates="candles")
 
 
+class CandleBlock(Base):
+    """
+    Compressed cold candles for one (symbol, interval, calendar month).
+
+    The row doubles as the block index: `first_ts_utc`/`last_ts_utc` allow range
+    queries to pick the blocks they need without decoding `payload`
+    (see `app.services.coldstore` for the encoding).
+    """
+
+    __tablename__ = "candle_blocks"
+    __table_args__ = (UniqueConstraint("symbol_id", "interval", "period_start_utc"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    symbol_id: Mapped[int] = mapped_column(ForeignKey("symbols.id"), nullable=False)
+    interval: Mapped[str] = mapped_column(String(3), nullable=False)
+    period_start_utc: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+    )
+    first_ts_utc: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_ts_utc: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    row_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    symbol: Mapped["Symbol"] = relationship(back_populates="candle_blocks")
+
+
 class CollectorStatus(Base):
+    """
+    Per-symbol collector bookkeeping.
+
+    The composite indexes back the keyset-paginated status listing
+    (`app.services.listing`): sorting by failures or staleness and the
+    error-state filter are index scans instead of full-table sorts.
+    """
+
     __tablename__ = "collector_status"
+    __table_args__ = (
+        Index("ix_collector_status_failures", "consecutive_failures", "symbol_id"),
+        Index("ix_collector_status_last_success", "last_success_at_utc", "symbol_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     symbol_id: Mapped[int] = mapped_column(
@@ -92,3 +154,131 @@ class CollectorStatus(Base):
     )
 
     symbol: Mapped["Symbol"] = relationship(back_populates="collector_status")
+
+
+class CollectorWorker(Base):
+    """
+    Heartbeat row for a running collector process.
+
+    Workers whose `last_heartbeat_at_utc` is older than the lease TTL are treated
+    as dead; their shard leases expire and become claimable by live workers.
+    """
+
+    __tablename__ = "collector_workers"
+
+    worker_id: Mapped[str] = mapped_column(String(128), primary_key=True)
+    last_heartbeat_at_utc: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+    )
+
+
+class ShardLease(Base):
+    """
+    Expiring ownership of one symbol partition (`symbol_id % num_partitions`).
+    """
+
+    __tablename__ = "shard_leases"
+
+    partition: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    owner: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    expires_at_utc: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+
+
+class RefreshRequest(Base):
+    """
+    On-demand refresh handed to the worker that owns the symbol's partition.
+
+    Written by the refresh API when another live worker holds the shard lease;
+    the owner fetches the series first thing on its next tick and deletes the row.
+    """
+
+    __tablename__ = "refresh_requests"
+
+    symbol_id: Mapped[int] = mapped_column(ForeignKey("symbols.id"), primary_key=True)
+    interval: Mapped[str] = mapped_column(String(3), primary_key=True)
+    requested_at_utc: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+    )
+
+    symbol: Mapped["Symbol"] = relationship(back_populates="refresh_requests")
+
+
+class CollectorRun(Base):
+    """
+    Append-only log of single fetches (one row per symbol/interval attempt).
+
+    `symbol_id` is deliberately not a foreign key so history survives symbol
+    deletion; `exchange` is copied at write time for per-exchange rollups.
+    Rows older than the retention window are folded into `CollectorRunHourly`.
+    """
+
+    __tablename__ = "collector_runs"
+    __table_args__ = (
+        Index("ix_collector_runs_started", "started_at_utc"),
+        Index("ix_collector_runs_symbol_started", "symbol_id", "started_at_utc"),
+        Index("ix_collector_runs_exchange_started", "exchange", "started_at_utc"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    symbol_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    exchange: Mapped[str] = mapped_column(String(64), nullable=False, default="")
+    interval: Mapped[str] = mapped_column(String(3), nullable=False)
+    source: Mapped[str] = mapped_column(String(16), nullable=False)
+    started_at_utc: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    duration_ms: Mapped[float] = mapped_column(Float, nullable=False)
+    rows_written: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    outcome: Mapped[str] = mapped_column(String(16), nullable=False)
+    error: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+
+
+class CollectorRunHourly(Base):
+    """
+    Compacted `collector_runs`: one row per (hour, exchange).
+
+    `exchange` is "" for symbols without one (NULLs would defeat the unique key).
+    """
+
+    __tablename__ = "collector_runs_hourly"
+    __table_args__ = (UniqueConstraint("hour_start_utc", "exchange"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    hour_start_utc: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    exchange: Mapped[str] = mapped_column(String(64), nullable=False)
+    runs: Mapped[int] = mapped_column(Integer, nullable=False)
+    failures: Mapped[int] = mapped_column(Integer, nullable=False)
+    rows_written: Mapped[int] = mapped_column(Integer, nullable=False)
+    total_duration_ms: Mapped[float] = mapped_column(Float, nullable=False)
+    max_duration_ms: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class UnrepairableRange(Base):
+    """
+    Candle range `[start_utc, end_utc)` the provider could not fill.
+
+    Written by gap repair (`app.services.gaps`) so market closures and ranges
+    beyond the provider's history are not refetched on every run.
+    """
+
+    __tablename__ = "unrepairable_ranges"
+    __table_args__ = (
+        Index("ix_unrepairable_ranges_symbol_start", "symbol_id", "interval", "start_utc"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    symbol_id: Mapped[int] = mapped_column(ForeignKey("symbols.id"), nullable=False)
+    interval: Mapped[str] = mapped_column(String(3), nullable=False)
+    start_utc: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    end_utc: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    reason: Mapped[str] = mapped_column(String(64), nullable=False)
+    recorded_at_utc: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc),
+    )
+
+    symbol: Mapped["Symbol"] = relationship(back_populates="unrepairable_ranges")
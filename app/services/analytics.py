@@ -0,0 +1,443 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.db import engine
+from app.services.coldstore import OHLCV_FIELDS, decode_block
+from app.services.intervals import ALLOWED_INTERVALS, validate_interval
+
+try:
+    import duckdb
+except ImportError:  # optional dependency
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_DB_PATH = os.getenv("ANALYTICS_DB_PATH", "data/analytics.duckdb")
+# A query syncs the copy first when the last sync is older than this.
+ANALYTICS_MAX_STALENESS_SECONDS = float(os.getenv("ANALYTICS_MAX_STALENESS_SECONDS", "300"))
+# Candles this recent are re-copied on every sync to pick up late corrections.
+ANALYTICS_RESYNC_DAYS = float(os.getenv("ANALYTICS_RESYNC_DAYS", "7"))
+ANALYTICS_BATCH_ROWS = int(os.getenv("ANALYTICS_BATCH_ROWS", "200000"))
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+
+_COLUMNS = ("symbol_id", "interval", "ts", *OHLCV_FIELDS)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candles (
+    symbol_id INTEGER NOT NULL,
+    interval VARCHAR NOT NULL,
+    ts BIGINT NOT NULL,
+    open DOUBLE NOT NULL,
+    high DOUBLE NOT NULL,
+    low DOUBLE NOT NULL,
+    close DOUBLE NOT NULL,
+    volume DOUBLE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER NOT NULL,
+    symbol VARCHAR NOT NULL,
+    exchange VARCHAR
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    last_candle_id BIGINT NOT NULL,
+    synced_at_utc TIMESTAMP NOT NULL
+);
+"""
+# Candle timestamps are stored as "YYYY-MM-DD HH:MM:SS.ffffff" UTC strings.
+_HOT_SELECT = (
+    "SELECT symbol_id, interval, CAST(strftime('%s', ts_utc) AS INTEGER), "
+    "open, high, low, close, volume FROM candles"
+)
+
+
+class AnalyticsUnavailableError(RuntimeError):
+    pass
+
+
+class UnknownAnalyticsQueryError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class SyncResult:
+    full: bool
+    rows_copied: int
+    last_candle_id: int
+    synced_at_utc: datetime
+    duration_seconds: float
+
+
+@dataclass(frozen=True)
+class AnalyticsResult:
+    query: str
+    rows: list[dict]
+    synced_at_utc: datetime | None
+    elapsed_ms: float
+
+
+def _epoch(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return int(dt.timestamp())
+
+
+def _sqlite_ts(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=UTC).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _frame(rows) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(rows, columns=list(_COLUMNS))
+    return df.astype({"symbol_id": "int32", "ts": "int64"})
+
+
+class AnalyticsStore:
+    """
+    Columnar copy of `candles` in DuckDB for aggregate queries.
+
+    The SQLite database stays the source of truth and the OLTP path is untouched;
+    this copy is only read by `/api/analytics`. A sync copies:
+
+    - rows with a candle id above the last synced id (new inserts, gap repairs)
+    - the last `ANALYTICS_RESYNC_DAYS` of every series, hot and cold (late
+      corrections rewrite rows in place, so their ids do not change)
+    - on the first (or a `full`) sync, cold blocks as well
+
+    All SQLite reads of one sync run in a single read transaction, so the copy
+    always matches one point in time of the source.
+    """
+
+    def __init__(self, path: str = ANALYTICS_DB_PATH):
+        self.path = path
+        self._con = None
+        self._lock = threading.Lock()
+        self._synced_at: datetime | None = None
+
+    def _connection(self):
+        if duckdb is None:
+            raise AnalyticsUnavailableError("analytics requires the optional 'duckdb' package")
+        if self._con is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            con = duckdb.connect(self.path)
+            con.execute(_SCHEMA)
+            row = con.execute("SELECT synced_at_utc FROM sync_state").fetchone()
+            self._synced_at = row[0].replace(tzinfo=UTC) if row else None
+            self._con = con
+        return self._con
+
+    def close(self) -> None:
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+    @property
+    def synced_at(self) -> datetime | None:
+        return self._synced_at
+
+    def sync(self, *, full: bool = False, now: datetime | None = None) -> SyncResult:
+        with self._lock:
+            return self._sync(full=full, now=now or datetime.now(tz=UTC))
+
+    def _sync(self, *, full: bool, now: datetime) -> SyncResult:
+        con = self._connection()
+        t0 = time.perf_counter()
+        state = con.execute("SELECT last_candle_id FROM sync_state").fetchone()
+        full = full or state is None
+        watermark = 0 if full else state[0]
+        window_start = _epoch(now - timedelta(days=ANALYTICS_RESYNC_DAYS))
+
+        raw = engine.raw_connection()
+        src = raw.driver_connection
+        src.execute("BEGIN")
+        con.execute("BEGIN")
+        try:
+            last_id = src.execute("SELECT coalesce(max(id), 0) FROM candles").fetchone()[0]
+            symbols = src.execute("SELECT id, symbol, exchange FROM symbols").fetchall()
+            known = {s[0] for s in con.execute("SELECT id FROM symbols").fetchall()}
+            removed = known - {s[0] for s in symbols}
+            con.execute("DELETE FROM symbols")
+            if symbols:
+                con.executemany("INSERT INTO symbols VALUES (?, ?, ?)", symbols)
+
+            if full:
+                con.execute("DELETE FROM candles")
+                copied = self._copy_cold(con, src)
+                copied += self._append(con, src.execute(f"{_HOT_SELECT} ORDER BY id"))
+            else:
+                if removed:
+                    con.execute(
+                        f"DELETE FROM candles WHERE symbol_id IN ({', '.join('?' * len(removed))})",
+                        list(removed),
+                    )
+                copied = self._copy_recent(con, src, symbols, window_start)
+                copied += self._copy_new_before(con, src, watermark, last_id, window_start)
+
+            con.execute("DELETE FROM sync_state")
+            con.execute("INSERT INTO sync_state VALUES (?, ?)", [last_id, now.replace(tzinfo=None)])
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            src.execute("ROLLBACK")
+            raw.close()
+
+        self._synced_at = now
+        result = SyncResult(
+            full=full,
+            rows_copied=copied,
+            last_candle_id=last_id,
+            synced_at_utc=now,
+            duration_seconds=time.perf_counter() - t0,
+        )
+        logger.info(
+            "analytics copy synced (full=%s rows=%s last_id=%s seconds=%.2f)",
+            result.full,
+            result.rows_copied,
+            result.last_candle_id,
+            result.duration_seconds,
+        )
+        return result
+
+    def _append(self, con, cursor) -> int:
+        copied = 0
+        while rows := cursor.fetchmany(ANALYTICS_BATCH_ROWS):
+            con.append("candles", _frame(rows))
+            copied += len(rows)
+        return copied
+
+    def _copy_cold(self, con, src, since: int | None = None) -> int:
+        """Cold rows not shadowed by hot ones; with `since`, only rows at or after it."""
+        sql = "SELECT symbol_id, interval, first_ts_utc, last_ts_utc, payload FROM candle_blocks"
+        params: tuple = ()
+        if since is not None:
+            sql += " WHERE last_ts_utc >= ?"
+            params = (_sqlite_ts(since),)
+        copied = 0
+        for symbol_id, interval, first_ts, last_ts, payload in src.execute(sql, params):
+            cols = decode_block(payload)
+            if since is not None:
+                cols = cols.take(cols.ts >= since)
+            # Hot rows win over cold values; they are copied separately.
+            hot_ts = [
+                r[0]
+                for r in src.execute(
+                    "SELECT CAST(strftime('%s', ts_utc) AS INTEGER) FROM candles "
+                    "WHERE symbol_id = ? AND interval = ? AND ts_utc BETWEEN ? AND ?",
+                    (symbol_id, interval, first_ts, last_ts),
+                )
+            ]
+            if hot_ts:
+                cols = cols.take(~np.isin(cols.ts, hot_ts))
+            if len(cols) == 0:
+                continue
+            df = pd.DataFrame(
+                {
+                    "symbol_id": np.full(len(cols), symbol_id, dtype="int32"),
+                    "interval": interval,
+                    "ts": cols.ts,
+                    **{f: getattr(cols, f) for f in OHLCV_FIELDS},
+                }
+            )
+            con.append("candles", df)
+            copied += len(cols)
+        return copied
+
+    def _copy_recent(self, con, src, symbols, window_start: int) -> int:
+        con.execute("DELETE FROM candles WHERE ts >= ?", [window_start])
+        if not symbols:
+            return 0
+        # With a short COLD_STORAGE_AFTER_DAYS part of the window is already cold.
+        copied = self._copy_cold(con, src, since=window_start)
+        ids = [s[0] for s in symbols]
+        # IN lists on the leading columns let SQLite seek the (symbol_id, interval, ts_utc) index.
+        cursor = src.execute(
+            f"{_HOT_SELECT} WHERE symbol_id IN ({', '.join('?' * len(ids))}) "
+            f"AND interval IN ({', '.join('?' * len(ALLOWED_INTERVALS))}) AND ts_utc >= ?",
+            (*ids, *ALLOWED_INTERVALS, _sqlite_ts(window_start)),
+        )
+        return copied + self._append(con, cursor)
+
+    def _copy_new_before(self, con, src, watermark: int, last_id: int, window_start: int) -> int:
+        """New rows older than the resync window, e.g. from gap repair."""
+        if last_id <= watermark:
+            return 0
+        rows = src.execute(
+            f"{_HOT_SELECT} WHERE id > ? AND id <= ? AND ts_utc < ?",
+            (watermark, last_id, _sqlite_ts(window_start)),
+        ).fetchall()
+        if not rows:
+            return 0
+        df = _frame(rows)
+        con.register("incoming", df)
+        try:
+            con.execute(
+                "DELETE FROM candles USING incoming i WHERE candles.symbol_id = i.symbol_id "
+                "AND candles.interval = i.interval AND candles.ts = i.ts "
+                "AND candles.ts BETWEEN ? AND ?",
+                [int(df.ts.min()), int(df.ts.max())],
+            )
+            con.execute("INSERT INTO candles SELECT * FROM incoming")
+        finally:
+            con.unregister("incoming")
+        return len(rows)
+
+    def query(
+        self,
+        name: str,
+        *,
+        interval: str | None = None,
+        exchange: str | None = None,
+        symbol_id: int | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        limit: int = DEFAULT_LIMIT,
+        now: datetime | None = None,
+    ) -> AnalyticsResult:
+        """
+        Run one of the named aggregate queries in `QUERIES` over the copy.
+
+        Syncs first when the copy is older than `ANALYTICS_MAX_STALENESS_SECONDS`.
+        """
+
+        build = QUERIES.get(name)
+        if build is None:
+            raise UnknownAnalyticsQueryError(
+                f"unknown analytics query {name!r}; expected one of {', '.join(QUERIES)}"
+            )
+        if interval is not None:
+            validate_interval(interval)
+        limit = max(1, min(limit, MAX_LIMIT))
+
+        now = now or datetime.now(tz=UTC)
+        con = self._connection()
+        if (
+            self._synced_at is None
+            or (now - self._synced_at).total_seconds() > ANALYTICS_MAX_STALENESS_SECONDS
+        ):
+            self.sync(now=now)
+
+        where, params = ["TRUE"], []
+        if interval is not None:
+            where.append("c.interval = ?")
+            params.append(interval)
+        if exchange is not None:
+            where.append("c.symbol_id IN (SELECT id FROM symbols WHERE exchange = ?)")
+            params.append(exchange)
+        if symbol_id is not None:
+            where.append("c.symbol_id = ?")
+            params.append(symbol_id)
+        if start is not None:
+            where.append("c.ts >= ?")
+            params.append(_epoch(start))
+        if end is not None:
+            where.append("c.ts < ?")
+            params.append(_epoch(end))
+
+        sql = build(" AND ".join(where))
+        t0 = time.perf_counter()
+        # A cursor is a separate DuckDB connection to the same database, so
+        # concurrent API requests do not serialize on one connection.
+        cursor = con.cursor()
+        try:
+            result = cursor.execute(sql, [*params, limit])
+            columns = [d[0] for d in result.description]
+            rows = [
+                {col: _to_json(value) for col, value in zip(columns, row)}
+                for row in result.fetchall()
+            ]
+        finally:
+            cursor.close()
+        return AnalyticsResult(
+            query=name,
+            rows=rows,
+            synced_at_utc=self._synced_at,
+            elapsed_ms=(time.perf_counter() - t0) * 1000.0,
+        )
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=UTC)
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _per_symbol(aggregates: str, where: str, order_by: str) -> str:
+    # Aggregate first and join symbol names afterwards; joining every candle row
+    # costs more than the aggregation itself.
+    return f"""
+        SELECT a.*, s.symbol, s.exchange
+        FROM (
+            SELECT c.symbol_id, c.interval, {aggregates}
+            FROM candles c
+            WHERE {where}
+            GROUP BY c.symbol_id, c.interval
+        ) a LEFT JOIN symbols s ON s.id = a.symbol_id
+        ORDER BY {order_by}
+        LIMIT ?
+    """
+
+
+def _coverage(where: str) -> str:
+    return _per_symbol(
+        "count(*) AS candles, epoch_ms(min(c.ts) * 1000) AS first_ts_utc, "
+        "epoch_ms(max(c.ts) * 1000) AS last_ts_utc",
+        where,
+        "a.symbol_id, a.interval",
+    )
+
+
+def _volume(where: str) -> str:
+    return _per_symbol(
+        "count(*) AS candles, avg(c.volume) AS avg_volume, sum(c.volume) AS total_volume, "
+        "avg(c.close * c.volume) AS avg_dollar_volume",
+        where,
+        "a.avg_volume DESC, a.symbol_id",
+    )
+
+
+def _cross_section(where: str) -> str:
+    return f"""
+        WITH returns AS (
+            SELECT c.ts,
+                   c.close / lag(c.close) OVER (
+                       PARTITION BY c.symbol_id, c.interval ORDER BY c.ts
+                   ) - 1 AS ret
+            FROM candles c
+            WHERE {where}
+        )
+        SELECT epoch_ms(ts * 1000) AS ts_utc, count(*) AS symbols,
+               avg(ret) AS mean_return, median(ret) AS median_return,
+               stddev_samp(ret) AS std_return, min(ret) AS min_return,
+               max(ret) AS max_return
+        FROM returns
+        WHERE ret IS NOT NULL
+        GROUP BY ts
+        ORDER BY ts DESC
+        LIMIT ?
+    """
+
+
+QUERIES = {
+    # rows and first/last candle per symbol and interval
+    "coverage": _coverage,
+    # average and total volume per symbol, most traded first
+    "volume": _volume,
+    # per-timestamp distribution of bar-to-bar returns across symbols
+    "cross_section": _cross_section,
+}
+
+ANALYTICS = AnalyticsStore()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from datetime import UTC, datetime, timedelta
+from urllib.parse import quote
+
+import httpx
+import numpy as np
+
+from app.services.intervals import validate_interval
+from app.services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+CHART_API_BASE_URL = os.getenv(
+    "CHART_API_BASE_URL",
+    "https://query2.finance.yahoo.com/v8/finance/chart",
+)
+CHART_API_CONCURRENCY = int(os.getenv("CHART_API_CONCURRENCY", "32"))
+CHART_API_TIMEOUT_SECONDS = float(os.getenv("CHART_API_TIMEOUT_SECONDS", "15"))
+
+_YAHOO_INTERVALS = {"1h": "60m"}
+_MAX_HISTORY = timedelta(days=729)
+_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+
+class ChartApiError(RuntimeError):
+    pass
+
+
+def _to_epoch(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return int(dt.timestamp())
+
+
+def parse_chart_response(payload: dict, symbol: str) -> list[dict]:
+    """
+    Convert a chart JSON payload into candle rows without building a DataFrame.
+
+    Bars with a missing OHLCV value (Yahoo sends `null` for halted bars) are dropped.
+    """
+
+    chart = payload.get("chart") or {}
+    if chart.get("error"):
+        raise ChartApiError(f"chart api error (symbol={symbol}): {chart['error']}")
+    results = chart.get("result") or []
+    if not results:
+        return []
+
+    result = results[0]
+    timestamps = result.get("timestamp") or []
+    quotes = ((result.get("indicators") or {}).get("quote") or [{}])[0]
+    if not timestamps:
+        return []
+
+    n = len(timestamps)
+    ts = np.asarray(timestamps, dtype=np.int64)
+    columns = {}
+    for name in ("open", "high", "low", "close", "volume"):
+        values = quotes.get(name)
+        if values is None or len(values) != n:
+            raise ChartApiError(f"malformed chart quote column (symbol={symbol} column={name})")
+        # None -> NaN
+        columns[name] = np.asarray(values, dtype=np.float64)
+
+    valid = np.ones(n, dtype=bool)
+    for values in columns.values():
+        valid &= np.isfinite(values)
+
+    ts = ts[valid].tolist()
+    cols = [columns[name][valid].tolist() for name in ("open", "high", "low", "close", "volume")]
+    return [
+        {
+            "ts_utc": datetime.fromtimestamp(t, tz=UTC),
+            "open": o,
+            "high": h,
+            "low": l,
+            "close": c,
+            "volume": v,
+        }
+        for t, o, h, l, c, v in zip(ts, *cols)
+    ]
+
+
+class ChartApiProvider:
+    """
+    Fetches candles from Yahoo's chart JSON endpoint with one pooled
+    keep-alive `httpx.AsyncClient` and at most `max_concurrency` requests in flight.
+    """
+
+    name = "chart"
+
+    def __init__(
+        self,
+        *,
+        base_url: str = CHART_API_BASE_URL,
+        max_concurrency: int = CHART_API_CONCURRENCY,
+        timeout_seconds: float = CHART_API_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self._base_url = base_url.rstrip("/")
+        self._timeout_seconds = timeout_seconds
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                headers={"User-Agent": _USER_AGENT, "Accept": "application/json"},
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def fetch_candles(
+        self,
+        symbol: str,
+        interval: str,
+        start: datetime | None,
+        end: datetime | None,
+    ) -> list[dict]:
+        validate_interval(interval)
+
+        params = {
+            "interval": _YAHOO_INTERVALS[interval],
+            "includePrePost": "false",
+            "events": "",
+        }
+        end_utc = end or datetime.now(tz=UTC)
+        # Yahoo keeps 60m bars for about two years.
+        start_utc = start or end_utc - _MAX_HISTORY
+        params["period1"] = str(_to_epoch(start_utc))
+        params["period2"] = str(_to_epoch(end_utc))
+
+        client = self._get_client()
+        url = f"{self._base_url}/{quote(symbol, safe='')}"
+        async with self._semaphore:
+            with span("chart_api.request"):
+                response = await client.get(url, params=params)
+
+        if response.status_code == 404:
+            raise ChartApiError(f"unknown symbol (symbol={symbol})")
+        if response.status_code != 200:
+            raise ChartApiError(
+                f"chart api returned {response.status_code} (symbol={symbol})"
+            )
+
+        with span("chart_api.parse"):
+            return parse_chart_response(response.json(), symbol)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
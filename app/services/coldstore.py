@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import logging
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.models import Candle, CandleBlock
+
+logger = logging.getLogger(__name__)
+
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume")
+
+# magic, version, row count, first ts (epoch seconds)
+_HEADER = struct.Struct("<4sBIq")
+_MAGIC = b"CBK1"
+_VERSION = 1
+
+
+def cold_storage_age() -> timedelta | None:
+    """
+    Age after which candles are packed into cold blocks.
+
+    Configured via `COLD_STORAGE_AFTER_DAYS`; unset or `0` disables tiering.
+    """
+    days = float(os.getenv("COLD_STORAGE_AFTER_DAYS", "0") or 0)
+    if days <= 0:
+        return None
+    return timedelta(days=days)
+
+
+def _ensure_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+def _to_epoch(dt: datetime) -> int:
+    return int(_ensure_utc(dt).timestamp())
+
+
+def _from_epoch(ts: int) -> datetime:
+    return datetime.fromtimestamp(int(ts), tz=UTC)
+
+
+def _month_start(dt: datetime) -> datetime:
+    dt = _ensure_utc(dt)
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(dt: datetime) -> datetime:
+    if dt.month == 12:
+        return dt.replace(year=dt.year + 1, month=1)
+    return dt.replace(month=dt.month + 1)
+
+
+def _shuffle(values: np.ndarray) -> bytes:
+    # Byte-transpose 8-byte words so that similar high bytes end up adjacent.
+    return values.view(np.uint8).reshape(-1, 8).T.tobytes()
+
+
+def _unshuffle(raw: bytes, n: int) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.uint8).reshape(8, n).T.copy().view("<u8").ravel()
+
+
+@dataclass
+class CandleColumns:
+    """Candles as parallel arrays; `ts` holds UTC epoch seconds."""
+
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.ts.shape[0])
+
+    @classmethod
+    def empty(cls) -> CandleColumns:
+        return cls(np.empty(0, dtype="<i8"), *(np.empty(0, dtype="<f8") for _ in OHLCV_FIELDS))
+
+    def take(self, index) -> CandleColumns:
+        return CandleColumns(self.ts[index], *(getattr(self, f)[index] for f in OHLCV_FIELDS))
+
+    def to_rows(self) -> list[dict]:
+        columns = [getattr(self, f).tolist() for f in OHLCV_FIELDS]
+        return [
+            {"ts_utc": _from_epoch(ts), **dict(zip(OHLCV_FIELDS, values))}
+            for ts, *values in zip(self.ts.tolist(), *columns)
+        ]
+
+
+def encode_block(cols: CandleColumns) -> bytes:
+    """
+    Pack sorted candles into a compressed block.
+
+    - timestamps: first value in the header, then int64 deltas
+    - floats: XOR with the previous value (repeated/close prices share most bits)
+    - every column is byte-shuffled, then the body is zlib-compressed
+    """
+
+    n = len(cols)
+    if n == 0:
+        raise ValueError("cannot encode an empty block")
+
+    ts = cols.ts.astype("<i8")
+    parts = [_shuffle(np.diff(ts).astype("<i8"))]
+    for name in OHLCV_FIELDS:
+        bits = getattr(cols, name).astype("<f8").view("<u8")
+        xored = bits.copy()
+        xored[1:] ^= bits[:-1]
+        parts.append(_shuffle(xored))
+
+    header = _HEADER.pack(_MAGIC, _VERSION, n, int(ts[0]))
+    return header + zlib.compress(b"".join(parts), 6)
+
+
+def decode_block(blob: bytes) -> CandleColumns:
+    magic, version, n, first_ts = _HEADER.unpack_from(blob)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"unsupported candle block (magic={magic!r} version={version})")
+
+    body = zlib.decompress(blob[_HEADER.size :])
+    offset = 0
+
+    def _next(count: int) -> np.ndarray:
+        nonlocal offset
+        size = count * 8
+        values = _unshuffle(body[offset : offset + size], count)
+        offset += size
+        return values
+
+    ts = np.empty(n, dtype="<i8")
+    ts[0] = first_ts
+    if n > 1:
+        np.cumsum(_next(n - 1).view("<i8"), out=ts[1:])
+        ts[1:] += first_ts
+
+    floats = []
+    for _ in OHLCV_FIELDS:
+        bits = np.bitwise_xor.accumulate(_next(n))
+        floats.append(bits.view("<f8"))
+
+    return CandleColumns(ts, *floats)
+
+
+def _dedupe_sorted(cols: CandleColumns) -> CandleColumns:
+    """Sort by ts; on duplicate timestamps the later input row wins."""
+    if len(cols) == 0:
+        return cols
+    order = np.argsort(cols.ts, kind="stable")
+    cols = cols.take(order)
+    keep = np.ones(len(cols), dtype=bool)
+    keep[:-1] = cols.ts[1:] != cols.ts[:-1]
+    return cols.take(keep)
+
+
+def _concat(parts: list[CandleColumns]) -> CandleColumns:
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return CandleColumns.empty()
+    return CandleColumns(
+        np.concatenate([p.ts for p in parts]),
+        *(np.concatenate([getattr(p, f) for p in parts]) for f in OHLCV_FIELDS),
+    )
+
+
+def _hot_columns(
+    db: Session,
+    symbol_id: int,
+    interval: str,
+    start: datetime | None,
+    end: datetime | None,
+) -> CandleColumns:
+    stmt = select(
+        Candle.ts_utc,
+        Candle.open,
+        Candle.high,
+        Candle.low,
+        Candle.close,
+        Candle.volume,
+    ).where(Candle.symbol_id == symbol_id, Candle.interval == interval)
+    if start is not None:
+        stmt = stmt.where(Candle.ts_utc >= start)
+    if end is not None:
+        stmt = stmt.where(Candle.ts_utc < end)
+    rows = db.execute(stmt.order_by(Candle.ts_utc.asc())).all()
+    if not rows:
+        return CandleColumns.empty()
+
+    ts = np.fromiter((_to_epoch(r[0]) for r in rows), dtype="<i8", count=len(rows))
+    values = np.array([r[1:] for r in rows], dtype="<f8")
+    return CandleColumns(ts, *(values[:, i].copy() for i in range(len(OHLCV_FIELDS))))
+
+
+def _cold_columns(
+    db: Session,
+    symbol_id: int,
+    interval: str,
+    start: datetime | None,
+    end: datetime | None,
+) -> CandleColumns:
+    stmt = select(CandleBlock.payload).where(
+        CandleBlock.symbol_id == symbol_id,
+        CandleBlock.interval == interval,
+    )
+    if start is not None:
+        stmt = stmt.where(CandleBlock.last_ts_utc >= start)
+    if end is not None:
+        stmt = stmt.where(CandleBlock.first_ts_utc < end)
+    blobs = db.execute(stmt.order_by(CandleBlock.period_start_utc.asc())).scalars().all()
+    if not blobs:
+        return CandleColumns.empty()
+
+    cols = _concat([decode_block(b) for b in blobs])
+    mask = np.ones(len(cols), dtype=bool)
+    if start is not None:
+        mask &= cols.ts >= _to_epoch(start)
+    if end is not None:
+        mask &= cols.ts < _to_epoch(end)
+    return cols.take(mask)
+
+
+def read_candle_columns(
+    db: Session,
+    symbol_id: int,
+    interval: str,
+    *,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> CandleColumns:
+    """
+    Read candles in `[start, end)` from hot rows and cold blocks, sorted by ts.
+
+    Hot rows win over cold values for the same timestamp.
+    """
+
+    cold = _cold_columns(db, symbol_id, interval, start, end)
+    hot = _hot_columns(db, symbol_id, interval, start, end)
+    if len(cold) == 0:
+        return hot
+    return _dedupe_sorted(_concat([cold, hot]))
+
+
+def read_candles(
+    db: Session,
+    symbol_id: int,
+    interval: str,
+    *,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> list[dict]:
+    return read_candle_columns(db, symbol_id, interval, start=start, end=end).to_rows()
+
+
+def get_cold_last_ts(db: Session, symbol_id: int, interval: str) -> datetime | None:
+    stmt = select(func.max(CandleBlock.last_ts_utc)).where(
+        CandleBlock.symbol_id == symbol_id,
+        CandleBlock.interval == interval,
+    )
+    return db.execute(stmt).scalar_one_or_none()
+
+
+def compact_cold_candles(
+    db: Session,
+    *,
+    older_than: timedelta,
+    now: datetime | None = None,
+    symbol_ids: list[int] | None = None,
+) -> int:
+    """
+    Move hot candles of whole months older than `now - older_than` into blocks.
+
+    Each (symbol, interval, month) is merged with its existing block (hot rows
+    win), re-encoded and committed on its own, so the write lock is only held
+    briefly. Returns the number of hot rows moved.
+    """
+
+    cutoff = _month_start((now or datetime.now(tz=UTC)) - older_than)
+
+    groups_stmt = (
+        select(Candle.symbol_id, Candle.interval, func.min(Candle.ts_utc))
+        .where(Candle.ts_utc < cutoff)
+        .group_by(Candle.symbol_id, Candle.interval)
+    )
+    if symbol_ids is not None:
+        groups_stmt = groups_stmt.where(Candle.symbol_id.in_(symbol_ids))
+
+    moved = 0
+    for symbol_id, interval, first_ts in db.execute(groups_stmt).all():
+        period = _month_start(first_ts)
+        while period < cutoff:
+            period_end = _next_month(period)
+            moved += _compact_period(db, symbol_id, interval, period, period_end)
+            period = period_end
+
+    if moved:
+        logger.info("compacted cold candles (rows=%s cutoff=%s)", moved, cutoff)
+    return moved
+
+
+def _compact_period(
+    db: Session,
+    symbol_id: int,
+    interval: str,
+    period_start: datetime,
+    period_end: datetime,
+) -> int:
+    hot = _hot_columns(db, symbol_id, interval, period_start, period_end)
+    if len(hot) == 0:
+        return 0
+
+    block = db.execute(
+        select(CandleBlock).where(
+            CandleBlock.symbol_id == symbol_id,
+            CandleBlock.interval == interval,
+            CandleBlock.period_start_utc == period_start,
+        )
+    ).scalar_one_or_none()
+
+    merged = hot if block is None else _dedupe_sorted(_concat([decode_block(block.payload), hot]))
+    if block is None:
+        block = CandleBlock(symbol_id=symbol_id, interval=interval, period_start_utc=period_start)
+        db.add(block)
+    block.first_ts_utc = _from_epoch(merged.ts[0])
+    block.last_ts_utc = _from_epoch(merged.ts[-1])
+    block.row_count = len(merged)
+    block.payload = encode_block(merged)
+
+    db.execute(
+        delete(Candle).where(
+            Candle.symbol_id == symbol_id,
+            Candle.interval == interval,
+            Candle.ts_utc >= period_start,
+            Candle.ts_utc < period_end,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(hot)
@@ -2,39 +2,52 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, field
 from datetime import UTC, datetime, timedelta
 
 from app.db import SessionLocal
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 
-from app.models import CollectorStatus, Symbol
-from app.services.ingest import ingest_symbol_interval
+from app.models import Symbol
+from app.services.coldstore import cold_storage_age, compact_cold_candles
+from app.services.gaps import gap_repair_every, repair_gaps
+from app.services.ingest import get_last_ts, ingest_symbol_interval, plan_fetch, upsert_candles
 from app.services.intervals import ALLOWED_INTERVALS, validate_interval
+from app.services.leases import (
+    DEFAULT_LEASE_TTL_SECONDS,
+    DEFAULT_NUM_PARTITIONS,
+    acquire_leases,
+    default_worker_id,
+    partition_for,
+    partition_owners,
+    release_leases,
+    take_refresh_requests,
+)
+from app.services.providers import CandleProvider, get_provider
+from app.services.runlog import RUN_LOG
+from app.services.scheduling import (
+    COLLECTOR_EXCHANGE_WEIGHTS,
+    LagTracker,
+    TickBudget,
+    WorkItem,
+    fair_order,
+    first_ts_after,
+    idle_until,
+    load_last_ts,
+    next_candle_available_at,
+    tick_budget,
+    update_cost,
+)
+from app.services.status import record_attempt, record_failure, record_success
+from app.services.tracing import TRACER, mark_busy, span
 
 logger = logging.getLogger(__name__)
-_MAX_ERROR_LEN = 500
-
-
-def _get_or_create_status(db: Session, symbol_id: int) -> CollectorStatus:
-    status = (
-        db.query(CollectorStatus)
-        .filter(CollectorStatus.symbol_id == symbol_id)
-        .one_or_none()
-    )
-    if status is not None:
-        return status
-
-    status = CollectorStatus(symbol_id=symbol_id)
-    db.add(status)
-    db.flush()
-    return status
-
-
-def _truncate_error(message: str) -> str:
-    if len(message) <= _MAX_ERROR_LEN:
-        return message
-    return message[:_MAX_ERROR_LEN]
+_COMPACTION_EVERY = timedelta(hours=24)
+# Deadline of series with a refresh request: earlier than any real one.
+_REQUESTED = datetime.min.replace(tzinfo=UTC)
 
 
 def _interval_step(interval: str) -> timedelta:
@@ -47,20 +60,97 @@ class CollectorState:
     is_running: bool = False
     last_run: datetime | None = None
     last_error: str | None = None
+    worker_id: str | None = None
+    partitions: list[int] = field(default_factory=list)
 
 
 class Collector:
-    def __init__(self, *, poll_interval_seconds: float = 2.0):
-        self.state = CollectorState()
+    def __init__(
+        self,
+        *,
+        poll_interval_seconds: float = 2.0,
+        worker_id: str | None = None,
+        num_partitions: int = DEFAULT_NUM_PARTITIONS,
+        lease_ttl_seconds: float = DEFAULT_LEASE_TTL_SECONDS,
+        provider: CandleProvider | None = None,
+        tick_budget_seconds: float | None = None,
+        exchange_weights: dict[str, float] | None = None,
+    ):
+        self.state = CollectorState(worker_id=worker_id or default_worker_id())
         self._poll_interval_seconds = poll_interval_seconds
         self._lock = asyncio.Lock()
         self._stop_event = asyncio.Event()
         self._task: asyncio.Task[None] | None = None
         self._next_run: dict[tuple[int, str], datetime] = {}
+        self._num_partitions = num_partitions
+        self._lease_ttl_seconds = lease_ttl_seconds
+        self._owned: set[int] = set()
+        self._leases_renewed_at: datetime | None = None
+        self._next_compaction: datetime | None = None
+        self._next_gap_repair: datetime | None = None
+        self._gap_repair_task: asyncio.Task[None] | None = None
+        self._provider = provider
+        self._tick_budget_seconds = (
+            tick_budget() if tick_budget_seconds is None else tick_budget_seconds or None
+        )
+        self.exchange_weights = (
+            COLLECTOR_EXCHANGE_WEIGHTS if exchange_weights is None else exchange_weights
+        )
+        # Newest stored candle per (symbol_id, interval), kept current after each write.
+        self._last_ts: dict[tuple[int, str], datetime | None] = {}
+        # Consecutive fetches without a new candle, and when to look again.
+        self._idle_runs: dict[tuple[int, str], int] = {}
+        self._idle_until: dict[tuple[int, str], datetime] = {}
+        self._costs: dict[str, float] = {}
+        self.lag = LagTracker()
+        # (symbol_id, interval) pairs being fetched right now, by the collector
+        # or by an on-demand refresh (which may run in a worker thread).
+        self._fetching: set[tuple[int, str]] = set()
+        self._fetching_lock = threading.Lock()
 
     def status(self) -> CollectorState:
         return self.state
 
+    @property
+    def provider(self) -> CandleProvider | None:
+        return self._provider
+
+    @property
+    def num_partitions(self) -> int:
+        return self._num_partitions
+
+    @property
+    def lease_ttl_seconds(self) -> float:
+        return self._lease_ttl_seconds
+
+    def begin_fetch(self, symbol_id: int, interval: str) -> bool:
+        """Claim one series for a fetch; False if it is being fetched already."""
+        with self._fetching_lock:
+            if (symbol_id, interval) in self._fetching:
+                return False
+            self._fetching.add((symbol_id, interval))
+            return True
+
+    def end_fetch(self, symbol_id: int, interval: str) -> None:
+        with self._fetching_lock:
+            self._fetching.discard((symbol_id, interval))
+
+    def fetchable(self, db: Session, symbol_ids: list[int], now: datetime) -> set[int]:
+        """Ids in partitions that are unowned or leased by this worker."""
+        owners = partition_owners(db, now=now)
+        return {
+            symbol_id
+            for symbol_id in symbol_ids
+            if owners.get(partition_for(symbol_id, self._num_partitions), self.state.worker_id)
+            == self.state.worker_id
+        }
+
+    def mark_fetched(self, symbol_id: int, interval: str, now: datetime) -> None:
+        """Push back the next scheduled fetch after an out-of-band refresh."""
+        self._next_run[(symbol_id, interval)] = now + _interval_step(interval)
+        # The refresh wrote candles; reload the newest one before the next lag sample.
+        self._last_ts.pop((symbol_id, interval), None)
+
     async def start(self) -> None:
         async with self._lock:
             if self._task is not None and not self._task.done():
@@ -80,13 +170,72 @@ class Collector:
             self.state.is_running = False
             return
 
-        task.cancel()
+        repair, self._gap_repair_task = self._gap_repair_task, None
+        for pending in (task, repair):
+            if pending is not None:
+                pending.cancel()
         try:
             await task
         except asyncio.CancelledError:
             pass
         finally:
+            if repair is not None:
+                try:
+                    await repair
+                except asyncio.CancelledError:
+                    pass
             self.state.is_running = False
+            self._release_leases()
+            if self._provider is not None:
+                await self._provider.aclose()
+
+    def _renew_leases(self, db: Session) -> None:
+        now = datetime.now(tz=UTC)
+        try:
+            self._owned = acquire_leases(
+                db,
+                self.state.worker_id,
+                now=now,
+                num_partitions=self._num_partitions,
+                ttl_seconds=self._lease_ttl_seconds,
+            )
+        except OperationalError as e:
+            db.rollback()
+            if "database is locked" not in str(e.orig):
+                raise
+            # Another worker held the write lock; retry on the next tick. Held
+            # leases stay valid until their TTL, so keep working them until
+            # they are close to expiring.
+            logger.warning("shard lease renewal failed: database is locked")
+            renewed_at = self._leases_renewed_at
+            if renewed_at is None or now - renewed_at >= timedelta(
+                seconds=self._lease_ttl_seconds * 2 / 3
+            ):
+                self._owned = set()
+                self.state.partitions = []
+            return
+        self._leases_renewed_at = now
+        self.state.partitions = sorted(self._owned)
+
+    def _maybe_renew_leases(self, db: Session) -> None:
+        # Heartbeat well within the TTL so long ticks never lose their leases.
+        renewed_at = self._leases_renewed_at
+        if renewed_at is None or datetime.now(tz=UTC) - renewed_at >= timedelta(
+            seconds=self._lease_ttl_seconds / 3
+        ):
+            self._renew_leases(db)
+
+    def _release_leases(self) -> None:
+        db = SessionLocal()
+        try:
+            release_leases(db, self.state.worker_id)
+        except Exception:
+            logger.exception("failed to release shard leases")
+        finally:
+            db.close()
+            self._owned = set()
+            self._leases_renewed_at = None
+            self.state.partitions = []
 
     async def _run_loop(self) -> None:
         try:
@@ -102,64 +251,359 @@ class Collector:
             self.state.is_running = False
 
     async def _tick(self) -> None:
-        now = datetime.now(tz=UTC)
-        self.state.last_run = now
+        with TRACER.tick():
+            now = datetime.now(tz=UTC)
+            self.state.last_run = now
+
+            db = SessionLocal()
+            try:
+                with span("leases"):
+                    self._renew_leases(db)
+                if not self._owned:
+                    return
+
+                with span("load_symbols"):
+                    symbols = (
+                        db.query(Symbol)
+                        .filter(
+                            Symbol.is_active.is_(True),
+                            (Symbol.id % self._num_partitions).in_(self._owned),
+                        )
+                        .order_by(Symbol.id.asc())
+                        .all()
+                    )
+                active_ids = {s.id for s in symbols}
+                for cache in (self._next_run, self._last_ts, self._idle_runs, self._idle_until):
+                    for key in list(cache.keys()):
+                        if key[0] not in active_ids:
+                            cache.pop(key, None)
+
+                with span("refresh_requests"):
+                    requested = take_refresh_requests(db, active_ids)
+                for key in requested:
+                    self._next_run.pop(key, None)
+                    self._idle_until.pop(key, None)
+
+                with span("schedule"):
+                    work = self._schedule(db, symbols, now, requested)
+                if work:
+                    mark_busy()
+                budget = TickBudget(self._tick_budget_seconds)
+                if self._provider is None:
+                    done = self._collect_sequential(db, work, now, budget)
+                else:
+                    done = await self._collect_batched(db, work, now, budget)
+                backlog: dict[str, int] = {}
+                for item in work[done:]:
+                    backlog[item.exchange] = backlog.get(item.exchange, 0) + 1
+                self.lag.set_backlog(backlog)
+                if backlog:
+                    logger.info("tick budget exhausted (done=%s left=%s)", done, len(work) - done)
+
+                with span("compaction"):
+                    self._maybe_compact(db, sorted(active_ids), now)
+                self._maybe_repair_gaps(sorted(active_ids), now)
+            finally:
+                db.close()
+
+    def _schedule(
+        self,
+        db: Session,
+        symbols: list[Symbol],
+        now: datetime,
+        requested: set[tuple[int, str]] = frozenset(),
+    ) -> list[WorkItem]:
+        """
+        Due (symbol, interval) pairs in deadline-aware, exchange-fair order.
+
+        Series with a refresh request from another process go first.
+        """
+        items = []
+        for interval in ALLOWED_INTERVALS:
+            due = [s for s in symbols if self._due(s, interval, now)]
+            missing = [s.id for s in due if (s.id, interval) not in self._last_ts]
+            if missing:
+                for symbol_id, last_ts in load_last_ts(db, missing, interval).items():
+                    self._last_ts[(symbol_id, interval)] = last_ts
+            for s in due:
+                last_ts = self._last_ts.get((s.id, interval))
+                deadline = next_candle_available_at(last_ts, interval)
+                until = self._idle_until.get((s.id, interval))
+                if until is not None:
+                    deadline = max(deadline, until)
+                if (s.id, interval) in requested:
+                    deadline = _REQUESTED
+                items.append(WorkItem(symbol=s, interval=interval, deadline=deadline))
+        return fair_order(items, now=now, weights=self.exchange_weights, costs=self._costs)
 
+    def _after_run(
+        self,
+        db: Session,
+        item: WorkItem,
+        seconds: float,
+        written: int,
+        *,
+        now: datetime,
+        failed: bool = False,
+    ) -> None:
+        """Track fetch cost, the freshness lag of new candles, and idle series."""
+        update_cost(self._costs, item.exchange, seconds)
+        key = (item.symbol.id, item.interval)
+        if written and self._record_lag(db, item):
+            self._idle_runs.pop(key, None)
+            self._idle_until.pop(key, None)
+        elif not failed:
+            # Closed, halted or delisted: wait instead of leading every tick's queue.
+            idle_runs = self._idle_runs[key] = self._idle_runs.get(key, 0) + 1
+            with span("idle"):
+                until = idle_until(
+                    db,
+                    item.symbol,
+                    item.interval,
+                    self._last_ts.get(key),
+                    now=now,
+                    idle_runs=idle_runs,
+                )
+            self._idle_until[key] = until
+            self._next_run[key] = max(self._next_run.get(key, now), until)
+
+    def _record_lag(self, db: Session, item: WorkItem) -> bool:
+        """Record the lag of the first new candle; False if the newest one did not move."""
+        key = (item.symbol.id, item.interval)
+        previous = self._last_ts.get(key)
+        with span("lag"):
+            latest = get_last_ts(db, item.symbol.id, item.interval)
+            if latest is None:
+                return False
+            self._last_ts[key] = latest.replace(tzinfo=UTC) if latest.tzinfo is None else latest
+            if previous is None:
+                return True
+            if self._last_ts[key] <= previous:
+                return False
+            first_new = first_ts_after(db, item.symbol.id, item.interval, previous)
+        if first_new is not None:
+            closed_at = first_new + _interval_step(item.interval)
+            self.lag.record(item.exchange, (datetime.now(tz=UTC) - closed_at).total_seconds())
+        return True
+
+    def _due(self, symbol: Symbol, interval: str, now: datetime) -> bool:
+        due_at = self._next_run.get((symbol.id, interval))
+        return due_at is None or due_at <= now
+
+    def _owns(self, db: Session, symbol: Symbol) -> bool:
+        with span("leases"):
+            self._maybe_renew_leases(db)
+        # A lease can be lost mid-tick (rebalanced or taken over); the new
+        # owner fetches the symbol then.
+        return partition_for(symbol.id, self._num_partitions) in self._owned
+
+    def _collect_sequential(
+        self, db: Session, work: list[WorkItem], now: datetime, budget: TickBudget
+    ) -> int:
+        """Process `work` in order until the budget runs out; returns items handled."""
+        for done, item in enumerate(work):
+            if budget.exhausted():
+                return done
+            symbol, interval = item.symbol, item.interval
+            if not self._owns(db, symbol):
+                continue
+            if not self.begin_fetch(symbol.id, interval):
+                # An on-demand refresh is fetching it and reschedules it when done.
+                continue
+            try:
+                self._collect_one(db, item, now)
+            finally:
+                self.end_fetch(symbol.id, interval)
+        return len(work)
+
+    def _collect_one(self, db: Session, item: WorkItem, now: datetime) -> None:
+        symbol, interval = item.symbol, item.interval
+        with TRACER.symbol(symbol.symbol):
+            self._mark_attempt(db, symbol)
+            started = datetime.now(tz=UTC)
+            t0 = time.perf_counter()
+            written, failed = 0, False
+            try:
+                with span("ingest"):
+                    written = ingest_symbol_interval(db, symbol, interval, now=now)
+            except Exception as e:
+                failed = True
+                self._record_run(symbol, interval, started, t0, error=e)
+                self._mark_failure(db, symbol, interval, e)
+            else:
+                self._record_run(symbol, interval, started, t0, rows_written=written)
+                self._mark_success(db, symbol)
+            finally:
+                self._next_run[(symbol.id, interval)] = now + _interval_step(interval)
+            self._after_run(
+                db, item, time.perf_counter() - t0, written, now=now, failed=failed
+            )
+
+    async def _collect_batched(
+        self, db: Session, work: list[WorkItem], now: datetime, budget: TickBudget
+    ) -> int:
+        """
+        Fetch through an async provider: plan windows from the DB, fetch up to a
+        batch of windows concurrently, then upsert results one by one.
+
+        The budget is checked between batches; returns items handled.
+        """
+
+        provider = self._provider
+        batch_size = max(1, provider.max_concurrency * 4)
+
+        for offset in range(0, len(work), batch_size):
+            if budget.exhausted():
+                return offset
+            batch = []
+            for item in work[offset : offset + batch_size]:
+                symbol, interval = item.symbol, item.interval
+                if not self._owns(db, symbol):
+                    continue
+                if not self.begin_fetch(symbol.id, interval):
+                    continue
+                self._mark_attempt(db, symbol)
+                planned_at = datetime.now(tz=UTC)
+                t0 = time.perf_counter()
+                try:
+                    window = plan_fetch(db, symbol, interval, now=now)
+                except Exception as e:
+                    self._record_run(symbol, interval, planned_at, t0, error=e)
+                    self._mark_failure(db, symbol, interval, e)
+                    self._next_run[(symbol.id, interval)] = now + _interval_step(interval)
+                    self.end_fetch(symbol.id, interval)
+                    continue
+                if window is None:
+                    self._record_run(symbol, interval, planned_at, t0)
+                    self._mark_success(db, symbol)
+                    self._next_run[(symbol.id, interval)] = now + _interval_step(interval)
+                    self.end_fetch(symbol.id, interval)
+                    continue
+                batch.append((item, window))
+
+            started = datetime.now(tz=UTC)
+            results = await asyncio.gather(
+                *(self._fetch(item.symbol, item.interval, window) for item, window in batch)
+            )
+
+            for (item, _), (rows, fetch_seconds) in zip(batch, results):
+                symbol, interval = item.symbol, item.interval
+                # Duration is the symbol's own fetch plus its upsert, not the batch wall time.
+                t0 = time.perf_counter() - fetch_seconds
+                written, failed = 0, False
+                try:
+                    if isinstance(rows, BaseException):
+                        raise rows
+                    written = upsert_candles(db, symbol, interval, rows) if rows else 0
+                except Exception as e:
+                    failed = True
+                    self._record_run(symbol, interval, started, t0, error=e)
+                    self._mark_failure(db, symbol, interval, e)
+                else:
+                    self._record_run(symbol, interval, started, t0, rows_written=written)
+                    self._mark_success(db, symbol)
+                finally:
+                    self._next_run[(symbol.id, interval)] = now + _interval_step(interval)
+                    self.end_fetch(symbol.id, interval)
+                self._after_run(
+                    db, item, time.perf_counter() - t0, written, now=now, failed=failed
+                )
+        return len(work)
+
+    async def _fetch(
+        self,
+        symbol: Symbol,
+        interval: str,
+        window: tuple[datetime | None, datetime],
+    ) -> tuple[list[dict] | Exception, float]:
+        start, end = window
+        t0 = time.perf_counter()
+        try:
+            with TRACER.symbol(symbol.symbol), span("fetch_candles"):
+                rows = await self._provider.fetch_candles(symbol.symbol, interval, start, end)
+        except Exception as e:
+            return e, time.perf_counter() - t0
+        return rows, time.perf_counter() - t0
+
+    def _record_run(
+        self,
+        symbol: Symbol,
+        interval: str,
+        started: datetime,
+        t0: float,
+        *,
+        rows_written: int = 0,
+        error: Exception | None = None,
+    ) -> None:
+        RUN_LOG.record(
+            symbol_id=symbol.id,
+            exchange=symbol.exchange,
+            interval=interval,
+            source="collector",
+            started_at_utc=started,
+            duration_ms=(time.perf_counter() - t0) * 1000.0,
+            rows_written=rows_written,
+            error=error,
+        )
+
+    def _mark_attempt(self, db: Session, symbol: Symbol) -> None:
+        with span("status_update"):
+            record_attempt(db, symbol.id)
+
+    def _mark_success(self, db: Session, symbol: Symbol) -> None:
+        with span("status_update"):
+            record_success(db, symbol.id)
+
+    def _mark_failure(self, db: Session, symbol: Symbol, interval: str, error: Exception) -> None:
+        with span("status_update"):
+            record_failure(db, symbol.id, error)
+        self.state.last_error = str(error)
+        logger.error(
+            "collector ingest failed (symbol=%s interval=%s)",
+            symbol.symbol,
+            interval,
+            exc_info=error,
+        )
+
+    def _maybe_compact(self, db: Session, symbol_ids: list[int], now: datetime) -> None:
+        older_than = cold_storage_age()
+        if older_than is None or not symbol_ids:
+            return
+        if self._next_compaction is not None and self._next_compaction > now:
+            return
+        self._next_compaction = now + _COMPACTION_EVERY
+        mark_busy()
+        try:
+            compact_cold_candles(db, older_than=older_than, now=now, symbol_ids=symbol_ids)
+        except Exception:
+            db.rollback()
+            logger.exception("cold candle compaction failed")
+
+    def _maybe_repair_gaps(self, symbol_ids: list[int], now: datetime) -> None:
+        """Start a gap repair in the background when one is due and none is running."""
+        every = gap_repair_every()
+        if every is None or not symbol_ids:
+            return
+        if self._next_gap_repair is not None and self._next_gap_repair > now:
+            return
+        if self._gap_repair_task is not None and not self._gap_repair_task.done():
+            return
+        self._next_gap_repair = now + every
+        self._gap_repair_task = asyncio.create_task(self._repair_gaps(symbol_ids, now))
+
+    async def _repair_gaps(self, symbol_ids: list[int], now: datetime) -> None:
+        # Runs beside the tick loop with its own session, so a long repair
+        # neither holds up fetching nor counts against the tick budget.
         db = SessionLocal()
         try:
-            symbols = (
-                db.query(Symbol)
-                .filter(Symbol.is_active.is_(True))
-                .order_by(Symbol.id.asc())
-                .all()
+            await repair_gaps(
+                db, now=now, symbol_ids=symbol_ids, provider=self._provider, guard=self
             )
-            active_ids = {s.id for s in symbols}
-            for key in list(self._next_run.keys()):
-                if key[0] not in active_ids:
-                    self._next_run.pop(key, None)
-
-            for symbol in symbols:
-                for interval in ALLOWED_INTERVALS:
-                    key = (symbol.id, interval)
-                    due_at = self._next_run.get(key)
-                    if due_at is not None and due_at > now:
-                        continue
-
-                    attempt_time = datetime.now(tz=UTC)
-                    status = _get_or_create_status(db, symbol.id)
-                    status.last_attempt_at_utc = attempt_time
-                    status.updated_at_utc = attempt_time
-                    db.commit()
-
-                    try:
-                        ingest_symbol_interval(db, symbol, interval, now=now)
-                    except Exception as e:
-                        db.rollback()
-                        error_time = datetime.now(tz=UTC)
-                        status = _get_or_create_status(db, symbol.id)
-                        status.last_error = _truncate_error(str(e))
-                        status.consecutive_failures = (
-                            status.consecutive_failures or 0
-                        ) + 1
-                        status.updated_at_utc = error_time
-                        db.commit()
-                        self.state.last_error = str(e)
-                        logger.exception(
-                            "collector ingest failed (symbol=%s interval=%s)",
-                            symbol.symbol,
-                            interval,
-                        )
-                    else:
-                        success_time = datetime.now(tz=UTC)
-                        status.last_success_at_utc = success_time
-                        status.last_error = None
-                        status.consecutive_failures = 0
-                        status.updated_at_utc = success_time
-                        db.commit()
-                    finally:
-                        self._next_run[key] = now + _interval_step(interval)
+        except Exception:
+            db.rollback()
+            logger.exception("gap repair failed")
         finally:
             db.close()
 
 
-COLLECTOR = Collector()
+COLLECTOR = Collector(provider=get_provider())
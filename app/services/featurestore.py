@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import Symbol
+from app.services.coldstore import OHLCV_FIELDS, read_candle_columns
+from app.services.intervals import ALLOWED_INTERVALS
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = {"ts": "<i8", **{name: "<f8" for name in OHLCV_FIELDS}}
+_HEADER_NAME = "header.json"
+_VERSION = 1
+_LOCK = threading.Lock()
+
+
+def feature_store_root() -> Path | None:
+    """
+    Root directory of the exported feature store.
+
+    Configured via `FEATURE_STORE_DIR`; unset disables the export.
+    """
+    root = os.getenv("FEATURE_STORE_DIR")
+    return Path(root) if root else None
+
+
+def series_dir(root: Path, symbol: str, interval: str) -> Path:
+    return root / interval / quote(symbol, safe="")
+
+
+def _to_epoch(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=UTC)
+    return int(dt.timestamp())
+
+
+def _month_key(ts: int) -> int:
+    dt = datetime.fromtimestamp(ts, tz=UTC)
+    return int(dt.replace(day=1, hour=0, minute=0, second=0).timestamp())
+
+
+def _read_header(path: Path, symbol: str, interval: str) -> dict:
+    header_path = path / _HEADER_NAME
+    if header_path.exists():
+        return json.loads(header_path.read_text())
+    return {
+        "version": _VERSION,
+        "symbol": symbol,
+        "interval": interval,
+        "rows": 0,
+        "columns": COLUMNS,
+        "first_ts": None,
+        "last_ts": None,
+        # [month start epoch, first row offset] pairs, sorted
+        "offsets": [],
+    }
+
+
+def _write_header(path: Path, header: dict) -> None:
+    tmp = path / f"{_HEADER_NAME}.tmp"
+    tmp.write_text(json.dumps(header))
+    os.replace(tmp, path / _HEADER_NAME)
+
+
+def _column_path(path: Path, name: str) -> Path:
+    return path / f"{name}.{COLUMNS[name][1:]}"
+
+
+@dataclass
+class FeatureSeries:
+    """Column views of one (symbol, interval); `ts` holds UTC epoch seconds."""
+
+    ts: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    offsets: list[list[int]]
+
+    def __len__(self) -> int:
+        return int(self.ts.shape[0])
+
+    def _slice(self, lo: int, hi: int) -> FeatureSeries:
+        return FeatureSeries(
+            self.ts[lo:hi],
+            *(getattr(self, f)[lo:hi] for f in OHLCV_FIELDS),
+            offsets=[],
+        )
+
+    def range(self, start: datetime | None = None, end: datetime | None = None) -> FeatureSeries:
+        """Rows in `[start, end)`; the result still views the mapped files."""
+
+        lo, hi = 0, len(self)
+        months = [m for m, _ in self.offsets]
+        if start is not None:
+            t = _to_epoch(start)
+            i = bisect.bisect_right(months, t) - 1
+            base = self.offsets[i][1] if i >= 0 else 0
+            lo = base + int(np.searchsorted(self.ts[base:], t, side="left"))
+        if end is not None:
+            t = _to_epoch(end)
+            i = bisect.bisect_right(months, t)
+            stop = self.offsets[i][1] if i < len(self.offsets) else len(self)
+            hi = lo + int(np.searchsorted(self.ts[lo:stop], t, side="left"))
+        return self._slice(lo, max(lo, hi))
+
+
+def open_series(root: Path, symbol: str, interval: str) -> FeatureSeries:
+    """Map the exported columns read-only (zero-copy `np.memmap` views)."""
+
+    path = series_dir(root, symbol, interval)
+    header = _read_header(path, symbol, interval)
+    rows = header["rows"]
+    arrays = []
+    for name, dtype in COLUMNS.items():
+        if rows == 0:
+            arrays.append(np.empty(0, dtype=dtype))
+        else:
+            arrays.append(np.memmap(_column_path(path, name), dtype=dtype, mode="r", shape=(rows,)))
+    return FeatureSeries(*arrays, offsets=header["offsets"])
+
+
+def append_rows(root: Path, symbol: str, interval: str, rows: list[dict]) -> int:
+    """
+    Append candles to the exported series of (symbol, interval).
+
+    - Rows newer than the last exported ts are appended
+    - Rows for an already exported ts are patched in place (late corrections)
+    - Older rows without an exported slot (e.g. repaired gaps) are merged in by
+      rewriting the series from their month on
+
+    The header is written last, so a crash mid-append leaves the store at the
+    previous row count. Returns the number of rows added.
+    """
+
+    if not rows:
+        return 0
+
+    ts = np.fromiter((_to_epoch(r["ts_utc"]) for r in rows), dtype="<i8", count=len(rows))
+    order = np.argsort(ts, kind="stable")
+    ts = ts[order]
+    values = {
+        name: np.fromiter((float(r[name]) for r in rows), dtype="<f8", count=len(rows))[order]
+        for name in OHLCV_FIELDS
+    }
+
+    path = series_dir(root, symbol, interval)
+    with _LOCK:
+        path.mkdir(parents=True, exist_ok=True)
+        return _append(path, symbol, interval, ts, values)
+
+
+def _append(
+    path: Path,
+    symbol: str,
+    interval: str,
+    ts: np.ndarray,
+    values: dict[str, np.ndarray],
+) -> int:
+    header = _read_header(path, symbol, interval)
+    if "rewrite_from" in header:
+        _abort_rewrite(path, header)
+    n = header["rows"]
+    last_ts = header["last_ts"]
+
+    # Drop bytes of an append whose header was never written.
+    for name, dtype in COLUMNS.items():
+        col_path = _column_path(path, name)
+        with open(col_path, "ab") as f:
+            f.truncate(n * np.dtype(dtype).itemsize)
+
+    if last_ts is not None:
+        older = ts <= last_ts
+        if older.any():
+            missing = _patch_rows(path, n, ts[older], {k: v[older] for k, v in values.items()})
+            if missing.shape[0]:
+                return _merge_rows(path, header, ts, values, int(missing.min()))
+        newer = ~older
+        ts = ts[newer]
+        values = {k: v[newer] for k, v in values.items()}
+
+    ts, values = _dedupe_last(ts, values)
+    appended = int(ts.shape[0])
+    if appended == 0:
+        return 0
+
+    with open(_column_path(path, "ts"), "ab") as f:
+        f.write(ts.tobytes())
+    for name in OHLCV_FIELDS:
+        with open(_column_path(path, name), "ab") as f:
+            f.write(values[name].tobytes())
+
+    _index_months(header["offsets"], ts, n)
+    header["rows"] = n + appended
+    header["first_ts"] = header["first_ts"] if header["first_ts"] is not None else int(ts[0])
+    header["last_ts"] = int(ts[-1])
+    _write_header(path, header)
+    return appended
+
+
+def _dedupe_last(
+    ts: np.ndarray, values: dict[str, np.ndarray]
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Keep the last of each run of equal timestamps in sorted `ts`."""
+    if ts.shape[0] == 0:
+        return ts, values
+    keep = np.ones(ts.shape[0], dtype=bool)
+    keep[:-1] = ts[1:] != ts[:-1]
+    return ts[keep], {k: v[keep] for k, v in values.items()}
+
+
+def _index_months(offsets: list[list[int]], ts: np.ndarray, first_row: int) -> None:
+    for i, t in enumerate(ts.tolist()):
+        month = _month_key(t)
+        if not offsets or offsets[-1][0] != month:
+            offsets.append([month, first_row + i])
+
+
+def _patch_rows(
+    path: Path, n: int, ts: np.ndarray, values: dict[str, np.ndarray]
+) -> np.ndarray:
+    """Overwrite rows whose ts is already exported; returns the ts without a slot."""
+    stored = np.memmap(_column_path(path, "ts"), dtype="<i8", mode="r", shape=(n,))
+    idx = np.searchsorted(stored, ts)
+    found = (idx < n) & (stored[np.minimum(idx, n - 1)] == ts)
+    del stored
+    if found.any():
+        for name in OHLCV_FIELDS:
+            col = np.memmap(_column_path(path, name), dtype="<f8", mode="r+", shape=(n,))
+            col[idx[found]] = values[name][found]
+            col.flush()
+            del col
+    return ts[~found]
+
+
+def _merge_rows(
+    path: Path,
+    header: dict,
+    ts: np.ndarray,
+    values: dict[str, np.ndarray],
+    first_missing: int,
+) -> int:
+    """
+    Merge rows older than the exported tail by rewriting from their month on.
+
+    Columns are overwritten in place and only grow, so readers mapping the
+    previous row count never see a truncated file. `rewrite_from` in the header
+    marks the rewrite until it completes (see `_abort_rewrite`).
+    """
+
+    n = header["rows"]
+    month = _month_key(first_missing)
+    stored_ts = np.memmap(_column_path(path, "ts"), dtype="<i8", mode="r", shape=(n,))
+    start = int(np.searchsorted(stored_ts, month))
+    tail_ts = np.array(stored_ts[start:])
+    del stored_ts
+    tail = {}
+    for name in OHLCV_FIELDS:
+        col = np.memmap(_column_path(path, name), dtype="<f8", mode="r", shape=(n,))
+        tail[name] = np.array(col[start:])
+        del col
+
+    # Incoming rows go last so they win over stored values for the same ts.
+    incoming = ts >= month
+    merged_ts = np.concatenate((tail_ts, ts[incoming]))
+    order = np.argsort(merged_ts, kind="stable")
+    merged_ts, merged = _dedupe_last(
+        merged_ts[order],
+        {k: np.concatenate((tail[k], values[k][incoming]))[order] for k in OHLCV_FIELDS},
+    )
+
+    header["rewrite_from"] = start
+    _write_header(path, header)
+    for name, column in (("ts", merged_ts), *merged.items()):
+        with open(_column_path(path, name), "r+b") as f:
+            f.seek(start * np.dtype(COLUMNS[name]).itemsize)
+            f.write(column.tobytes())
+
+    header["offsets"] = [o for o in header["offsets"] if o[0] < month]
+    _index_months(header["offsets"], merged_ts, start)
+    header["rows"] = start + int(merged_ts.shape[0])
+    header["first_ts"] = int(merged_ts[0]) if start == 0 else header["first_ts"]
+    header["last_ts"] = int(merged_ts[-1])
+    del header["rewrite_from"]
+    _write_header(path, header)
+    return header["rows"] - n
+
+
+def _abort_rewrite(path: Path, header: dict) -> None:
+    """Drop the tail of a merge that crashed; `export_series` re-exports it."""
+    start = header.pop("rewrite_from")
+    stored = np.memmap(_column_path(path, "ts"), dtype="<i8", mode="r", shape=(header["rows"],))
+    header["last_ts"] = int(stored[start - 1]) if start else None
+    del stored
+    header["rows"] = start
+    header["first_ts"] = header["first_ts"] if start else None
+    header["offsets"] = [o for o in header["offsets"] if o[1] < start]
+    _write_header(path, header)
+    logger.warning(
+        "feature store rewrite was interrupted; dropped the tail (path=%s rows=%s)",
+        path,
+        start,
+    )
+
+
+def export_rows(symbol: str, interval: str, rows: list[dict]) -> None:
+    """Best-effort export hook for the ingest path; never raises."""
+
+    root = feature_store_root()
+    if root is None or not rows:
+        return
+    try:
+        append_rows(root, symbol, interval, rows)
+    except Exception:
+        logger.exception(
+            "feature store export failed (symbol=%s interval=%s)",
+            symbol,
+            interval,
+        )
+
+
+def export_series(
+    db: Session,
+    root: Path,
+    symbol: Symbol,
+    interval: str,
+    *,
+    rebuild: bool = False,
+) -> int:
+    """
+    Append everything newer than the last exported candle (initial backfill).
+
+    `rebuild` re-exports the whole series from the database into a fresh
+    directory and swaps it in, dropping whatever drifted (e.g. deleted rows).
+    Readers holding the old mapping keep reading the old files.
+    """
+
+    path = series_dir(root, symbol.symbol, interval)
+    if rebuild:
+        cols = read_candle_columns(db, symbol.id, interval)
+        fresh = path.with_name(f"{path.name}.rebuild")
+        stale = path.with_name(f"{path.name}.stale")
+        with _LOCK:
+            for leftover in (fresh, stale):
+                shutil.rmtree(leftover, ignore_errors=True)
+            fresh.mkdir(parents=True)
+            values = {name: getattr(cols, name).astype("<f8") for name in OHLCV_FIELDS}
+            _append(fresh, symbol.symbol, interval, cols.ts.astype("<i8"), values)
+            if path.exists():
+                os.replace(path, stale)
+            os.replace(fresh, path)
+            shutil.rmtree(stale, ignore_errors=True)
+        return len(cols)
+
+    header = _read_header(path, symbol.symbol, interval)
+    start = None
+    if header["last_ts"] is not None:
+        start = datetime.fromtimestamp(header["last_ts"] + 1, tz=UTC)
+    cols = read_candle_columns(db, symbol.id, interval, start=start)
+    return append_rows(root, symbol.symbol, interval, cols.to_rows())
+
+
+def export_all(db: Session, root: Path, *, rebuild: bool = False) -> int:
+    exported = 0
+    for symbol in db.query(Symbol).order_by(Symbol.id.asc()).all():
+        for interval in ALLOWED_INTERVALS:
+            exported += export_series(db, root, symbol, interval, rebuild=rebuild)
+    return exported
+
+
+if __name__ == "__main__":
+    import sys
+
+    from app.db import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    root = feature_store_root()
+    if root is None:
+        raise SystemExit("set FEATURE_STORE_DIR to export the feature store")
+    session = SessionLocal()
+    try:
+        exported = export_all(session, root, rebuild="--rebuild" in sys.argv[1:])
+        logger.info("exported %s rows to %s", exported, root)
+    finally:
+        session.close()
@@ -0,0 +1,538 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+from typing import Protocol
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Symbol, UnrepairableRange
+from app.services.coldstore import read_candle_columns
+from app.services.ingest import upsert_candles
+from app.services.intervals import floor_to_hour_utc, validate_interval
+from app.services.providers import CandleProvider
+from app.services.yahoo import fetch_candles
+
+logger = logging.getLogger(__name__)
+
+GAP_REPAIR_LOOKBACK_DAYS = float(os.getenv("GAP_REPAIR_LOOKBACK_DAYS", "30"))
+# Holes closer than this are fetched in one request.
+GAP_REPAIR_MERGE_HOURS = float(os.getenv("GAP_REPAIR_MERGE_HOURS", "72"))
+GAP_REPAIR_MAX_WINDOW_DAYS = float(os.getenv("GAP_REPAIR_MAX_WINDOW_DAYS", "30"))
+GAP_REPAIR_RATE_PER_SECOND = float(os.getenv("GAP_REPAIR_RATE_PER_SECOND", "2"))
+GAP_REPAIR_CONCURRENCY = int(os.getenv("GAP_REPAIR_CONCURRENCY", "4"))
+
+# Yahoo keeps 60m bars for about two years.
+_PROVIDER_HISTORY = timedelta(days=729)
+# A session slot or weekday counts as "trading" if seen on at least this share
+# of the days the most common one was seen on.
+_SESSION_MIN_SHARE = 0.5
+_SESSION_MIN_SPAN = timedelta(days=7)
+
+
+def gap_repair_every() -> timedelta | None:
+    """
+    How often the collector runs gap repair.
+
+    Configured via `GAP_REPAIR_EVERY_HOURS`; unset or `0` disables scheduled repair
+    (`POST /api/gaps/repair` still works).
+    """
+    hours = float(os.getenv("GAP_REPAIR_EVERY_HOURS", "0") or 0)
+    if hours <= 0:
+        return None
+    return timedelta(hours=hours)
+
+
+@dataclass(frozen=True)
+class Gap:
+    """Expected candles missing between two stored ones; `end_utc` is exclusive."""
+
+    start_utc: datetime
+    end_utc: datetime
+    missing: tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class RepairWindow:
+    """One provider request covering one or more gaps."""
+
+    start_utc: datetime
+    end_utc: datetime
+    gaps: tuple[Gap, ...]
+
+
+@dataclass
+class RepairReport:
+    symbols: int = 0
+    gaps: int = 0
+    windows: int = 0
+    rows_written: int = 0
+    unrepairable: int = 0
+    errors: int = 0
+    # Symbols whose partition another worker owns, and windows skipped because
+    # the series was being fetched; both are left for a later run.
+    not_owned: int = 0
+    busy: int = 0
+
+
+class FetchGuard(Protocol):
+    """Shard ownership and in-flight fetches, as tracked by the collector."""
+
+    def fetchable(self, db: Session, symbol_ids: list[int], now: datetime) -> set[int]: ...
+
+    def begin_fetch(self, symbol_id: int, interval: str) -> bool: ...
+
+    def end_fetch(self, symbol_id: int, interval: str) -> None: ...
+
+
+class RateLimiter:
+    """Spaces out `acquire` calls to at most `rate_per_second` (shared by all fetches)."""
+
+    def __init__(self, rate_per_second: float):
+        self._interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def _ensure_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+def _from_epoch(ts: int) -> datetime:
+    return datetime.fromtimestamp(int(ts), tz=UTC)
+
+
+def _zone(symbol: Symbol):
+    if not symbol.timezone:
+        return UTC
+    try:
+        return ZoneInfo(symbol.timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return UTC
+
+
+def _frequent(days_by_key: dict) -> list:
+    top = max(len(days) for days in days_by_key.values())
+    return sorted(k for k, days in days_by_key.items() if len(days) >= top * _SESSION_MIN_SHARE)
+
+
+def _learn_session(local: list[datetime]) -> tuple[list[tuple[int, int]], set[int]]:
+    """Regular local bar times and weekdays of a series."""
+    days_by_slot: dict[tuple[int, int], set[date]] = {}
+    days_by_weekday: dict[int, set[date]] = {}
+    for dt in local:
+        days_by_slot.setdefault((dt.hour, dt.minute), set()).add(dt.date())
+        days_by_weekday.setdefault(dt.weekday(), set()).add(dt.date())
+    return _frequent(days_by_slot), set(_frequent(days_by_weekday))
+
+
+def _session_timestamps(
+    day: date, last_day: date, slots: list[tuple[int, int]], weekdays: set[int], tz
+) -> np.ndarray:
+    expected: list[int] = []
+    while day <= last_day:
+        if day.weekday() in weekdays:
+            for hour, minute in slots:
+                dt = datetime(day.year, day.month, day.day, hour, minute, tzinfo=tz)
+                # Skip wall times that do not exist on DST transition days.
+                if dt.astimezone(UTC).astimezone(tz).replace(tzinfo=None) != dt.replace(
+                    tzinfo=None
+                ):
+                    continue
+                expected.append(int(dt.timestamp()))
+        day += timedelta(days=1)
+    return np.unique(np.asarray(expected, dtype=np.int64))
+
+
+def expected_timestamps(ts: np.ndarray, tz) -> np.ndarray:
+    """
+    Candle timestamps a symbol should have strictly between its first and last
+    stored candle.
+
+    The session is learned from the stored candles: local bar times (e.g. 09:30,
+    10:30, ...) and weekdays that occur regularly. Working in the exchange's
+    timezone keeps the session stable across DST changes. Holidays and
+    half-days still show up as expected; repair records them as unrepairable.
+    """
+
+    if len(ts) < 2:
+        return np.empty(0, dtype=np.int64)
+
+    local = [datetime.fromtimestamp(t, tz) for t in ts.tolist()]
+    slots, weekdays = _learn_session(local)
+    out = _session_timestamps(local[0].date(), local[-1].date(), slots, weekdays, tz)
+    return out[(out > ts[0]) & (out < ts[-1])]
+
+
+def next_session_timestamp(ts: np.ndarray, tz, after: int) -> int | None:
+    """
+    First candle timestamp of the session learned from `ts` (as in
+    `expected_timestamps`) that lies after `after`.
+
+    None when `ts` covers less than a week, too little to tell trading days apart.
+    """
+
+    if len(ts) < 2 or ts[-1] - ts[0] < _SESSION_MIN_SPAN.total_seconds():
+        return None
+    local = [datetime.fromtimestamp(t, tz) for t in ts.tolist()]
+    slots, weekdays = _learn_session(local)
+    day = datetime.fromtimestamp(after, tz).date()
+    out = _session_timestamps(day, day + timedelta(days=7), slots, weekdays, tz)
+    later = out[out > after]
+    return int(later[0]) if later.size else None
+
+
+def next_session_candle(
+    db: Session,
+    symbol: Symbol,
+    interval: str,
+    *,
+    last_ts: datetime,
+    after: datetime,
+) -> datetime | None:
+    """Next candle of the session learned from the last two weeks before `last_ts`."""
+    start = _ensure_utc(last_ts) - 2 * _SESSION_MIN_SPAN
+    cols = read_candle_columns(db, symbol.id, interval, start=start)
+    ts = next_session_timestamp(cols.ts, _zone(symbol), int(_ensure_utc(after).timestamp()))
+    return _from_epoch(ts) if ts is not None else None
+
+
+def _unrepairable_mask(
+    db: Session,
+    symbol_id: int,
+    interval: str,
+    expected: np.ndarray,
+) -> np.ndarray:
+    mask = np.zeros(len(expected), dtype=bool)
+    if len(expected) == 0:
+        return mask
+    ranges = db.execute(
+        select(UnrepairableRange.start_utc, UnrepairableRange.end_utc).where(
+            UnrepairableRange.symbol_id == symbol_id,
+            UnrepairableRange.interval == interval,
+            UnrepairableRange.start_utc <= _from_epoch(expected[-1]),
+            UnrepairableRange.end_utc > _from_epoch(expected[0]),
+        )
+    ).all()
+    for start, end in ranges:
+        lo = int(_ensure_utc(start).timestamp())
+        hi = int(_ensure_utc(end).timestamp())
+        mask |= (expected >= lo) & (expected < hi)
+    return mask
+
+
+def find_gaps(
+    db: Session,
+    symbol: Symbol,
+    interval: str = "1h",
+    *,
+    now: datetime | None = None,
+    lookback: timedelta = timedelta(days=GAP_REPAIR_LOOKBACK_DAYS),
+) -> list[Gap]:
+    """
+    Missing candles of `symbol` within `lookback`, grouped into contiguous gaps.
+
+    Only the range between stored candles is checked: before the first one is
+    backfill, after the last one is regular ingest. Known unrepairable ranges
+    are skipped.
+    """
+
+    validate_interval(interval)
+    step = timedelta(hours=1)
+    end = floor_to_hour_utc(now or datetime.now(tz=UTC))
+    cols = read_candle_columns(db, symbol.id, interval, start=end - lookback, end=end)
+    expected = expected_timestamps(cols.ts, _zone(symbol))
+
+    missing = ~np.isin(expected, cols.ts)
+    missing &= ~_unrepairable_mask(db, symbol.id, interval, expected)
+    idx = np.flatnonzero(missing)
+    if idx.size == 0:
+        return []
+
+    gaps = []
+    for run in np.split(idx, np.flatnonzero(np.diff(idx) > 1) + 1):
+        ts = expected[run]
+        gaps.append(
+            Gap(
+                start_utc=_from_epoch(ts[0]),
+                end_utc=_from_epoch(ts[-1]) + step,
+                missing=tuple(ts.tolist()),
+            )
+        )
+    return gaps
+
+
+def plan_windows(
+    gaps: list[Gap],
+    *,
+    merge_within: timedelta = timedelta(hours=GAP_REPAIR_MERGE_HOURS),
+    max_window: timedelta = timedelta(days=GAP_REPAIR_MAX_WINDOW_DAYS),
+) -> list[RepairWindow]:
+    """
+    Merge gaps into the fewest request windows.
+
+    - A gap joins the previous window if it starts within `merge_within` of its end
+    - No window spans more than `max_window` (a single gap longer than that is
+      split into several windows)
+    """
+
+    step = timedelta(hours=1)
+    windows: list[RepairWindow] = []
+    for gap in sorted(_split_long_gaps(gaps, max_window, step), key=lambda g: g.start_utc):
+        if windows:
+            last = windows[-1]
+            if (
+                gap.start_utc - last.end_utc <= merge_within
+                and gap.end_utc - last.start_utc <= max_window
+            ):
+                windows[-1] = RepairWindow(last.start_utc, gap.end_utc, last.gaps + (gap,))
+                continue
+        windows.append(RepairWindow(gap.start_utc, gap.end_utc, (gap,)))
+    return windows
+
+
+def _split_long_gaps(gaps: list[Gap], max_window: timedelta, step: timedelta) -> list[Gap]:
+    out = []
+    limit = int(max_window.total_seconds())
+    for gap in gaps:
+        chunk: list[int] = []
+        for ts in gap.missing:
+            if chunk and ts - chunk[0] >= limit:
+                out.append(Gap(_from_epoch(chunk[0]), _from_epoch(chunk[-1]) + step, tuple(chunk)))
+                chunk = []
+            chunk.append(ts)
+        out.append(Gap(_from_epoch(chunk[0]), _from_epoch(chunk[-1]) + step, tuple(chunk)))
+    return out
+
+
+def _record_unrepairable(
+    db: Session,
+    symbol_id: int,
+    interval: str,
+    missing: list[int],
+    reason: str,
+) -> int:
+    """Record one contiguous run of missing timestamps as an unrepairable range."""
+
+    if not missing:
+        return 0
+    db.add(
+        UnrepairableRange(
+            symbol_id=symbol_id,
+            interval=interval,
+            start_utc=_from_epoch(missing[0]),
+            end_utc=_from_epoch(missing[-1]) + timedelta(hours=1),
+            reason=reason,
+        )
+    )
+    return 1
+
+
+def _apply_window(
+    db: Session,
+    symbol: Symbol,
+    interval: str,
+    window: RepairWindow,
+    rows: list[dict],
+) -> tuple[int, int]:
+    """Upsert only the rows that fill gaps; returns `(rows_written, unrepairable_ranges)`."""
+
+    wanted = {ts for gap in window.gaps for ts in gap.missing}
+    fill = [r for r in rows if int(_ensure_utc(r["ts_utc"]).timestamp()) in wanted]
+    written = upsert_candles(db, symbol, interval, fill) if fill else 0
+
+    got = {int(_ensure_utc(r["ts_utc"]).timestamp()) for r in fill}
+    recorded = 0
+    for gap in window.gaps:
+        run: list[int] = []
+        for ts in gap.missing:
+            if ts in got:
+                recorded += _record_unrepairable(
+                    db, symbol.id, interval, run, "provider returned no data"
+                )
+                run = []
+            else:
+                run.append(ts)
+        recorded += _record_unrepairable(db, symbol.id, interval, run, "provider returned no data")
+    db.commit()
+    return written, recorded
+
+
+async def _fetch_window(
+    provider: CandleProvider | None,
+    limiter: RateLimiter,
+    symbol: Symbol,
+    interval: str,
+    window: RepairWindow,
+) -> list[dict]:
+    await limiter.acquire()
+    if provider is not None:
+        return await provider.fetch_candles(
+            symbol.symbol, interval, window.start_utc, window.end_utc
+        )
+    # yfinance is blocking. It must raise on failure: an empty result here marks
+    # the window's missing bars as unrepairable.
+    return await asyncio.to_thread(
+        fetch_candles,
+        symbol.symbol,
+        interval,
+        window.start_utc,
+        window.end_utc,
+        raise_errors=True,
+    )
+
+
+def _next_batch(
+    queue: list[tuple[Symbol, RepairWindow]],
+    size: int,
+    interval: str,
+    guard: FetchGuard | None,
+    report: RepairReport,
+) -> tuple[list[tuple[Symbol, RepairWindow]], list[tuple[Symbol, RepairWindow]]]:
+    """
+    Up to `size` windows of distinct symbols, claimed through `guard`.
+
+    Further windows of a symbol in the batch wait for a later batch; windows of
+    series being fetched elsewhere are dropped and counted as `busy`.
+    """
+
+    batch: list[tuple[Symbol, RepairWindow]] = []
+    rest: list[tuple[Symbol, RepairWindow]] = []
+    claimed: set[int] = set()
+    for position, (symbol, window) in enumerate(queue):
+        if len(batch) == size:
+            rest.extend(queue[position:])
+            break
+        if symbol.id in claimed:
+            rest.append((symbol, window))
+        elif guard is not None and not guard.begin_fetch(symbol.id, interval):
+            report.busy += 1
+        else:
+            claimed.add(symbol.id)
+            batch.append((symbol, window))
+    return batch, rest
+
+
+async def repair_gaps(
+    db: Session,
+    *,
+    now: datetime | None = None,
+    symbol_ids: list[int] | None = None,
+    interval: str = "1h",
+    provider: CandleProvider | None = None,
+    lookback: timedelta = timedelta(days=GAP_REPAIR_LOOKBACK_DAYS),
+    rate_per_second: float = GAP_REPAIR_RATE_PER_SECOND,
+    concurrency: int = GAP_REPAIR_CONCURRENCY,
+    guard: FetchGuard | None = None,
+) -> RepairReport:
+    """
+    Detect gaps for active symbols and refetch only the missing ranges.
+
+    - Windows from all symbols are fetched `concurrency` at a time and at most
+      `rate_per_second` requests per second
+    - Only rows for missing timestamps are written
+    - Timestamps the provider does not return, and gaps older than the provider's
+      history, are recorded in `unrepairable_ranges` and skipped on later runs
+    - Fetch errors are counted and retried on the next run; a range is only
+      recorded as unrepairable when the provider answered without its bars
+    - With a `guard`, symbols in partitions of other workers are left alone, and
+      a window is skipped while its series is being fetched elsewhere
+    """
+
+    validate_interval(interval)
+    now = now or datetime.now(tz=UTC)
+    history_start = now - _PROVIDER_HISTORY
+
+    query = db.query(Symbol).filter(Symbol.is_active.is_(True))
+    if symbol_ids is not None:
+        query = query.filter(Symbol.id.in_(symbol_ids))
+    symbols = query.order_by(Symbol.id.asc()).all()
+
+    not_owned = 0
+    if guard is not None:
+        allowed = guard.fetchable(db, [s.id for s in symbols], now)
+        not_owned = len(symbols) - len(allowed)
+        symbols = [s for s in symbols if s.id in allowed]
+
+    report = RepairReport(symbols=len(symbols), not_owned=not_owned)
+    pending: list[tuple[Symbol, RepairWindow]] = []
+    for symbol in symbols:
+        gaps = find_gaps(db, symbol, interval, now=now, lookback=lookback)
+        report.gaps += len(gaps)
+        fetchable = []
+        for gap in gaps:
+            if gap.start_utc < history_start:
+                report.unrepairable += _record_unrepairable(
+                    db, symbol.id, interval, list(gap.missing), "beyond provider history"
+                )
+            else:
+                fetchable.append(gap)
+        pending.extend((symbol, window) for window in plan_windows(fetchable))
+    db.commit()
+    report.windows = len(pending)
+
+    limiter = RateLimiter(rate_per_second)
+    batch_size = max(1, concurrency)
+    queue = pending
+    while queue:
+        batch, queue = _next_batch(queue, batch_size, interval, guard, report)
+        try:
+            results = await asyncio.gather(
+                *(_fetch_window(provider, limiter, s, interval, w) for s, w in batch),
+                return_exceptions=True,
+            )
+            for (symbol, window), rows in zip(batch, results):
+                if isinstance(rows, Exception):
+                    report.errors += 1
+                    logger.warning(
+                        "gap repair fetch failed (symbol=%s start=%s end=%s error=%s)",
+                        symbol.symbol,
+                        window.start_utc,
+                        window.end_utc,
+                        rows,
+                    )
+                    continue
+                if isinstance(rows, BaseException):
+                    raise rows
+                try:
+                    written, recorded = _apply_window(db, symbol, interval, window, rows or [])
+                except Exception:
+                    db.rollback()
+                    report.errors += 1
+                    logger.exception("gap repair write failed (symbol=%s)", symbol.symbol)
+                    continue
+                report.rows_written += written
+                report.unrepairable += recorded
+        finally:
+            if guard is not None:
+                for symbol, _ in batch:
+                    guard.end_fetch(symbol.id, interval)
+
+    logger.info(
+        "gap repair done (symbols=%s gaps=%s windows=%s rows=%s unrepairable=%s errors=%s "
+        "not_owned=%s busy=%s)",
+        report.symbols,
+        report.gaps,
+        report.windows,
+        report.rows_written,
+        report.unrepairable,
+        report.errors,
+        report.not_owned,
+        report.busy,
+    )
+    return report
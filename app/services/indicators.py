@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.models import Candle, CandleBlock
+from app.services.coldstore import CandleColumns, read_candle_columns
+from app.services.intervals import validate_interval
+
+logger = logging.getLogger(__name__)
+
+INDICATORS = ("returns", "volatility", "vwap")
+MAX_WINDOW = 10000
+
+INDICATOR_CACHE_MAX_BYTES = int(os.getenv("INDICATOR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class InvalidIndicatorError(ValueError):
+    pass
+
+
+def _ensure_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+def _epoch(dt: datetime) -> int:
+    return int(_ensure_utc(dt).timestamp())
+
+
+def _rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    out = np.full(x.shape[0], np.nan)
+    if x.shape[0] >= window:
+        c = np.concatenate(([0.0], np.cumsum(x)))
+        out[window - 1 :] = c[window:] - c[:-window]
+    return out
+
+
+def rolling_returns(cols: CandleColumns, window: int) -> np.ndarray:
+    """Simple return of `close` over the last `window` bars."""
+    out = np.full(len(cols), np.nan)
+    if len(cols) > window:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[window:] = cols.close[window:] / cols.close[:-window] - 1.0
+    return out
+
+
+def rolling_volatility(cols: CandleColumns, window: int) -> np.ndarray:
+    """Sample standard deviation of the last `window` bar-to-bar log returns."""
+    out = np.full(len(cols), np.nan)
+    if len(cols) > window:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_returns = np.log(cols.close[1:] / cols.close[:-1])
+        # Running sums of x and x^2 like `_rolling_sum`, so memory stays O(n) for
+        # any window. Centring first keeps the sums small; the variance is the same.
+        bad = ~np.isfinite(log_returns)
+        x = np.where(bad, 0.0, log_returns)
+        x -= x.mean()
+        s = _rolling_sum(x, window)[window - 1 :]
+        s2 = _rolling_sum(x * x, window)[window - 1 :]
+        var = np.maximum((s2 - s * s / window) / (window - 1), 0.0)
+        # A zero or missing close poisons only the windows it falls into.
+        var[_rolling_sum(bad, window)[window - 1 :] > 0] = np.nan
+        out[window:] = np.sqrt(var)
+    return out
+
+
+def rolling_vwap(cols: CandleColumns, window: int) -> np.ndarray:
+    """Volume-weighted typical price `(high + low + close) / 3` over `window` bars."""
+    typical = (cols.high + cols.low + cols.close) / 3.0
+    volume = _rolling_sum(cols.volume, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = _rolling_sum(typical * cols.volume, window) / volume
+    out[volume == 0] = np.nan
+    return out
+
+
+_COMPUTE = {
+    "returns": rolling_returns,
+    "volatility": rolling_volatility,
+    "vwap": rolling_vwap,
+}
+
+
+def validate_indicator(indicator: str, window: int) -> None:
+    if indicator not in _COMPUTE:
+        raise InvalidIndicatorError(f"indicator must be one of {', '.join(INDICATORS)}")
+    minimum = 2 if indicator == "volatility" else 1
+    if not minimum <= window <= MAX_WINDOW:
+        raise InvalidIndicatorError(f"window must be between {minimum} and {MAX_WINDOW}")
+
+
+@dataclass
+class IndicatorSeries:
+    ts: np.ndarray
+    values: np.ndarray
+    # Earliest candle (epoch seconds) written since the values were computed.
+    dirty_from: int | None = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.ts.nbytes + self.values.nbytes
+
+
+class IndicatorCache:
+    """
+    Full-history indicator series per (symbol, interval, indicator, window).
+
+    - `upsert_candles` reports written rows through `invalidate`; the next read
+      recomputes only from the earliest written bar (minus one window of context)
+    - Bars appended by other processes are picked up by comparing the cached
+      last timestamp with the stored one
+    - Least recently used series are evicted above `max_bytes`
+    """
+
+    def __init__(self, max_bytes: int = INDICATOR_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self._entries: OrderedDict[tuple, IndicatorSeries] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def invalidate(self, symbol_id: int, interval: str, ts_utc: list[datetime]) -> None:
+        if not ts_utc:
+            return
+        first = min(_epoch(ts) for ts in ts_utc)
+        with self._lock:
+            for key, entry in self._entries.items():
+                if key[0] == symbol_id and key[1] == interval:
+                    if entry.dirty_from is None or first < entry.dirty_from:
+                        entry.dirty_from = first
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def get(
+        self,
+        db: Session,
+        symbol_id: int,
+        interval: str,
+        indicator: str,
+        window: int,
+    ) -> IndicatorSeries:
+        validate_interval(interval)
+        validate_indicator(indicator, window)
+        key = (symbol_id, interval, indicator, window)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                seen = entry.dirty_from
+
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            entry = self._compute(db, symbol_id, interval, indicator, window)
+            seen = None
+        else:
+            dirty_from = entry.dirty_from
+            last = _last_ts(db, symbol_id, interval)
+            if last is not None and (entry.ts.shape[0] == 0 or last > entry.ts[-1]):
+                tail = int(entry.ts[-1]) + 1 if entry.ts.shape[0] else last
+                dirty_from = tail if dirty_from is None else min(dirty_from, tail)
+            if dirty_from is None:
+                with self._lock:
+                    self.hits += 1
+                return entry
+            with self._lock:
+                self.extensions += 1
+            entry = self._extend(db, symbol_id, interval, indicator, window, entry, dirty_from)
+
+        self._store(key, entry, seen)
+        return entry
+
+    def _compute(self, db, symbol_id, interval, indicator, window) -> IndicatorSeries:
+        cols = read_candle_columns(db, symbol_id, interval)
+        return IndicatorSeries(ts=cols.ts, values=_COMPUTE[indicator](cols, window))
+
+    def _extend(
+        self,
+        db: Session,
+        symbol_id: int,
+        interval: str,
+        indicator: str,
+        window: int,
+        entry: IndicatorSeries,
+        dirty_from: int,
+    ) -> IndicatorSeries:
+        pos = int(np.searchsorted(entry.ts, dirty_from))
+        # One window of unchanged bars before `pos` is enough context for every indicator.
+        context = pos - window
+        if context <= 0:
+            return self._compute(db, symbol_id, interval, indicator, window)
+
+        start = datetime.fromtimestamp(int(entry.ts[context]), tz=UTC)
+        cols = read_candle_columns(db, symbol_id, interval, start=start)
+        if not np.array_equal(cols.ts[:window], entry.ts[context:pos]):
+            return self._compute(db, symbol_id, interval, indicator, window)
+
+        values = _COMPUTE[indicator](cols, window)
+        return IndicatorSeries(
+            ts=np.concatenate((entry.ts[:pos], cols.ts[window:])),
+            values=np.concatenate((entry.values[:pos], values[window:])),
+        )
+
+    def _store(self, key: tuple, entry: IndicatorSeries, seen: int | None) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+                # Keep writes reported while the series was being recomputed.
+                if old.dirty_from != seen:
+                    entry.dirty_from = old.dirty_from
+            self._entries[key] = entry
+            self.bytes += entry.nbytes
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+
+
+def _last_ts(db: Session, symbol_id: int, interval: str) -> int | None:
+    hot = db.execute(
+        select(cast(func.strftime("%s", func.max(Candle.ts_utc)), Integer)).where(
+            Candle.symbol_id == symbol_id, Candle.interval == interval
+        )
+    ).scalar_one_or_none()
+    cold = db.execute(
+        select(func.max(CandleBlock.last_ts_utc)).where(
+            CandleBlock.symbol_id == symbol_id, CandleBlock.interval == interval
+        )
+    ).scalar_one_or_none()
+    # A late hot row can sit below the newest cold block.
+    candidates = [t for t in (hot, _epoch(cold) if cold is not None else None) if t is not None]
+    return max(candidates) if candidates else None
+
+
+def indicator_points(
+    series: IndicatorSeries,
+    *,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> list[dict]:
+    """Points in `[start, end)`; warm-up bars without a value come back as `None`."""
+    lo = 0 if start is None else int(np.searchsorted(series.ts, _epoch(start)))
+    hi = series.ts.shape[0] if end is None else int(np.searchsorted(series.ts, _epoch(end)))
+    ts = series.ts[lo:hi].tolist()
+    values = series.values[lo:hi]
+    values = np.where(np.isfinite(values), values, np.nan).tolist()
+    return [
+        {
+            "ts_utc": datetime.fromtimestamp(t, tz=UTC),
+            "value": None if v != v else v,
+        }
+        for t, v in zip(ts, values)
+    ]
+
+
+INDICATOR_CACHE = IndicatorCache()
@@ -1,18 +1,30 @@
 from __future__ import annotations
 
+import hashlib
 import logging
+import os
+import struct
 from datetime import UTC, datetime, timedelta
 
-from sqlalchemy import func, select
+from sqlalchemy import func, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.models import Candle, Symbol
+from app.models import Candle, CandleBlock, Symbol
+from app.services.coldstore import get_cold_last_ts, read_candle_columns
+from app.services.featurestore import export_rows
+from app.services.indicators import INDICATOR_CACHE
 from app.services.intervals import floor_to_hour_utc, validate_interval
+from app.services.tracing import span
 from app.services.yahoo import fetch_candles
 
 logger = logging.getLogger(__name__)
 
+# Number of already stored candles to re-fetch so late provider corrections land.
+INGEST_OVERLAP_CANDLES = int(os.getenv("INGEST_OVERLAP_CANDLES", "0"))
+
+_OHLCV = struct.Struct("<5d")
+
 
 def _interval_step(interval: str) -> timedelta:
     validate_interval(interval)
@@ -30,28 +42,81 @@ def get_last_ts(db: Session, symbol_id: int, interval: str) -> datetime | None:
         Candle.symbol_id == symbol_id,
         Candle.interval == interval,
     )
-    return db.execute(stmt).scalar_one_or_none()
+    hot = db.execute(stmt).scalar_one_or_none()
+    # Hot rows may all have been compacted, or an old row (e.g. a repaired gap)
+    # may sit in the hot table below newer cold blocks.
+    cold = get_cold_last_ts(db, symbol_id, interval)
+    if hot is None or cold is None:
+        return hot if cold is None else cold
+    return max(hot, cold)
 
 
-def ingest_symbol_interval(
+def _nth_last_ts(db: Session, symbol_id: int, interval: str, n: int) -> datetime | None:
+    """Timestamp of the `n`-th newest stored candle (the oldest if fewer exist)."""
+    hot = (
+        db.execute(
+            select(Candle.ts_utc)
+            .where(Candle.symbol_id == symbol_id, Candle.interval == interval)
+            .order_by(Candle.ts_utc.desc())
+            .limit(n)
+        )
+        .scalars()
+        .all()
+    )
+    cold_last = get_cold_last_ts(db, symbol_id, interval)
+    if len(hot) == n and (cold_last is None or hot[-1] > cold_last):
+        return _ensure_utc(hot[-1])
+
+    # Too few hot rows above the cold blocks: read back through enough blocks.
+    start = None
+    needed = n
+    blocks = db.execute(
+        select(CandleBlock.first_ts_utc, CandleBlock.row_count)
+        .where(CandleBlock.symbol_id == symbol_id, CandleBlock.interval == interval)
+        .order_by(CandleBlock.last_ts_utc.desc())
+    )
+    for first_ts, row_count in blocks:
+        needed -= row_count
+        if needed <= 0:
+            start = _ensure_utc(first_ts)
+            break
+    ts = read_candle_columns(db, symbol_id, interval, start=start).ts[-n:]
+    if ts.shape[0] == 0:
+        return None
+    return datetime.fromtimestamp(int(ts[0]), tz=UTC)
+
+
+def candle_hash(open: float, high: float, low: float, close: float, volume: float) -> str:
+    return hashlib.blake2b(
+        _OHLCV.pack(open, high, low, close, volume),
+        digest_size=8,
+    ).hexdigest()
+
+
+def plan_fetch(
     db: Session,
     symbol: Symbol,
     interval: str,
     *,
     now: datetime | None = None,
-) -> int:
+    overlap: int | None = None,
+) -> tuple[datetime | None, datetime] | None:
     """
-    Fetch and insert candles for a single (symbol, interval).
+    Compute the `(start, end)` window to fetch for a single (symbol, interval).
 
-    - Determines `start` as `last_ts + interval_step` (or None if no data yet)
-    - Uses `end = now` (UTC)
-    - Inserts idempotently (unique constraint prevents duplicates)
-    - Ignores constraint violations (does not crash)
+    - `start` is `last_ts + interval_step` (or None if no data yet); with an
+      `overlap` (default: `INGEST_OVERLAP_CANDLES`) it is the timestamp of the
+      `overlap`-th newest stored candle, so nights and weekends are skipped
+    - `end` is the last full hour before `now` (UTC)
+
+    Returns None if no new candle can be available yet.
     """
 
     step = _interval_step(interval)
+    overlap = INGEST_OVERLAP_CANDLES if overlap is None else overlap
 
-    last_ts = get_last_ts(db, symbol.id, interval)
+    with span("get_last_ts"):
+        last_ts = get_last_ts(db, symbol.id, interval)
     start = _ensure_utc(last_ts) + step if last_ts is not None else None
     # Yahoo only serves completed 1h candles, so end must be the last full hour.
     end = floor_to_hour_utc(now or datetime.now(tz=UTC))
@@ -64,41 +129,203 @@ def ingest_symbol_interval(
             start,
             end,
         )
+        return None
+
+    if start is not None and overlap > 0:
+        with span("get_last_ts"):
+            start = _nth_last_ts(db, symbol.id, interval, overlap) or start
+    return start, end
+
+
+def ingest_symbol_interval(
+    db: Session,
+    symbol: Symbol,
+    interval: str,
+    *,
+    now: datetime | None = None,
+    overlap: int | None = None,
+) -> int:
+    """
+    Fetch and upsert candles for a single (symbol, interval).
+
+    - Fetches the window from `plan_fetch` via `yfinance`
+    - Writes only new rows and rows whose values changed (see `upsert_candles`)
+
+    Returns the number of rows written.
+    """
+
+    window = plan_fetch(db, symbol, interval, now=now, overlap=overlap)
+    if window is None:
         return 0
 
-    rows = fetch_candles(symbol.symbol, interval, start=start, end=end)
+    start, end = window
+    with span("fetch_candles"):
+        rows = fetch_candles(symbol.symbol, interval, start=start, end=end)
     if not rows:
         return 0
 
-    candles = []
+    return upsert_candles(db, symbol, interval, rows)
+
+
+def upsert_candles(db: Session, symbol: Symbol, interval: str, rows: list[dict]) -> int:
+    """
+    Insert new candles and revise changed ones.
+
+    - Rows are compared with the stored candles of the same timestamps by content hash
+    - Unchanged rows are skipped; changed rows are updated and get `revision + 1`
+    - Ignores constraint violations from concurrent writers (does not crash)
+
+    Returns the number of rows inserted or updated.
+    """
+
+    incoming: dict[datetime, dict] = {}
     for row in rows:
         ts_utc = _ensure_utc(row["ts_utc"])
-        candles.append(
-            Candle(
-                symbol_id=symbol.id,
-                interval=interval,
-                ts_utc=ts_utc,
-                open=row["open"],
-                high=row["high"],
-                low=row["low"],
-                close=row["close"],
-                volume=row["volume"],
+        values = {f: float(row[f]) for f in ("open", "high", "low", "close", "volume")}
+        incoming[ts_utc] = {
+            "ts_utc": ts_utc,
+            **values,
+            "content_hash": candle_hash(**values),
+        }
+    if not incoming:
+        return 0
+
+    existing_stmt = select(
+        Candle.id,
+        Candle.ts_utc,
+        Candle.content_hash,
+        Candle.revision,
+        Candle.open,
+        Candle.high,
+        Candle.low,
+        Candle.close,
+        Candle.volume,
+    ).where(
+        Candle.symbol_id == symbol.id,
+        Candle.interval == interval,
+        Candle.ts_utc >= min(incoming),
+        Candle.ts_utc <= max(incoming),
+    )
+    with span("upsert.lookup"):
+        existing = {_ensure_utc(r.ts_utc): r for r in db.execute(existing_stmt)}
+        cold = _cold_hashes(db, symbol.id, interval, [ts for ts in incoming if ts not in existing])
+
+    candles: list[Candle] = []
+    revisions: list[dict] = []
+    revised_ts: list[datetime] = []
+    with span("upsert.build"):
+        for ts_utc, row in incoming.items():
+            current = existing.get(ts_utc)
+            if current is None:
+                cold_hash = cold.get(ts_utc)
+                if cold_hash == row["content_hash"]:
+                    continue
+                # A changed cold candle gets a hot row, which wins over the block.
+                revision = 0 if cold_hash is None else 1
+                candles.append(
+                    Candle(symbol_id=symbol.id, interval=interval, revision=revision, **row)
+                )
+                continue
+            stored_hash = current.content_hash or candle_hash(
+                current.open, current.high, current.low, current.close, current.volume
             )
+            if stored_hash != row["content_hash"]:
+                revisions.append(
+                    {
+                        "id": current.id,
+                        **{k: v for k, v in row.items() if k != "ts_utc"},
+                        "revision": (current.revision or 0) + 1,
+                    }
+                )
+                revised_ts.append(ts_utc)
+
+    revised_rows = [incoming[existing_ts] for existing_ts in revised_ts]
+    if revisions:
+        logger.info(
+            "revising changed candles (symbol=%s interval=%s rows=%s)",
+            symbol.symbol,
+            interval,
+            len(revisions),
         )
+        db.execute(update(Candle), revisions)
+    if not candles:
+        with span("commit"):
+            db.commit()
+        with span("feature_export"):
+            _publish(symbol, interval, revised_rows)
+        return len(revisions)
 
     db.add_all(candles)
     try:
-        db.commit()
-        return len(candles)
+        with span("commit"):
+            db.commit()
+        with span("feature_export"):
+            _publish(
+                symbol,
+                interval,
+                revised_rows + [incoming[_ensure_utc(c.ts_utc)] for c in candles],
+            )
+        return len(candles) + len(revisions)
     except IntegrityError:
         db.rollback()
 
-    inserted = 0
+    written_rows: list[dict] = []
+    if revisions:
+        db.execute(update(Candle), revisions)
+        db.commit()
+        written_rows.extend(revised_rows)
+
+    try:
+        _insert_one_by_one(db, symbol, interval, candles, incoming, written_rows)
+    finally:
+        _publish(symbol, interval, written_rows)
+    return len(written_rows)
+
+
+def _cold_hashes(
+    db: Session, symbol_id: int, interval: str, ts_utc: list[datetime]
+) -> dict[datetime, str]:
+    """Content hashes of stored candles at `ts_utc` that are only in cold blocks."""
+    if not ts_utc:
+        return {}
+    cols = read_candle_columns(
+        db, symbol_id, interval, start=min(ts_utc), end=max(ts_utc) + timedelta(seconds=1)
+    )
+    wanted = {int(ts.timestamp()) for ts in ts_utc}
+    return {
+        datetime.fromtimestamp(ts, tz=UTC): candle_hash(*values)
+        for ts, *values in zip(
+            cols.ts.tolist(),
+            cols.open.tolist(),
+            cols.high.tolist(),
+            cols.low.tolist(),
+            cols.close.tolist(),
+            cols.volume.tolist(),
+        )
+        if ts in wanted
+    }
+
+
+def _publish(symbol: Symbol, interval: str, rows: list[dict]) -> None:
+    """Hand committed rows to the feature store export and the indicator cache."""
+    export_rows(symbol.symbol, interval, rows)
+    INDICATOR_CACHE.invalidate(symbol.id, interval, [r["ts_utc"] for r in rows])
+
+
+def _insert_one_by_one(
+    db: Session,
+    symbol: Symbol,
+    interval: str,
+    candles: list[Candle],
+    incoming: dict[datetime, dict],
+    written_rows: list[dict],
+) -> None:
     for candle in candles:
+        ts_utc = _ensure_utc(candle.ts_utc)
         db.add(candle)
         try:
             db.commit()
-            inserted += 1
+            written_rows.append(incoming[ts_utc])
         except IntegrityError:
             db.rollback()
         except Exception:
@@ -107,8 +334,6 @@ def ingest_symbol_interval(
                 "failed to insert candle (symbol=%s interval=%s ts_utc=%s)",
                 symbol.symbol,
                 interval,
-                candle.ts_utc,
+                ts_utc,
             )
-            return inserted
-
-    return inserted
+            return
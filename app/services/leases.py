@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+import socket
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models import CollectorWorker, RefreshRequest, ShardLease
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NUM_PARTITIONS = int(os.getenv("COLLECTOR_PARTITIONS", "16"))
+DEFAULT_LEASE_TTL_SECONDS = float(os.getenv("COLLECTOR_LEASE_TTL_SECONDS", "60"))
+
+
+def _ensure_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def partition_for(symbol_id: int, num_partitions: int) -> int:
+    return symbol_id % num_partitions
+
+
+def _ensure_partitions(db: Session, num_partitions: int) -> None:
+    stmt = sqlite_insert(ShardLease).values(
+        [{"partition": p} for p in range(num_partitions)]
+    )
+    db.execute(stmt.on_conflict_do_nothing(index_elements=["partition"]))
+
+
+def _heartbeat(db: Session, worker_id: str, now: datetime) -> None:
+    stmt = sqlite_insert(CollectorWorker).values(
+        worker_id=worker_id,
+        last_heartbeat_at_utc=now,
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["worker_id"],
+            set_={"last_heartbeat_at_utc": now},
+        )
+    )
+
+
+def _live_workers(db: Session, now: datetime, ttl: timedelta) -> set[str]:
+    stmt = select(CollectorWorker.worker_id).where(
+        CollectorWorker.last_heartbeat_at_utc > now - ttl
+    )
+    return set(db.execute(stmt).scalars())
+
+
+def _take(
+    db: Session,
+    partitions: list[int],
+    worker_id: str,
+    now: datetime,
+    ttl: timedelta,
+) -> None:
+    if not partitions:
+        return
+    # Conditional update: only partitions that are ours, unowned or expired are
+    # taken. SQLite serializes writers, so two workers cannot both win one.
+    db.execute(
+        update(ShardLease)
+        .where(
+            ShardLease.partition.in_(partitions),
+            or_(
+                ShardLease.owner == worker_id,
+                ShardLease.owner.is_(None),
+                ShardLease.expires_at_utc.is_(None),
+                ShardLease.expires_at_utc <= now,
+            ),
+        )
+        .values(owner=worker_id, expires_at_utc=now + ttl)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _release(db: Session, partitions: list[int], worker_id: str) -> None:
+    if not partitions:
+        return
+    db.execute(
+        update(ShardLease)
+        .where(ShardLease.partition.in_(partitions), ShardLease.owner == worker_id)
+        .values(owner=None, expires_at_utc=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def acquire_leases(
+    db: Session,
+    worker_id: str,
+    *,
+    now: datetime,
+    num_partitions: int = DEFAULT_NUM_PARTITIONS,
+    ttl_seconds: float = DEFAULT_LEASE_TTL_SECONDS,
+) -> set[int]:
+    """
+    Heartbeat, renew held leases and claim free ones up to a fair share.
+
+    - The fair share is `ceil(num_partitions / live_workers)`
+    - Leases held beyond the fair share are released so new workers can join
+    - Expired leases of dead workers are taken over
+
+    Returns the set of partitions this worker owns after the call.
+    """
+
+    ttl = timedelta(seconds=ttl_seconds)
+    _ensure_partitions(db, num_partitions)
+    _heartbeat(db, worker_id, now)
+
+    live = _live_workers(db, now, ttl) | {worker_id}
+    fair_share = math.ceil(num_partitions / len(live))
+
+    leases = db.execute(
+        select(ShardLease.partition, ShardLease.owner, ShardLease.expires_at_utc)
+        .where(ShardLease.partition < num_partitions)
+        .order_by(ShardLease.partition.asc())
+    ).all()
+
+    mine = [p for p, owner, _ in leases if owner == worker_id]
+    keep, surplus = mine[:fair_share], mine[fair_share:]
+    claimable = [
+        (p, owner)
+        for p, owner, expires_at in leases
+        if owner != worker_id
+        and (owner is None or expires_at is None or _ensure_utc(expires_at) <= now)
+    ][: max(0, fair_share - len(keep))]
+
+    _release(db, surplus, worker_id)
+    _take(db, keep + [p for p, _ in claimable], worker_id, now, ttl)
+
+    held = set(
+        db.execute(
+            select(ShardLease.partition).where(
+                ShardLease.partition < num_partitions,
+                ShardLease.owner == worker_id,
+            )
+        ).scalars()
+    )
+    for partition, owner in claimable:
+        if owner is not None and partition in held:
+            logger.info(
+                "took over expired lease (partition=%s previous_owner=%s)",
+                partition,
+                owner,
+            )
+
+    db.commit()
+    return held
+
+
+def partition_owner(db: Session, partition: int, *, now: datetime) -> str | None:
+    """Worker holding an unexpired lease on `partition`, if any. Read-only."""
+    row = db.execute(
+        select(ShardLease.owner, ShardLease.expires_at_utc).where(ShardLease.partition == partition)
+    ).first()
+    if row is None or row.owner is None or row.expires_at_utc is None:
+        return None
+    return row.owner if _ensure_utc(row.expires_at_utc) > now else None
+
+
+def partition_owners(db: Session, *, now: datetime) -> dict[int, str]:
+    """Workers holding unexpired leases, by partition. Read-only."""
+    rows = db.execute(
+        select(ShardLease.partition, ShardLease.owner, ShardLease.expires_at_utc).where(
+            ShardLease.owner.is_not(None), ShardLease.expires_at_utc.is_not(None)
+        )
+    )
+    return {p: owner for p, owner, expires_at in rows if _ensure_utc(expires_at) > now}
+
+
+def request_refresh(db: Session, symbol_id: int, interval: str, *, now: datetime) -> None:
+    """Ask the partition's owner to fetch the series on its next tick."""
+    stmt = sqlite_insert(RefreshRequest).values(
+        symbol_id=symbol_id,
+        interval=interval,
+        requested_at_utc=now,
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["symbol_id", "interval"],
+            set_={"requested_at_utc": now},
+        )
+    )
+    db.commit()
+
+
+def take_refresh_requests(db: Session, symbol_ids: set[int]) -> set[tuple[int, str]]:
+    """Pop the pending refresh requests of `symbol_ids` (the caller's own symbols)."""
+    pending = {
+        (symbol_id, interval)
+        for symbol_id, interval in db.execute(
+            select(RefreshRequest.symbol_id, RefreshRequest.interval)
+        )
+        if symbol_id in symbol_ids
+    }
+    if pending:
+        db.execute(
+            delete(RefreshRequest).where(
+                RefreshRequest.symbol_id.in_({symbol_id for symbol_id, _ in pending})
+            )
+        )
+        db.commit()
+    return pending
+
+
+def release_leases(db: Session, worker_id: str) -> None:
+    db.execute(
+        update(ShardLease)
+        .where(ShardLease.owner == worker_id)
+        .values(owner=None, expires_at_utc=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(delete(CollectorWorker).where(CollectorWorker.worker_id == worker_id))
+    db.commit()
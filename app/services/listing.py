@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import and_, case, func, or_, tuple_
+from sqlalchemy.orm import Session
+
+from app.models import CollectorStatus, Symbol
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+SORT_KEYS = ("id", "failures", "stale")
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class InvalidSortError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class SymbolFilters:
+    exchange: str | None = None
+    active: bool | None = None
+    # True: only failing symbols, False: only healthy ones.
+    errors: bool | None = None
+
+
+@dataclass
+class SymbolPage:
+    rows: list[tuple[Symbol, CollectorStatus | None]]
+    next_cursor: str | None
+
+
+@dataclass
+class StatusCounts:
+    total: int = 0
+    active: int = 0
+    inactive: int = 0
+    failing: int = 0
+    by_exchange: dict[str, int] = field(default_factory=dict)
+
+
+def encode_cursor(sort: str, key: object, symbol_id: int) -> str:
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    raw = json.dumps([sort, key, symbol_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple[object, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, key, symbol_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursorError("malformed cursor")
+    if cursor_sort != sort or not isinstance(symbol_id, int):
+        raise InvalidCursorError("cursor does not match the requested sort")
+    if sort == "stale" and key is not None:
+        try:
+            key = datetime.fromisoformat(key)
+        except (TypeError, ValueError):
+            raise InvalidCursorError("malformed cursor")
+    return key, symbol_id
+
+
+def list_symbol_status(
+    db: Session,
+    *,
+    filters: SymbolFilters = SymbolFilters(),
+    sort: str = "id",
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> SymbolPage:
+    """
+    One keyset-paginated page of symbols joined with their collector status.
+
+    - `id`: ascending symbol id (symbols without a status row are included)
+    - `failures`: most consecutive failures first
+    - `stale`: oldest successful fetch first, never-succeeded symbols leading
+
+    The cursor encodes the sort key of the last row, so each page is an index
+    range scan regardless of how deep into the listing it is.
+    """
+
+    if sort not in SORT_KEYS:
+        raise InvalidSortError(f"sort must be one of: {', '.join(SORT_KEYS)}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    # Status-driven sorts/filters join on the status row so SQLite can walk
+    # the collector_status indexes; every API-created symbol has one.
+    if sort == "id" and filters.errors is None:
+        query = db.query(Symbol, CollectorStatus).outerjoin(
+            CollectorStatus, CollectorStatus.symbol_id == Symbol.id
+        )
+    else:
+        query = db.query(Symbol, CollectorStatus).join(
+            CollectorStatus, CollectorStatus.symbol_id == Symbol.id
+        )
+
+    if filters.exchange is not None:
+        query = query.filter(Symbol.exchange == filters.exchange)
+    if filters.active is not None:
+        query = query.filter(Symbol.is_active.is_(filters.active))
+    if filters.errors is True:
+        query = query.filter(CollectorStatus.consecutive_failures > 0)
+    elif filters.errors is False:
+        query = query.filter(CollectorStatus.consecutive_failures == 0)
+
+    after = decode_cursor(cursor, sort) if cursor else None
+
+    if sort == "id":
+        if after is not None:
+            query = query.filter(Symbol.id > after[1])
+        query = query.order_by(Symbol.id.asc())
+    elif sort == "failures":
+        failures, symbol_id = CollectorStatus.consecutive_failures, CollectorStatus.symbol_id
+        if after is not None:
+            query = query.filter(tuple_(failures, symbol_id) < tuple_(*after))
+        query = query.order_by(failures.desc(), symbol_id.desc())
+    else:
+        # SQLite sorts NULLs first; row-value comparisons against NULL are never true.
+        last_success, symbol_id = CollectorStatus.last_success_at_utc, CollectorStatus.symbol_id
+        if after is not None:
+            key, after_id = after
+            if key is None:
+                query = query.filter(
+                    or_(
+                        last_success.is_not(None),
+                        and_(last_success.is_(None), symbol_id > after_id),
+                    )
+                )
+            else:
+                query = query.filter(tuple_(last_success, symbol_id) > tuple_(key, after_id))
+        query = query.order_by(last_success.asc(), symbol_id.asc())
+
+    rows = [tuple(row) for row in query.limit(limit + 1).all()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        symbol, status = rows[-1]
+        if sort == "id":
+            key = None
+        elif sort == "failures":
+            key = status.consecutive_failures
+        else:
+            key = status.last_success_at_utc
+        next_cursor = encode_cursor(sort, key, symbol.id)
+    return SymbolPage(rows=rows, next_cursor=next_cursor)
+
+
+def status_counts(db: Session) -> StatusCounts:
+    """Dashboard totals from a single GROUP BY over symbols and their status."""
+
+    failing = case((CollectorStatus.consecutive_failures > 0, 1), else_=0)
+    rows = (
+        db.query(Symbol.exchange, Symbol.is_active, failing, func.count(Symbol.id))
+        .outerjoin(CollectorStatus, CollectorStatus.symbol_id == Symbol.id)
+        .group_by(Symbol.exchange, Symbol.is_active, failing)
+        .all()
+    )
+
+    counts = StatusCounts()
+    for exchange, is_active, is_failing, n in rows:
+        counts.total += n
+        if is_active:
+            counts.active += n
+        else:
+            counts.inactive += n
+        if is_failing:
+            counts.failing += n
+        name = exchange or "-"
+        counts.by_exchange[name] = counts.by_exchange.get(name, 0) + n
+    counts.by_exchange = dict(sorted(counts.by_exchange.items()))
+    return counts
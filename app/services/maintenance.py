@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from app.db import DB_PATH, engine
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshots")
+SNAPSHOT_PAGES_PER_STEP = int(os.getenv("SNAPSHOT_PAGES_PER_STEP", "256"))
+SNAPSHOT_STEP_SLEEP_MS = float(os.getenv("SNAPSHOT_STEP_SLEEP_MS", "10"))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "7"))
+VACUUM_PAGES_PER_STEP = int(os.getenv("VACUUM_PAGES_PER_STEP", "512"))
+VACUUM_STEP_SLEEP_MS = float(os.getenv("VACUUM_STEP_SLEEP_MS", "10"))
+# Rows sampled per index by ANALYZE; keeps it fast on large tables.
+ANALYZE_LIMIT = int(os.getenv("ANALYZE_LIMIT", "1000"))
+
+_CHECK_EVERY_SECONDS = 60.0
+_AUTO_VACUUM_INCREMENTAL = 2
+
+
+def _every(name: str, default: str) -> timedelta | None:
+    hours = float(os.getenv(name, default) or 0)
+    if hours <= 0:
+        return None
+    return timedelta(hours=hours)
+
+
+def snapshot_every() -> timedelta | None:
+    """Snapshot schedule via `SNAPSHOT_EVERY_HOURS`; unset or `0` disables it."""
+    return _every("SNAPSHOT_EVERY_HOURS", "0")
+
+
+def optimize_every() -> timedelta | None:
+    """Incremental vacuum + ANALYZE schedule via `MAINTENANCE_EVERY_HOURS` (default 24)."""
+    return _every("MAINTENANCE_EVERY_HOURS", "24")
+
+
+class MaintenanceBusyError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class SnapshotResult:
+    path: str
+    started_at_utc: datetime
+    duration_seconds: float
+    pages: int
+    bytes: int
+    steps: int
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.duration_seconds if self.duration_seconds > 0 else 0.0
+
+
+@dataclass(frozen=True)
+class OptimizeResult:
+    started_at_utc: datetime
+    vacuum_supported: bool
+    freed_pages: int
+    freelist_pages: int
+    vacuum_seconds: float
+    analyze_seconds: float
+
+
+def create_snapshot(
+    *,
+    dest_dir: str | None = None,
+    pages_per_step: int = SNAPSHOT_PAGES_PER_STEP,
+    step_sleep_seconds: float = SNAPSHOT_STEP_SLEEP_MS / 1000.0,
+    keep: int = SNAPSHOT_KEEP,
+) -> SnapshotResult:
+    """
+    Copy the live database to `dest_dir` with SQLite's online backup API.
+
+    - Copies `pages_per_step` pages per step and sleeps between steps, so the
+      collector's writes are never blocked for long
+    - Holds a read transaction on the source for the whole copy. In WAL mode this
+      pins one consistent snapshot; without it every concurrent commit would
+      restart the backup
+    - Writes to a `.tmp` file and renames it when complete; keeps the newest
+      `keep` snapshots
+    """
+
+    dest = Path(dest_dir or SNAPSHOT_DIR)
+    dest.mkdir(parents=True, exist_ok=True)
+    started = datetime.now(tz=UTC)
+    final = dest / f"{Path(DB_PATH).stem}-{started:%Y%m%dT%H%M%S%fZ}.db"
+    tmp = final.with_suffix(".db.tmp")
+
+    steps = 0
+
+    def _progress(_status: int, remaining: int, _total: int) -> None:
+        nonlocal steps
+        steps += 1
+        if remaining and step_sleep_seconds > 0:
+            time.sleep(step_sleep_seconds)
+
+    raw = engine.raw_connection()
+    try:
+        source: sqlite3.Connection = raw.driver_connection
+        target = sqlite3.connect(tmp)
+        try:
+            t0 = time.perf_counter()
+            source.execute("BEGIN")
+            try:
+                # A deferred transaction takes its read snapshot on the first read.
+                source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+                page_size = source.execute("PRAGMA page_size").fetchone()[0]
+                pages = source.execute("PRAGMA page_count").fetchone()[0]
+                source.backup(target, pages=pages_per_step, progress=_progress)
+            finally:
+                source.execute("ROLLBACK")
+            duration = time.perf_counter() - t0
+        finally:
+            target.close()
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        raw.close()
+
+    os.replace(tmp, final)
+    _prune_snapshots(dest, keep)
+
+    result = SnapshotResult(
+        path=str(final),
+        started_at_utc=started,
+        duration_seconds=duration,
+        pages=pages,
+        bytes=pages * page_size,
+        steps=steps,
+    )
+    logger.info(
+        "snapshot written (path=%s bytes=%s seconds=%.2f mib_per_s=%.1f)",
+        result.path,
+        result.bytes,
+        result.duration_seconds,
+        result.bytes_per_second / (1024 * 1024),
+    )
+    return result
+
+
+def _prune_snapshots(dest: Path, keep: int) -> None:
+    if keep <= 0:
+        return
+    snapshots = sorted(dest.glob(f"{Path(DB_PATH).stem}-*.db"))
+    for old in snapshots[:-keep]:
+        old.unlink(missing_ok=True)
+
+
+def optimize(
+    *,
+    pages_per_step: int = VACUUM_PAGES_PER_STEP,
+    step_sleep_seconds: float = VACUUM_STEP_SLEEP_MS / 1000.0,
+    analyze_limit: int = ANALYZE_LIMIT,
+) -> OptimizeResult:
+    """
+    Return free pages to the filesystem in small steps, then refresh planner stats.
+
+    `incremental_vacuum` needs `auto_vacuum=INCREMENTAL`, which new databases get
+    from `app.db`. Older databases report `vacuum_supported=False` until they are
+    converted once offline (`PRAGMA auto_vacuum=INCREMENTAL; VACUUM;`).
+    """
+
+    started = datetime.now(tz=UTC)
+    freed = 0
+    raw = engine.raw_connection()
+    try:
+        conn: sqlite3.Connection = raw.driver_connection
+        t0 = time.perf_counter()
+        supported = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == _AUTO_VACUUM_INCREMENTAL
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while supported and free > 0:
+            # executescript steps the pragma to completion; execute() frees a single page.
+            conn.executescript(f"PRAGMA incremental_vacuum({int(pages_per_step)});")
+            remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if remaining >= free:
+                break
+            freed += free - remaining
+            free = remaining
+            if free and step_sleep_seconds > 0:
+                time.sleep(step_sleep_seconds)
+        vacuum_seconds = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        conn.executescript(f"PRAGMA analysis_limit={int(analyze_limit)}; ANALYZE;")
+        analyze_seconds = time.perf_counter() - t0
+    finally:
+        raw.close()
+
+    logger.info(
+        "database optimized (freed_pages=%s freelist=%s vacuum_s=%.2f analyze_s=%.2f)",
+        freed,
+        free,
+        vacuum_seconds,
+        analyze_seconds,
+    )
+    return OptimizeResult(
+        started_at_utc=started,
+        vacuum_supported=supported,
+        freed_pages=freed,
+        freelist_pages=free,
+        vacuum_seconds=vacuum_seconds,
+        analyze_seconds=analyze_seconds,
+    )
+
+
+@dataclass
+class MaintenanceState:
+    running: str | None = None
+    last_snapshot: SnapshotResult | None = None
+    last_optimize: OptimizeResult | None = None
+    last_error: str | None = None
+
+
+class MaintenanceScheduler:
+    """
+    Runs snapshots and optimize passes on their schedules, one operation at a time.
+
+    Work runs in a thread so the event loop (and the collector) keep going.
+    """
+
+    def __init__(self):
+        self.state = MaintenanceState()
+        self._lock = threading.Lock()
+        self._task: asyncio.Task[None] | None = None
+        self._next_snapshot: datetime | None = None
+        self._next_optimize: datetime | None = None
+
+    def status(self) -> MaintenanceState:
+        return self.state
+
+    def snapshot(self, **kwargs) -> SnapshotResult:
+        result = self._run("snapshot", create_snapshot, **kwargs)
+        self.state.last_snapshot = result
+        return result
+
+    def optimize(self, **kwargs) -> OptimizeResult:
+        result = self._run("optimize", optimize, **kwargs)
+        self.state.last_optimize = result
+        return result
+
+    def _run(self, name: str, fn, **kwargs):
+        if not self._lock.acquire(blocking=False):
+            raise MaintenanceBusyError(f"{self.state.running} already running")
+        self.state.running = name
+        try:
+            return fn(**kwargs)
+        except Exception as e:
+            self.state.last_error = f"{name}: {e}"
+            raise
+        finally:
+            self.state.running = None
+            self._lock.release()
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        now = datetime.now(tz=UTC)
+        snapshot, optimize_ = snapshot_every(), optimize_every()
+        self._next_snapshot = now + snapshot if snapshot else None
+        self._next_optimize = now + optimize_ if optimize_ else None
+        self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self) -> None:
+        task = self._task
+        self._task = None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run_loop(self) -> None:
+        while True:
+            await asyncio.sleep(_CHECK_EVERY_SECONDS)
+            now = datetime.now(tz=UTC)
+            if self._next_snapshot is not None and self._next_snapshot <= now:
+                self._next_snapshot = now + snapshot_every()
+                await self._run_scheduled(self.snapshot)
+            if self._next_optimize is not None and self._next_optimize <= now:
+                self._next_optimize = now + optimize_every()
+                await self._run_scheduled(self.optimize)
+
+    async def _run_scheduled(self, fn) -> None:
+        try:
+            await asyncio.to_thread(fn)
+        except MaintenanceBusyError:
+            logger.info("scheduled maintenance skipped (running=%s)", self.state.running)
+        except Exception:
+            logger.exception("scheduled maintenance failed")
+
+
+MAINTENANCE = MaintenanceScheduler()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.models import Candle, CandleBlock, Symbol
+from app.services.coldstore import decode_block
+from app.services.intervals import validate_interval
+
+logger = logging.getLogger(__name__)
+
+MATRIX_FIELDS = ("open", "high", "low", "close", "volume", "returns")
+
+MATRIX_CACHE_TTL_SECONDS = float(os.getenv("MATRIX_CACHE_TTL_SECONDS", "60"))
+MATRIX_CACHE_MAX_ENTRIES = int(os.getenv("MATRIX_CACHE_MAX_ENTRIES", "16"))
+MATRIX_CACHE_MAX_BYTES = int(os.getenv("MATRIX_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_CACHE: OrderedDict[tuple, tuple[float, bytes]] = OrderedDict()
+_CACHE_BYTES = 0
+# Request handlers run in a threadpool.
+_CACHE_LOCK = threading.Lock()
+
+
+class InvalidMatrixFieldError(ValueError):
+    pass
+
+
+class UnknownSymbolsError(LookupError):
+    def __init__(self, symbols: list[str]):
+        super().__init__(f"unknown symbols: {', '.join(symbols)}")
+        self.symbols = symbols
+
+
+@dataclass
+class PriceMatrix:
+    """`values[i, j]` is the value of `symbols[i]` at `timestamps[j]` (epoch seconds)."""
+
+    symbols: list[str]
+    timestamps: np.ndarray
+    values: np.ndarray
+
+    def to_npz(self) -> bytes:
+        buf = io.BytesIO()
+        np.savez(
+            buf,
+            values=self.values,
+            symbols=np.array(self.symbols, dtype=str),
+            timestamps=self.timestamps,
+        )
+        return buf.getvalue()
+
+
+def _ensure_utc(dt: datetime | None) -> datetime | None:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+def _resolve_symbols(db: Session, symbols: list[str]) -> dict[str, int]:
+    rows = db.execute(select(Symbol.symbol, Symbol.id).where(Symbol.symbol.in_(symbols))).all()
+    ids = {name: symbol_id for name, symbol_id in rows}
+    missing = [s for s in symbols if s not in ids]
+    if missing:
+        raise UnknownSymbolsError(missing)
+    return ids
+
+
+def _scan_hot(
+    db: Session,
+    symbol_ids: list[int],
+    column: str,
+    interval: str,
+    start: datetime | None,
+    end: datetime | None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # One scan for all symbols; epoch seconds are computed in SQLite so no
+    # datetime objects are built per row. Order does not matter: cells are
+    # placed with `searchsorted` on the sorted timestamp axis.
+    stmt = select(
+        Candle.symbol_id,
+        cast(func.strftime("%s", Candle.ts_utc), Integer),
+        getattr(Candle, column),
+    ).where(Candle.symbol_id.in_(symbol_ids), Candle.interval == interval)
+    if start is not None:
+        stmt = stmt.where(Candle.ts_utc >= start)
+    if end is not None:
+        stmt = stmt.where(Candle.ts_utc < end)
+
+    rows = db.execute(stmt).all()
+    n = len(rows)
+    sids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+    ts = np.fromiter((r[1] for r in rows), dtype=np.int64, count=n)
+    vals = np.fromiter((r[2] for r in rows), dtype=np.float64, count=n)
+    return sids, ts, vals
+
+
+def _scan_cold(
+    db: Session,
+    symbol_ids: list[int],
+    column: str,
+    interval: str,
+    start: datetime | None,
+    end: datetime | None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    stmt = select(CandleBlock.symbol_id, CandleBlock.payload).where(
+        CandleBlock.symbol_id.in_(symbol_ids),
+        CandleBlock.interval == interval,
+    )
+    if start is not None:
+        stmt = stmt.where(CandleBlock.last_ts_utc >= start)
+    if end is not None:
+        stmt = stmt.where(CandleBlock.first_ts_utc < end)
+
+    sids, ts, vals = [], [], []
+    for symbol_id, payload in db.execute(stmt):
+        cols = decode_block(payload)
+        mask = np.ones(len(cols), dtype=bool)
+        if start is not None:
+            mask &= cols.ts >= int(start.timestamp())
+        if end is not None:
+            mask &= cols.ts < int(end.timestamp())
+        ts.append(cols.ts[mask])
+        vals.append(getattr(cols, column)[mask])
+        sids.append(np.full(int(mask.sum()), symbol_id, dtype=np.int64))
+    if not ts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float64)
+    return np.concatenate(sids), np.concatenate(ts), np.concatenate(vals)
+
+
+def build_matrix(
+    db: Session,
+    symbols: list[str],
+    field: str,
+    *,
+    interval: str = "1h",
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> PriceMatrix:
+    """
+    Build a symbols x timestamps matrix aligned on the union of timestamps.
+
+    Missing cells are NaN. `returns` is the simple close-to-close return between
+    adjacent timestamps of the aligned axis (NaN if either side is missing).
+    """
+
+    validate_interval(interval)
+    if field not in MATRIX_FIELDS:
+        raise InvalidMatrixFieldError(f"field must be one of {', '.join(MATRIX_FIELDS)}")
+
+    start = _ensure_utc(start)
+    end = _ensure_utc(end)
+    ids = _resolve_symbols(db, symbols)
+    symbol_ids = [ids[s] for s in symbols]
+    column = "close" if field == "returns" else field
+
+    # Cold values first, hot rows last: the last value per cell wins below.
+    cold = _scan_cold(db, symbol_ids, column, interval, start, end)
+    hot = _scan_hot(db, symbol_ids, column, interval, start, end)
+    sids, ts, vals = (np.concatenate(parts) for parts in zip(cold, hot))
+
+    axis = np.unique(ts)
+    values = np.full((len(symbols), axis.shape[0]), np.nan, dtype=np.float64)
+    if ts.shape[0]:
+        row_of = {symbol_id: i for i, symbol_id in enumerate(symbol_ids)}
+        rows = np.fromiter((row_of[s] for s in sids.tolist()), dtype=np.int64, count=sids.shape[0])
+        cells = rows * axis.shape[0] + np.searchsorted(axis, ts)
+        # Fancy assignment with repeated indices has no defined winner, so keep
+        # only the last occurrence of each cell explicitly.
+        _, last = np.unique(cells[::-1], return_index=True)
+        keep = cells.shape[0] - 1 - last
+        values.flat[cells[keep]] = vals[keep]
+
+    if field == "returns":
+        returns = np.full_like(values, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns[:, 1:] = values[:, 1:] / values[:, :-1] - 1.0
+        values = returns
+
+    return PriceMatrix(symbols=list(symbols), timestamps=axis, values=values)
+
+
+def get_matrix_npz(
+    db: Session,
+    symbols: list[str],
+    field: str,
+    *,
+    interval: str = "1h",
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> bytes:
+    """
+    `build_matrix` encoded as `.npz`, cached by query key for a short TTL.
+
+    Least recently used payloads are evicted above `MATRIX_CACHE_MAX_ENTRIES`
+    entries or `MATRIX_CACHE_MAX_BYTES`; a payload larger than that is not cached.
+    """
+
+    global _CACHE_BYTES
+
+    key = (tuple(symbols), field, interval, start, end)
+    now = time.monotonic()
+    with _CACHE_LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None and hit[0] > now:
+            _CACHE.move_to_end(key)
+            return hit[1]
+
+    payload = build_matrix(db, symbols, field, interval=interval, start=start, end=end).to_npz()
+    if len(payload) > MATRIX_CACHE_MAX_BYTES:
+        return payload
+    with _CACHE_LOCK:
+        old = _CACHE.pop(key, None)
+        if old is not None:
+            _CACHE_BYTES -= len(old[1])
+        _CACHE[key] = (now + MATRIX_CACHE_TTL_SECONDS, payload)
+        _CACHE_BYTES += len(payload)
+        while len(_CACHE) > MATRIX_CACHE_MAX_ENTRIES or _CACHE_BYTES > MATRIX_CACHE_MAX_BYTES:
+            _, (_, evicted) = _CACHE.popitem(last=False)
+            _CACHE_BYTES -= len(evicted)
+    return payload
+
+
+def clear_matrix_cache() -> None:
+    global _CACHE_BYTES
+    with _CACHE_LOCK:
+        _CACHE.clear()
+        _CACHE_BYTES = 0
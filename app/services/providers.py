@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from typing import Protocol
+
+
+class CandleProvider(Protocol):
+    """
+    Asynchronous candle source used by the collector.
+
+    `fetch_candles` returns the same row dicts as `app.services.yahoo.fetch_candles`
+    (`ts_utc`, `open`, `high`, `low`, `close`, `volume`) and raises on failure.
+    Providers cap their own concurrency at `max_concurrency` in-flight requests.
+    """
+
+    name: str
+    max_concurrency: int
+
+    async def fetch_candles(
+        self,
+        symbol: str,
+        interval: str,
+        start: datetime | None,
+        end: datetime | None,
+    ) -> list[dict]: ...
+
+    async def aclose(self) -> None: ...
+
+
+def get_provider() -> CandleProvider | None:
+    """
+    Provider selected via `CANDLE_PROVIDER`.
+
+    - `yfinance` (default): returns None; the collector fetches sequentially
+      through `ingest_symbol_interval` and `yfinance`
+    - `chart`: the pooled async chart-API client
+    """
+
+    name = os.getenv("CANDLE_PROVIDER", "yfinance").strip().lower()
+    if name == "yfinance":
+        return None
+    if name == "chart":
+        from app.services.chart_api import ChartApiProvider
+
+        return ChartApiProvider()
+    raise ValueError(f"unknown CANDLE_PROVIDER: {name}")
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, replace
+from datetime import UTC, datetime, timedelta
+
+from app.db import SessionLocal
+from app.models import Symbol
+from app.services.collector import COLLECTOR, Collector
+from app.services.ingest import ingest_symbol_interval, plan_fetch, upsert_candles
+from app.services.intervals import validate_interval
+from app.services.leases import partition_for, partition_owner, request_refresh
+from app.services.runlog import RUN_LOG
+from app.services.status import record_attempt, record_failure, record_success
+
+logger = logging.getLogger(__name__)
+
+REFRESH_FRESHNESS_SECONDS = float(os.getenv("REFRESH_FRESHNESS_SECONDS", "60"))
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "4"))
+
+
+@dataclass(frozen=True)
+class RefreshResult:
+    symbol_id: int
+    interval: str
+    rows_written: int
+    refreshed_at_utc: datetime
+    error: str | None = None
+    cached: bool = False
+    # Not fetched: this process's collector is fetching the series right now.
+    conflict: bool = False
+    # Not fetched here: handed to the worker that owns the symbol's partition.
+    queued: bool = False
+
+
+class RefreshCoordinator:
+    """
+    Runs on-demand fetches ahead of the collector schedule.
+
+    - Concurrent refreshes of the same (symbol, interval) share one in-flight fetch,
+      which runs as its own task so it survives the requester disconnecting
+    - A successful result is reused for `freshness_seconds` without calling the provider
+    - At most `max_concurrency` refreshes fetch at the same time
+    - Shard leases are only read, never taken: a symbol whose partition another
+      live worker owns is queued for that worker's next tick (`queued`), and a
+      series this process's collector is fetching is not fetched twice (`conflict`)
+    """
+
+    def __init__(
+        self,
+        collector: Collector,
+        *,
+        freshness_seconds: float = REFRESH_FRESHNESS_SECONDS,
+        max_concurrency: int = REFRESH_CONCURRENCY,
+    ):
+        self._collector = collector
+        self._freshness = timedelta(seconds=freshness_seconds)
+        self._max_concurrency = max_concurrency
+        self._semaphore: asyncio.Semaphore | None = None
+        self._inflight: dict[tuple[int, str], asyncio.Task[RefreshResult]] = {}
+        self._recent: dict[tuple[int, str], RefreshResult] = {}
+
+    async def refresh(self, symbol_id: int, interval: str = "1h") -> RefreshResult:
+        validate_interval(interval)
+        key = (symbol_id, interval)
+
+        recent = self._recent.get(key)
+        if recent is not None and datetime.now(tz=UTC) - recent.refreshed_at_utc < self._freshness:
+            return replace(recent, cached=True)
+
+        task = self._inflight.get(key)
+        if task is None:
+            # Detached from the requester: cancelling one request (a client
+            # disconnect) cancels only its wait, not the fetch other waiters share.
+            task = asyncio.create_task(self._run(key))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _run(self, key: tuple[int, str]) -> RefreshResult:
+        try:
+            result = await self._fetch(*key)
+            if result.error is None and not result.queued:
+                self._remember(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def _remember(self, key: tuple[int, str], result: RefreshResult) -> None:
+        # Drop results past the freshness window so the map stays bounded.
+        cutoff = result.refreshed_at_utc - self._freshness
+        for stale in [k for k, r in self._recent.items() if r.refreshed_at_utc <= cutoff]:
+            del self._recent[stale]
+        self._recent[key] = result
+
+    async def refresh_many(self, symbol_ids: list[int], interval: str = "1h") -> list[RefreshResult]:
+        return list(await asyncio.gather(*(self.refresh(i, interval) for i in symbol_ids)))
+
+    async def _fetch(self, symbol_id: int, interval: str) -> RefreshResult:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        async with self._semaphore:
+            now = datetime.now(tz=UTC)
+            skipped = await asyncio.to_thread(self._claim, symbol_id, interval, now)
+            if skipped is not None:
+                return skipped
+            try:
+                if self._collector.provider is None:
+                    # yfinance is blocking; keep the event loop (and the collector) responsive.
+                    result = await asyncio.to_thread(
+                        self._ingest_blocking, symbol_id, interval, now
+                    )
+                else:
+                    result = await self._ingest_async(symbol_id, interval, now)
+            finally:
+                self._collector.end_fetch(symbol_id, interval)
+        if result.error is None:
+            self._collector.mark_fetched(symbol_id, interval, now)
+        return result
+
+    def _claim(self, symbol_id: int, interval: str, now: datetime) -> RefreshResult | None:
+        """
+        Decide whether this process may fetch the series; None means go ahead.
+
+        Fetches here when the symbol's partition is unowned (or its lease expired)
+        or owned by this process. Otherwise the series is queued for the owner.
+        """
+
+        collector = self._collector
+        db = SessionLocal()
+        try:
+            partition = partition_for(symbol_id, collector.num_partitions)
+            owner = partition_owner(db, partition, now=now)
+            if owner is not None and owner != collector.state.worker_id:
+                request_refresh(db, symbol_id, interval, now=now)
+                logger.info(
+                    "refresh queued (symbol_id=%s interval=%s owner=%s)",
+                    symbol_id,
+                    interval,
+                    owner,
+                )
+                return RefreshResult(symbol_id, interval, 0, datetime.now(tz=UTC), queued=True)
+        finally:
+            db.close()
+        if collector.begin_fetch(symbol_id, interval):
+            return None
+        error = "being fetched by the collector"
+        logger.info(
+            "refresh skipped (symbol_id=%s interval=%s reason=%s)", symbol_id, interval, error
+        )
+        return RefreshResult(
+            symbol_id, interval, 0, datetime.now(tz=UTC), error=error, conflict=True
+        )
+
+    def _ingest_blocking(self, symbol_id: int, interval: str, now: datetime) -> RefreshResult:
+        db = SessionLocal()
+        try:
+            symbol = db.get(Symbol, symbol_id)
+            if symbol is None:
+                raise LookupError(f"unknown symbol id {symbol_id}")
+            record_attempt(db, symbol_id)
+            t0 = time.perf_counter()
+            try:
+                written = ingest_symbol_interval(db, symbol, interval, now=now)
+            except Exception as e:
+                _record_run(symbol, interval, now, t0, error=e)
+                record_failure(db, symbol_id, e)
+                logger.exception("refresh failed (symbol=%s interval=%s)", symbol.symbol, interval)
+                return RefreshResult(symbol_id, interval, 0, datetime.now(tz=UTC), error=str(e))
+            _record_run(symbol, interval, now, t0, rows_written=written)
+            record_success(db, symbol_id)
+            return RefreshResult(symbol_id, interval, written, datetime.now(tz=UTC))
+        finally:
+            db.close()
+
+    async def _ingest_async(self, symbol_id: int, interval: str, now: datetime) -> RefreshResult:
+        db = SessionLocal()
+        try:
+            symbol = db.get(Symbol, symbol_id)
+            if symbol is None:
+                raise LookupError(f"unknown symbol id {symbol_id}")
+            record_attempt(db, symbol_id)
+            t0 = time.perf_counter()
+            try:
+                written = 0
+                window = plan_fetch(db, symbol, interval, now=now)
+                if window is not None:
+                    start, end = window
+                    rows = await self._collector.provider.fetch_candles(
+                        symbol.symbol, interval, start, end
+                    )
+                    if rows:
+                        written = upsert_candles(db, symbol, interval, rows)
+            except Exception as e:
+                _record_run(symbol, interval, now, t0, error=e)
+                record_failure(db, symbol_id, e)
+                logger.exception("refresh failed (symbol=%s interval=%s)", symbol.symbol, interval)
+                return RefreshResult(symbol_id, interval, 0, datetime.now(tz=UTC), error=str(e))
+            _record_run(symbol, interval, now, t0, rows_written=written)
+            record_success(db, symbol_id)
+            return RefreshResult(symbol_id, interval, written, datetime.now(tz=UTC))
+        finally:
+            db.close()
+
+
+def _record_run(
+    symbol: Symbol,
+    interval: str,
+    started: datetime,
+    t0: float,
+    *,
+    rows_written: int = 0,
+    error: Exception | None = None,
+) -> None:
+    RUN_LOG.record(
+        symbol_id=symbol.id,
+        exchange=symbol.exchange,
+        interval=interval,
+        source="refresh",
+        started_at_utc=started,
+        duration_ms=(time.perf_counter() - t0) * 1000.0,
+        rows_written=rows_written,
+        error=error,
+    )
+
+
+REFRESHER = RefreshCoordinator(COLLECTOR)
@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.models import CollectorRun, CollectorRunHourly
+from app.services.status import truncate_error
+
+logger = logging.getLogger(__name__)
+
+RUN_LOG_FLUSH_SECONDS = float(os.getenv("RUN_LOG_FLUSH_SECONDS", "2"))
+RUN_LOG_BATCH_SIZE = int(os.getenv("RUN_LOG_BATCH_SIZE", "500"))
+RUN_LOG_MAX_BUFFER = int(os.getenv("RUN_LOG_MAX_BUFFER", "50000"))
+RUN_LOG_RETENTION_DAYS = float(os.getenv("RUN_LOG_RETENTION_DAYS", "7"))
+RUN_ROLLUP_RETENTION_DAYS = float(os.getenv("RUN_ROLLUP_RETENTION_DAYS", "400"))
+
+_COMPACTION_EVERY = timedelta(hours=1)
+_HOUR_FORMAT = "%Y-%m-%d %H:00:00.000000"
+_DAY_FORMAT = "%Y-%m-%d 00:00:00.000000"
+BUCKETS = {"hour": _HOUR_FORMAT, "day": _DAY_FORMAT}
+
+
+class InvalidBucketError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class RunRecord:
+    symbol_id: int
+    exchange: str
+    interval: str
+    source: str
+    started_at_utc: datetime
+    duration_ms: float
+    rows_written: int
+    outcome: str
+    error: str | None = None
+
+
+@dataclass
+class RunStats:
+    bucket_start_utc: datetime
+    exchange: str
+    runs: int
+    failures: int
+    rows_written: int
+    avg_duration_ms: float
+    max_duration_ms: float
+
+
+def _ensure_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+def _floor_hour(dt: datetime) -> datetime:
+    return _ensure_utc(dt).replace(minute=0, second=0, microsecond=0)
+
+
+class RunLogWriter:
+    """
+    Buffers `collector_runs` rows in memory and writes them in batches.
+
+    - `record` never touches the database and is safe to call from worker threads
+    - a background task flushes every `flush_seconds` (in a thread, so the
+      collector's event loop never waits on the insert)
+    - the buffer is bounded; when the database falls behind, the oldest records
+      are dropped and counted in `dropped`
+    - the same task compacts expired rows into hourly rollups once an hour
+    """
+
+    def __init__(
+        self,
+        *,
+        session_factory=SessionLocal,
+        flush_seconds: float = RUN_LOG_FLUSH_SECONDS,
+        batch_size: int = RUN_LOG_BATCH_SIZE,
+        max_buffer: int = RUN_LOG_MAX_BUFFER,
+    ):
+        self._session_factory = session_factory
+        self._flush_seconds = flush_seconds
+        self._batch_size = batch_size
+        self._buffer: deque[RunRecord] = deque(maxlen=max_buffer)
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: asyncio.Task[None] | None = None
+        self._next_compaction: datetime | None = None
+        self.dropped = 0
+
+    def record(
+        self,
+        *,
+        symbol_id: int,
+        exchange: str | None,
+        interval: str,
+        source: str,
+        started_at_utc: datetime,
+        duration_ms: float,
+        rows_written: int = 0,
+        error: Exception | None = None,
+    ) -> None:
+        run = RunRecord(
+            symbol_id=symbol_id,
+            exchange=exchange or "",
+            interval=interval,
+            source=source,
+            started_at_utc=started_at_utc,
+            duration_ms=duration_ms,
+            rows_written=rows_written,
+            outcome="success" if error is None else "failure",
+            error=None if error is None else truncate_error(str(error)),
+        )
+        with self._buffer_lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(run)
+
+    def pending(self) -> int:
+        with self._buffer_lock:
+            return len(self._buffer)
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written."""
+
+        with self._flush_lock:
+            with self._buffer_lock:
+                runs = list(self._buffer)
+                self._buffer.clear()
+            if not runs:
+                return 0
+
+            db = self._session_factory()
+            try:
+                for offset in range(0, len(runs), self._batch_size):
+                    db.execute(
+                        insert(CollectorRun),
+                        [asdict(run) for run in runs[offset : offset + self._batch_size]],
+                    )
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._buffer_lock:
+                    # Retry the batch on the next flush; the oldest records go if the buffer is full.
+                    maxlen = self._buffer.maxlen
+                    self.dropped += max(0, len(runs) + len(self._buffer) - maxlen)
+                    self._buffer = deque([*runs, *self._buffer], maxlen=maxlen)
+                raise
+            finally:
+                db.close()
+            return len(runs)
+
+    def compact(self, now: datetime | None = None) -> int:
+        db = self._session_factory()
+        try:
+            return compact_runs(db, now=now or datetime.now(tz=UTC))
+        finally:
+            db.close()
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self) -> None:
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception:
+            logger.exception("final run log flush failed (pending=%s)", self.pending())
+
+    async def _run_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_seconds)
+            try:
+                written = await asyncio.to_thread(self.flush)
+                if written:
+                    logger.debug("run log flushed (rows=%s)", written)
+            except Exception:
+                logger.exception("run log flush failed (pending=%s)", self.pending())
+
+            now = datetime.now(tz=UTC)
+            if self._next_compaction is None or self._next_compaction <= now:
+                self._next_compaction = now + _COMPACTION_EVERY
+                try:
+                    await asyncio.to_thread(self.compact, now)
+                except Exception:
+                    logger.exception("run log compaction failed")
+
+
+def compact_runs(
+    db: Session,
+    *,
+    now: datetime,
+    retention: timedelta = timedelta(days=RUN_LOG_RETENTION_DAYS),
+    rollup_retention: timedelta = timedelta(days=RUN_ROLLUP_RETENTION_DAYS),
+) -> int:
+    """
+    Fold raw runs older than `retention` into hourly per-exchange rollups.
+
+    The cutoff is aligned to the hour, so every compacted hour is complete.
+    Rollups older than `rollup_retention` are deleted. Returns the number of
+    raw rows compacted.
+    """
+
+    cutoff = _floor_hour(now - retention)
+    hour = func.strftime(_HOUR_FORMAT, CollectorRun.started_at_utc)
+    rollup = (
+        select(
+            hour,
+            CollectorRun.exchange,
+            func.count(),
+            func.sum(case((CollectorRun.outcome == "failure", 1), else_=0)),
+            func.sum(CollectorRun.rows_written),
+            func.sum(CollectorRun.duration_ms),
+            func.max(CollectorRun.duration_ms),
+        )
+        .where(CollectorRun.started_at_utc < cutoff)
+        .group_by(hour, CollectorRun.exchange)
+    )
+    stmt = sqlite_insert(CollectorRunHourly).from_select(
+        [
+            "hour_start_utc",
+            "exchange",
+            "runs",
+            "failures",
+            "rows_written",
+            "total_duration_ms",
+            "max_duration_ms",
+        ],
+        rollup,
+    )
+    # A late flush can land in an hour that was already compacted.
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["hour_start_utc", "exchange"],
+        set_={
+            "runs": CollectorRunHourly.runs + stmt.excluded.runs,
+            "failures": CollectorRunHourly.failures + stmt.excluded.failures,
+            "rows_written": CollectorRunHourly.rows_written + stmt.excluded.rows_written,
+            "total_duration_ms": CollectorRunHourly.total_duration_ms
+            + stmt.excluded.total_duration_ms,
+            "max_duration_ms": func.max(
+                CollectorRunHourly.max_duration_ms, stmt.excluded.max_duration_ms
+            ),
+        },
+    )
+    db.execute(stmt)
+
+    compacted = (
+        db.query(CollectorRun)
+        .filter(CollectorRun.started_at_utc < cutoff)
+        .delete(synchronize_session=False)
+    )
+    (
+        db.query(CollectorRunHourly)
+        .filter(CollectorRunHourly.hour_start_utc < _floor_hour(now - rollup_retention))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    if compacted:
+        logger.info("compacted collector runs (rows=%s cutoff=%s)", compacted, cutoff)
+    return compacted
+
+
+def query_runs(
+    db: Session,
+    *,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    symbol_id: int | None = None,
+    exchange: str | None = None,
+    outcome: str | None = None,
+    before_id: int | None = None,
+    limit: int = 100,
+) -> list[CollectorRun]:
+    """Raw runs (newest first) still inside the retention window."""
+
+    query = db.query(CollectorRun)
+    if start is not None:
+        query = query.filter(CollectorRun.started_at_utc >= _ensure_utc(start))
+    if end is not None:
+        query = query.filter(CollectorRun.started_at_utc < _ensure_utc(end))
+    if symbol_id is not None:
+        query = query.filter(CollectorRun.symbol_id == symbol_id)
+    if exchange is not None:
+        query = query.filter(CollectorRun.exchange == exchange)
+    if outcome is not None:
+        query = query.filter(CollectorRun.outcome == outcome)
+    if before_id is not None:
+        query = query.filter(CollectorRun.id < before_id)
+    return query.order_by(CollectorRun.id.desc()).limit(limit).all()
+
+
+def run_stats(
+    db: Session,
+    *,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exchange: str | None = None,
+    bucket: str = "hour",
+) -> list[RunStats]:
+    """
+    Per-bucket, per-exchange fetch statistics over raw runs and hourly rollups.
+
+    Compacted history only has hour resolution, so `start`/`end` are applied to
+    rollups by their hour start.
+    """
+
+    fmt = BUCKETS.get(bucket)
+    if fmt is None:
+        raise InvalidBucketError(f"bucket must be one of: {', '.join(BUCKETS)}")
+
+    raw_bucket = func.strftime(fmt, CollectorRun.started_at_utc)
+    raw = db.query(
+        raw_bucket,
+        CollectorRun.exchange,
+        func.count(),
+        func.sum(case((CollectorRun.outcome == "failure", 1), else_=0)),
+        func.sum(CollectorRun.rows_written),
+        func.sum(CollectorRun.duration_ms),
+        func.max(CollectorRun.duration_ms),
+    )
+    rolled_bucket = func.strftime(fmt, CollectorRunHourly.hour_start_utc)
+    rolled = db.query(
+        rolled_bucket,
+        CollectorRunHourly.exchange,
+        func.sum(CollectorRunHourly.runs),
+        func.sum(CollectorRunHourly.failures),
+        func.sum(CollectorRunHourly.rows_written),
+        func.sum(CollectorRunHourly.total_duration_ms),
+        func.max(CollectorRunHourly.max_duration_ms),
+    )
+    if start is not None:
+        raw = raw.filter(CollectorRun.started_at_utc >= _ensure_utc(start))
+        rolled = rolled.filter(CollectorRunHourly.hour_start_utc >= _floor_hour(start))
+    if end is not None:
+        raw = raw.filter(CollectorRun.started_at_utc < _ensure_utc(end))
+        rolled = rolled.filter(CollectorRunHourly.hour_start_utc < _ensure_utc(end))
+    if exchange is not None:
+        raw = raw.filter(CollectorRun.exchange == exchange)
+        rolled = rolled.filter(CollectorRunHourly.exchange == exchange)
+
+    merged: dict[tuple[str, str], list] = {}
+    for query, group in (
+        (raw, (raw_bucket, CollectorRun.exchange)),
+        (rolled, (rolled_bucket, CollectorRunHourly.exchange)),
+    ):
+        for key_bucket, key_exchange, runs, failures, rows, total_ms, max_ms in query.group_by(
+            *group
+        ):
+            acc = merged.setdefault((key_bucket, key_exchange), [0, 0, 0, 0.0, 0.0])
+            acc[0] += runs
+            acc[1] += failures or 0
+            acc[2] += rows or 0
+            acc[3] += total_ms or 0.0
+            acc[4] = max(acc[4], max_ms or 0.0)
+
+    return [
+        RunStats(
+            bucket_start_utc=datetime.fromisoformat(key_bucket).replace(tzinfo=UTC),
+            exchange=key_exchange,
+            runs=runs,
+            failures=failures,
+            rows_written=rows,
+            avg_duration_ms=total_ms / runs if runs else 0.0,
+            max_duration_ms=max_ms,
+        )
+        for (key_bucket, key_exchange), (runs, failures, rows, total_ms, max_ms) in sorted(
+            merged.items()
+        )
+    ]
+
+
+RUN_LOG = RunLogWriter()
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models import Candle, Symbol
+from app.services.coldstore import get_cold_last_ts
+from app.services.gaps import next_session_candle
+from app.services.intervals import validate_interval
+
+# Seconds one collector tick may spend on fetches; the rest waits for the next
+# tick, where it is re-ordered together with newly available candles. 0 (the
+# default) works through all due series every tick, as before the budget.
+COLLECTOR_TICK_BUDGET_SECONDS = float(os.getenv("COLLECTOR_TICK_BUDGET_SECONDS", "0") or 0)
+LAG_SAMPLES_PER_EXCHANGE = int(os.getenv("COLLECTOR_LAG_SAMPLES", "1000"))
+# Longest wait between fetches of a series that keeps returning no new candles
+# while its session says it should trade (halted, delisted).
+COLLECTOR_IDLE_BACKOFF_MAX_HOURS = float(os.getenv("COLLECTOR_IDLE_BACKOFF_MAX_HOURS", "6"))
+
+_COST_ALPHA = 0.2
+_LOAD_CHUNK = 500
+_NEVER = datetime.min.replace(tzinfo=UTC)
+
+
+def _interval_step(interval: str) -> timedelta:
+    validate_interval(interval)
+    return timedelta(hours=1)
+
+
+def _ensure_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+def parse_exchange_weights(value: str) -> dict[str, float]:
+    """Parse `NYSE=3,XETRA=1`; exchanges not listed get weight 1."""
+    weights = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        name, sep, weight = part.partition("=")
+        if not sep or float(weight) <= 0:
+            raise ValueError(f"invalid exchange weight {part.strip()!r}; expected NAME=WEIGHT > 0")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+COLLECTOR_EXCHANGE_WEIGHTS = parse_exchange_weights(os.getenv("COLLECTOR_EXCHANGE_WEIGHTS", ""))
+
+
+def tick_budget() -> float | None:
+    return COLLECTOR_TICK_BUDGET_SECONDS if COLLECTOR_TICK_BUDGET_SECONDS > 0 else None
+
+
+def next_candle_available_at(last_ts: datetime | None, interval: str) -> datetime:
+    """
+    When the candle after `last_ts` closes and the provider can serve it.
+
+    Candles are keyed by their start, so that is two steps after `last_ts`.
+    Series without candles are always overdue.
+    """
+    if last_ts is None:
+        return _NEVER
+    return _ensure_utc(last_ts) + 2 * _interval_step(interval)
+
+
+def load_last_ts(db: Session, symbol_ids: list[int], interval: str) -> dict[int, datetime | None]:
+    """Newest stored candle per symbol, hot or cold; one index seek per tier each."""
+    latest = (
+        select(func.max(Candle.ts_utc))
+        .where(Candle.symbol_id == Symbol.id, Candle.interval == interval)
+        .scalar_subquery()
+    )
+    result: dict[int, datetime | None] = {}
+    for offset in range(0, len(symbol_ids), _LOAD_CHUNK):
+        chunk = symbol_ids[offset : offset + _LOAD_CHUNK]
+        for symbol_id, hot in db.execute(select(Symbol.id, latest).where(Symbol.id.in_(chunk))):
+            # Hot rows may all have been compacted, or a late one may sit below cold.
+            cold = get_cold_last_ts(db, symbol_id, interval)
+            known = [_ensure_utc(ts) for ts in (hot, cold) if ts is not None]
+            result[symbol_id] = max(known) if known else None
+    return result
+
+
+def idle_until(
+    db: Session,
+    symbol: Symbol,
+    interval: str,
+    last_ts: datetime | None,
+    *,
+    now: datetime,
+    idle_runs: int,
+) -> datetime:
+    """
+    When to fetch again a series whose last `idle_runs` fetches found no new candle.
+
+    - Outside its session (night, weekend), when the next session candle becomes
+      available; the session is learned from the stored candles
+    - Otherwise (halted, delisted, holiday, or no session known yet) the wait
+      doubles per idle fetch, from one interval up to
+      `COLLECTOR_IDLE_BACKOFF_MAX_HOURS`
+
+    The later of the two wins. The result also serves as the series' deadline,
+    so idle series do not lead the queue just because their last candle is old.
+    """
+
+    step = _interval_step(interval)
+    cap = max(timedelta(hours=COLLECTOR_IDLE_BACKOFF_MAX_HOURS), step)
+    doublings = min(max(idle_runs - 1, 0), 16)
+    backoff = now + min(step * 2**doublings, cap)
+    if last_ts is None:
+        return backoff
+    # Only candles that are not available yet: close after `now`.
+    after = max(_ensure_utc(last_ts), now - step)
+    candle = next_session_candle(db, symbol, interval, last_ts=last_ts, after=after)
+    if candle is None:
+        return backoff
+    return max(backoff, candle + step)
+
+
+def first_ts_after(db: Session, symbol_id: int, interval: str, after: datetime) -> datetime | None:
+    ts = db.execute(
+        select(func.min(Candle.ts_utc)).where(
+            Candle.symbol_id == symbol_id,
+            Candle.interval == interval,
+            Candle.ts_utc > after,
+        )
+    ).scalar_one_or_none()
+    return _ensure_utc(ts) if ts is not None else None
+
+
+@dataclass(frozen=True)
+class WorkItem:
+    symbol: Symbol
+    interval: str
+    # When the next candle became (or becomes) available.
+    deadline: datetime
+
+    @property
+    def exchange(self) -> str:
+        return self.symbol.exchange or ""
+
+
+def fair_order(
+    items: list[WorkItem],
+    *,
+    now: datetime,
+    weights: dict[str, float] | None = None,
+    costs: dict[str, float] | None = None,
+) -> list[WorkItem]:
+    """
+    Order one tick's work.
+
+    - Within an exchange, the earliest deadline (stalest series) goes first
+    - Exchanges are interleaved by weighted fair queuing: each item advances
+      its exchange's virtual finish time by `cost / weight`, and the smallest
+      finish time goes next, so an exchange gets its weighted share of the
+      tick instead of waiting behind every symbol with a lower id
+    - Items whose next candle is not available yet go last
+    """
+
+    weights = weights or {}
+    costs = costs or {}
+    queues: dict[str, list[WorkItem]] = defaultdict(list)
+    waiting: list[WorkItem] = []
+    for item in items:
+        (queues[item.exchange] if item.deadline <= now else waiting).append(item)
+
+    heap = []
+    for exchange, queue in queues.items():
+        queue.sort(key=lambda i: (i.deadline, i.symbol.id), reverse=True)
+        step = costs.get(exchange, 1.0) / weights.get(exchange, 1.0)
+        head = queue[-1]
+        heap.append((step, head.deadline, head.symbol.id, exchange, step))
+    heapq.heapify(heap)
+
+    ordered = []
+    while heap:
+        finish, _, _, exchange, step = heapq.heappop(heap)
+        queue = queues[exchange]
+        ordered.append(queue.pop())
+        if queue:
+            head = queue[-1]
+            heapq.heappush(heap, (finish + step, head.deadline, head.symbol.id, exchange, step))
+
+    waiting.sort(key=lambda i: (i.deadline, i.symbol.id))
+    return ordered + waiting
+
+
+def update_cost(costs: dict[str, float], exchange: str, seconds: float) -> None:
+    """Exponentially weighted average fetch time per exchange."""
+    previous = costs.get(exchange)
+    costs[exchange] = seconds if previous is None else previous + _COST_ALPHA * (seconds - previous)
+
+
+@dataclass(frozen=True)
+class ExchangeLag:
+    exchange: str
+    weight: float
+    samples: int
+    p50_seconds: float | None
+    p99_seconds: float | None
+    max_seconds: float | None
+    backlog: int
+
+
+class LagTracker:
+    """
+    Freshness lag per exchange: seconds from a candle's close to its write.
+
+    Keeps the last `max_samples` writes per exchange and the work left over by
+    the last tick (`backlog`).
+    """
+
+    def __init__(self, max_samples: int = LAG_SAMPLES_PER_EXCHANGE):
+        self._max_samples = max_samples
+        self._samples: dict[str, deque[float]] = {}
+        self._backlog: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, exchange: str, lag_seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(exchange)
+            if samples is None:
+                samples = self._samples[exchange] = deque(maxlen=self._max_samples)
+            samples.append(max(0.0, lag_seconds))
+
+    def set_backlog(self, backlog: dict[str, int]) -> None:
+        with self._lock:
+            self._backlog = dict(backlog)
+
+    def snapshot(self, weights: dict[str, float] | None = None) -> list[ExchangeLag]:
+        weights = weights or {}
+        with self._lock:
+            samples = {e: np.array(s) for e, s in self._samples.items()}
+            backlog = dict(self._backlog)
+        result = []
+        for exchange in sorted(set(samples) | set(backlog)):
+            values = samples.get(exchange, np.empty(0))
+            p50, p99 = np.percentile(values, [50, 99]) if values.size else (None, None)
+            result.append(
+                ExchangeLag(
+                    exchange=exchange,
+                    weight=weights.get(exchange, 1.0),
+                    samples=int(values.size),
+                    p50_seconds=None if p50 is None else float(p50),
+                    p99_seconds=None if p99 is None else float(p99),
+                    max_seconds=float(values.max()) if values.size else None,
+                    backlog=backlog.get(exchange, 0),
+                )
+            )
+        return result
+
+
+class TickBudget:
+    def __init__(self, seconds: float | None):
+        self._deadline = None if seconds is None else time.monotonic() + seconds
+
+    def exhausted(self) -> bool:
+        return self._deadline is not None and time.monotonic() >= self._deadline
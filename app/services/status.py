@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from sqlalchemy.orm import Session
+
+from app.models import CollectorStatus
+
+_MAX_ERROR_LEN = 500
+
+
+def get_or_create_status(db: Session, symbol_id: int) -> CollectorStatus:
+    status = (
+        db.query(CollectorStatus)
+        .filter(CollectorStatus.symbol_id == symbol_id)
+        .one_or_none()
+    )
+    if status is not None:
+        return status
+
+    status = CollectorStatus(symbol_id=symbol_id)
+    db.add(status)
+    db.flush()
+    return status
+
+
+def truncate_error(message: str) -> str:
+    if len(message) <= _MAX_ERROR_LEN:
+        return message
+    return message[:_MAX_ERROR_LEN]
+
+
+def record_attempt(db: Session, symbol_id: int) -> CollectorStatus:
+    attempt_time = datetime.now(tz=UTC)
+    status = get_or_create_status(db, symbol_id)
+    status.last_attempt_at_utc = attempt_time
+    status.updated_at_utc = attempt_time
+    db.commit()
+    return status
+
+
+def record_success(db: Session, symbol_id: int) -> None:
+    success_time = datetime.now(tz=UTC)
+    status = get_or_create_status(db, symbol_id)
+    status.last_success_at_utc = success_time
+    status.last_error = None
+    status.consecutive_failures = 0
+    status.updated_at_utc = success_time
+    db.commit()
+
+
+def record_failure(db: Session, symbol_id: int, error: Exception) -> None:
+    """Roll back the failed work and count the failure."""
+    db.rollback()
+    error_time = datetime.now(tz=UTC)
+    status = get_or_create_status(db, symbol_id)
+    status.last_error = truncate_error(str(error))
+    status.consecutive_failures = (status.consecutive_failures or 0) + 1
+    status.updated_at_utc = error_time
+    db.commit()
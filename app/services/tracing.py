@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "50"))
+TRACE_PROFILE_DIR = os.getenv("TRACE_PROFILE_DIR", "data/profiles")
+_PROFILE_SAMPLE_SECONDS = 0.005
+
+
+@dataclass
+class PhaseStats:
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    def add(self, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+
+@dataclass
+class TickTrace:
+    """
+    Timings of one collector tick.
+
+    Phases nest (e.g. `yf.download` runs inside `fetch_candles`), so their
+    totals overlap and do not sum up to `duration_ms`.
+    """
+
+    tick_id: int
+    started_at_utc: datetime
+    duration_ms: float | None = None
+    phases: dict[str, PhaseStats] = field(default_factory=dict)
+    symbols: dict[str, float] = field(default_factory=dict)
+    profile_path: str | None = None
+    # Set by `mark_busy`; idle ticks (nothing due) are not kept.
+    busy: bool = False
+
+    def add_phase(self, name: str, elapsed_ms: float) -> None:
+        self.phases.setdefault(name, PhaseStats()).add(elapsed_ms)
+
+
+_CURRENT_TRACE: ContextVar[TickTrace | None] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a phase of the current tick; a no-op outside of a traced tick."""
+
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_phase(name, (time.perf_counter() - t0) * 1000)
+
+
+def mark_busy() -> None:
+    """Keep the current tick's trace: it did work (fetches, compaction, repair)."""
+
+    trace = _CURRENT_TRACE.get()
+    if trace is not None:
+        trace.busy = True
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread and writes collapsed stacks
+    (`frame;frame;frame count`), the input format of `flamegraph.pl`/speedscope.
+    """
+
+    def __init__(self, thread_id: int, *, interval_seconds: float = _PROFILE_SAMPLE_SECONDS):
+        self._thread_id = thread_id
+        self._interval_seconds = interval_seconds
+        self._stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="tick-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval_seconds):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            self._stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Tracer:
+    """
+    Keeps the traces of the most recent busy ticks in a bounded ring buffer.
+
+    Ticks that never call `mark_busy` (nothing was due) are dropped, so the
+    idle polls between fetches do not evict the interesting traces.
+    """
+
+    def __init__(self, capacity: int = TRACE_BUFFER_SIZE):
+        self._traces: deque[TickTrace] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._profile_next = False
+
+    def request_profile(self) -> None:
+        """Profile the next busy tick and dump its stacks to `TRACE_PROFILE_DIR`."""
+        self._profile_next = True
+
+    @contextmanager
+    def tick(self) -> Iterator[TickTrace]:
+        trace = TickTrace(tick_id=0, started_at_utc=datetime.now(tz=UTC))
+
+        # Profile every tick while armed; stay armed until one turns out busy.
+        profiler = None
+        if self._profile_next:
+            profiler = SamplingProfiler(threading.get_ident())
+            profiler.start()
+
+        token = _CURRENT_TRACE.set(trace)
+        t0 = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            trace.duration_ms = (time.perf_counter() - t0) * 1000
+            _CURRENT_TRACE.reset(token)
+            if profiler is not None:
+                profiler.stop()
+            if trace.busy:
+                with self._lock:
+                    trace.tick_id = self._next_id
+                    self._next_id += 1
+                if profiler is not None:
+                    self._profile_next = False
+                    self._write_profile(trace, profiler)
+                with self._lock:
+                    self._traces.append(trace)
+
+    def _write_profile(self, trace: TickTrace, profiler: SamplingProfiler) -> None:
+        path = Path(TRACE_PROFILE_DIR) / f"tick-{trace.tick_id}.folded"
+        try:
+            profiler.write(path)
+            trace.profile_path = str(path)
+        except OSError:
+            logger.exception("failed to write tick profile (path=%s)", path)
+
+    @contextmanager
+    def symbol(self, name: str) -> Iterator[None]:
+        trace = _CURRENT_TRACE.get()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            if trace is not None:
+                elapsed_ms = (time.perf_counter() - t0) * 1000
+                trace.symbols[name] = trace.symbols.get(name, 0.0) + elapsed_ms
+
+    def recent(self, limit: int = 10) -> list[TickTrace]:
+        with self._lock:
+            traces = list(self._traces)
+        return list(reversed(traces))[:limit]
+
+
+TRACER = Tracer()
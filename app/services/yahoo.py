@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import logging
+import threading
+from contextlib import contextmanager
 from datetime import UTC, datetime
 
 import pandas as pd
@@ -8,16 +10,22 @@ from curl_cffi import requests as curl_requests
 import yfinance as yf
 
 from app.services.intervals import validate_interval
+from app.services.tracing import span
 
 logger = logging.getLogger(__name__)
-_CURL_SESSION: curl_requests.Session | None = None
+# curl_cffi sessions are not thread-safe; on-demand refreshes fetch from
+# worker threads while the collector fetches on the event loop thread.
+_CURL_SESSIONS = threading.local()
+# Errors of a failed ticker that mean "no bars in the range" rather than a failure.
+_NO_DATA_ERRORS = ("YFPricesMissingError", "no price data found")
 
 
 def _get_curl_session() -> curl_requests.Session:
-    global _CURL_SESSION
-    if _CURL_SESSION is None:
-        _CURL_SESSION = curl_requests.Session(impersonate="chrome")
-    return _CURL_SESSION
+    session = getattr(_CURL_SESSIONS, "session", None)
+    if session is None:
+        session = curl_requests.Session(impersonate="chrome")
+        _CURL_SESSIONS.session = session
+    return session
 
 
 def _to_utc(dt: datetime | None) -> datetime | None:
@@ -54,11 +62,49 @@ def _normalize_ohlcv_frame(df: pd.DataFrame, symbol: str) -> pd.DataFrame | None
     return df[["open", "high", "low", "close", "volume"]]
 
 
+class _DownloadErrors(logging.Handler):
+    """Errors `yf.download` logs for failed tickers, from the calling thread only."""
+
+    def __init__(self, symbol: str) -> None:
+        super().__init__(logging.ERROR)
+        self._thread = threading.get_ident()
+        self._ticker = f"'{symbol.upper()}'"
+        self.messages: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.thread != self._thread:
+            return
+        message = record.getMessage()
+        if self._ticker in message:
+            self.messages.append(message)
+
+
+@contextmanager
+def _download_errors(symbol: str):
+    # yfinance keeps per-ticker errors inside the download call (older releases
+    # used the global, unsynchronised `yf.shared._ERRORS`) and only logs them.
+    handler = _DownloadErrors(symbol)
+    yf_logger = logging.getLogger("yfinance")
+    yf_logger.addHandler(handler)
+    try:
+        yield handler.messages
+    finally:
+        yf_logger.removeHandler(handler)
+
+
+def _raise_download_errors(symbol: str, errors: list[str]) -> None:
+    failures = [e for e in errors if not any(marker in e for marker in _NO_DATA_ERRORS)]
+    if failures:
+        raise RuntimeError(f"yfinance download failed (symbol={symbol}): {failures[0]}")
+
+
 def fetch_candles(
     symbol: str,
     interval: str,
     start: datetime | None,
     end: datetime | None,
+    *,
+    raise_errors: bool = False,
 ) -> list[dict]:
     """
     Fetch OHLCV candles from Yahoo Finance using `yfinance`.
@@ -69,6 +115,12 @@ def fetch_candles(
     Returns a list of dicts with:
     - ts_utc (timezone-aware datetime in UTC)
     - open, high, low, close, volume
+
+    Failures are logged and return `[]`, like an empty range. With
+    `raise_errors`, failed requests (network, rate limits, bad responses) raise
+    instead, so callers can tell them apart from a range without bars. Both
+    modes share one `yf.download` call; failures are read from the errors it
+    reports for the ticker.
     """
 
     validate_interval(interval)
@@ -78,18 +130,21 @@ def fetch_candles(
     end_utc = _to_utc(end)
 
     try:
-        df = yf.download(
-            tickers=symbol,
-            interval=yf_interval,
-            start=start_utc,
-            end=end_utc,
-            progress=False,
-            auto_adjust=False,
-            actions=False,
-            threads=False,
-            session=_get_curl_session(),
-        )
+        with span("yf.download"), _download_errors(symbol) as errors:
+            df = yf.download(
+                tickers=symbol,
+                interval=yf_interval,
+                start=start_utc,
+                end=end_utc,
+                progress=False,
+                auto_adjust=False,
+                actions=False,
+                threads=False,
+                session=_get_curl_session(),
+            )
     except Exception:
+        if raise_errors:
+            raise
         logger.exception(
             "yfinance download failed (symbol=%s interval=%s start=%s end=%s)",
             symbol,
@@ -100,10 +155,17 @@ def fetch_candles(
         return []
 
     if df is None or df.empty:
+        if raise_errors:
+            _raise_download_errors(symbol, errors)
         return []
 
-    df = _normalize_ohlcv_frame(df, symbol)
-    if df is None or df.empty:
+    with span("normalize_frame"):
+        df = _normalize_ohlcv_frame(df, symbol)
+    if df is None:
+        if raise_errors:
+            raise ValueError(f"unexpected yfinance columns (symbol={symbol})")
+        return []
+    if df.empty:
         return []
 
     # Normalize index timestamps to UTC (yfinance can return exchange-local tz).
@@ -114,9 +176,16 @@ def fetch_candles(
         else:
             idx_utc = pd.to_datetime(idx).tz_convert(UTC)
     except Exception:
+        if raise_errors:
+            raise
         logger.exception("failed to normalize timestamps to UTC (symbol=%s)", symbol)
         return []
 
+    with span("frame_to_rows"):
+        return _frame_to_rows(df, idx_utc, symbol)
+
+
+def _frame_to_rows(df: pd.DataFrame, idx_utc: pd.DatetimeIndex, symbol: str) -> list[dict]:
     candles: list[dict] = []
     for ts, (_, row) in zip(idx_utc.to_pydatetime(), df.iterrows(), strict=False):
         try:
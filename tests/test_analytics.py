@@ -0,0 +1,189 @@
+import importlib
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+NOW = datetime(2025, 6, 1, tzinfo=UTC)
+
+
+def _make_client(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+    os.environ["ANALYTICS_DB_PATH"] = str(tmp_path / "analytics.duckdb")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.runlog",
+        "app.services.collector",
+        "app.services.maintenance",
+        "app.services.analytics",
+        "app.main",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+def _insert_candles(db, symbol_id, start, n, close=1.0, volume=1.0):
+    from sqlalchemy import insert
+
+    from app.models import Candle
+
+    db.execute(
+        insert(Candle),
+        [
+            {
+                "symbol_id": symbol_id,
+                "interval": "1h",
+                "ts_utc": start + timedelta(hours=i),
+                "open": close,
+                "high": close,
+                "low": close,
+                "close": close * (1 + i / 100),
+                "volume": volume,
+            }
+            for i in range(n)
+        ],
+    )
+    db.commit()
+
+
+def test_analytics_copy_tracks_hot_cold_and_late_rows(tmp_path):
+    pytest.importorskip("duckdb")
+    with _make_client(tmp_path) as client:
+        from app.db import SessionLocal
+        from app.models import Candle, Symbol
+        from app.services.analytics import ANALYTICS
+        from app.services.coldstore import compact_cold_candles
+
+        db = SessionLocal()
+        try:
+            aapl = Symbol(symbol="AAPL", exchange="NASDAQ", is_active=True)
+            sap = Symbol(symbol="SAP", exchange="XETRA", is_active=True)
+            db.add_all([aapl, sap])
+            db.commit()
+            old = datetime(2025, 1, 1, tzinfo=UTC)
+            _insert_candles(db, aapl.id, old, 48, volume=10.0)
+            _insert_candles(db, sap.id, old, 48, volume=2.0)
+            # January moves into cold blocks; the copy must still see it.
+            compact_cold_candles(db, older_than=timedelta(days=90), now=NOW)
+            recent = NOW - timedelta(days=1)
+            _insert_candles(db, aapl.id, recent, 10, volume=10.0)
+            _insert_candles(db, sap.id, recent, 10, volume=2.0)
+
+            first = ANALYTICS.sync(now=NOW)
+            assert first.full is True
+            assert first.rows_copied == 116
+
+            r = client.get("/api/analytics/coverage")
+            assert r.status_code == 200
+            coverage = {row["symbol"]: row for row in r.json()["rows"]}
+            assert coverage["AAPL"]["candles"] == 58
+            assert coverage["AAPL"]["first_ts_utc"].startswith("2025-01-01T00:00:00")
+
+            # A gap repair far back, a late correction and a deleted symbol.
+            _insert_candles(db, aapl.id, old - timedelta(hours=2), 2, volume=10.0)
+            correction = (
+                db.query(Candle)
+                .filter(Candle.symbol_id == aapl.id, Candle.ts_utc >= recent)
+                .order_by(Candle.ts_utc.desc())
+                .first()
+            )
+            correction.volume = 1000.0
+            db.commit()
+            db.delete(db.get(Symbol, sap.id))
+            db.commit()
+        finally:
+            db.close()
+
+        second = ANALYTICS.sync(now=NOW)
+        assert second.full is False
+        assert second.rows_copied == 12
+
+        rows = client.get("/api/analytics/coverage").json()["rows"]
+        assert [(row["symbol"], row["candles"]) for row in rows] == [("AAPL", 60)]
+
+        r = client.get("/api/analytics/volume", params={"start": recent.isoformat()})
+        (volume,) = r.json()["rows"]
+        assert volume["total_volume"] == 9 * 10.0 + 1000.0
+
+        rebuilt = client.post("/api/analytics/sync?full=true").json()
+        assert rebuilt["full"] is True
+        assert rebuilt["rows_copied"] == 60
+
+
+def test_cross_section_and_errors(monkeypatch, tmp_path):
+    pytest.importorskip("duckdb")
+    with _make_client(tmp_path) as client:
+        from app.db import SessionLocal
+        from app.models import Symbol
+        from app.services import analytics
+
+        db = SessionLocal()
+        try:
+            symbols = [Symbol(symbol=f"S{i}", exchange="NYSE", is_active=True) for i in range(3)]
+            db.add_all(symbols)
+            db.commit()
+            for s in symbols:
+                _insert_candles(db, s.id, NOW - timedelta(hours=5), 5)
+        finally:
+            db.close()
+
+        r = client.get("/api/analytics/cross_section", params={"exchange": "NYSE", "limit": 2})
+        assert r.status_code == 200
+        body = r.json()
+        assert body["synced_at_utc"] is not None
+        latest = body["rows"][0]
+        assert latest["symbols"] == 3
+        assert latest["mean_return"] == pytest.approx(1.04 / 1.03 - 1)
+        assert latest["std_return"] == pytest.approx(0.0)
+        assert len(body["rows"]) == 2
+
+        assert client.get("/api/analytics/nope").status_code == 404
+        assert client.get("/api/analytics/coverage?interval=5m").status_code == 400
+
+        analytics.ANALYTICS.close()
+        monkeypatch.setattr(analytics, "duckdb", None)
+        assert client.get("/api/analytics/coverage").status_code == 503
+
+
+def test_incremental_sync_keeps_cold_rows_inside_the_resync_window(tmp_path):
+    pytest.importorskip("duckdb")
+    with _make_client(tmp_path):
+        from app.db import SessionLocal
+        from app.models import Symbol
+        from app.services.analytics import ANALYTICS
+        from app.services.coldstore import compact_cold_candles
+
+        db = SessionLocal()
+        try:
+            aapl = Symbol(symbol="AAPL", exchange="NASDAQ", is_active=True)
+            db.add(aapl)
+            db.commit()
+            # Everything before June is cold, while the resync window is a week.
+            _insert_candles(db, aapl.id, NOW - timedelta(days=40), 48)
+            _insert_candles(db, aapl.id, NOW - timedelta(days=3), 48)
+            compact_cold_candles(db, older_than=timedelta(0), now=NOW)
+            _insert_candles(db, aapl.id, NOW, 6)
+        finally:
+            db.close()
+
+        assert ANALYTICS.sync(now=NOW).rows_copied == 102
+        second = ANALYTICS.sync(now=NOW)
+        assert second.full is False
+        assert second.rows_copied == 54
+
+        result = ANALYTICS.query("coverage", now=NOW)
+        assert [row["candles"] for row in result.rows] == [102]
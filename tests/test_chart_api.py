@@ -0,0 +1,141 @@
+import asyncio
+import importlib
+import os
+import sys
+import threading
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    """Serves recorded chart responses from `fixtures/chart_<SYMBOL>.json`."""
+
+    requests: list = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        symbol = unquote(url.path.rsplit("/", 1)[-1])
+        type(self).requests.append((symbol, parse_qs(url.query)))
+
+        fixture = FIXTURES / f"chart_{symbol}.json"
+        status = 200
+        if not fixture.exists():
+            fixture = FIXTURES / "chart_UNKNOWN.json"
+            status = 404
+        body = fixture.read_bytes()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    _ReplayHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ReplayHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/v8/finance/chart"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _setup_db(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.ingest",
+        "app.services.runlog",
+        "app.services.collector",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from app.db import Base, SessionLocal, engine
+    import app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    return SessionLocal()
+
+
+def test_fetch_parses_recorded_response_and_drops_null_bars(stub_server):
+    from app.services.chart_api import ChartApiError, ChartApiProvider
+
+    async def run():
+        provider = ChartApiProvider(base_url=stub_server, max_concurrency=4)
+        try:
+            rows = await provider.fetch_candles(
+                "AAPL",
+                "1h",
+                start=datetime(2025, 1, 6, tzinfo=UTC),
+                end=datetime(2025, 1, 7, tzinfo=UTC),
+            )
+            with pytest.raises(ChartApiError):
+                await provider.fetch_candles("NOPE", "1h", start=None, end=None)
+            return rows
+        finally:
+            await provider.aclose()
+
+    rows = asyncio.run(run())
+
+    assert [r["ts_utc"] for r in rows] == [
+        datetime(2025, 1, 6, 14, 30, tzinfo=UTC),
+        datetime(2025, 1, 6, 15, 30, tzinfo=UTC),
+        datetime(2025, 1, 6, 17, 30, tzinfo=UTC),
+    ]
+    assert rows[0]["volume"] == 11262931.0
+    symbol, params = _ReplayHandler.requests[0]
+    assert symbol == "AAPL"
+    assert params["interval"] == ["60m"]
+    assert params["period1"] == [str(int(datetime(2025, 1, 6, tzinfo=UTC).timestamp()))]
+
+
+def test_collector_ingests_through_async_provider(stub_server, tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.models import Candle, CollectorStatus, Symbol
+        from app.services.chart_api import ChartApiProvider
+        from app.services.collector import Collector
+
+        db.add_all([Symbol(symbol="AAPL", is_active=True), Symbol(symbol="NOPE", is_active=True)])
+        db.commit()
+
+        async def run():
+            collector = Collector(
+                provider=ChartApiProvider(base_url=stub_server, max_concurrency=2),
+                num_partitions=1,
+            )
+            await collector._tick()
+            await collector._provider.aclose()
+
+        asyncio.run(run())
+
+        assert db.query(Candle).count() == 3
+        statuses = {
+            s.symbol_id: s for s in db.query(CollectorStatus).order_by(CollectorStatus.symbol_id)
+        }
+        assert statuses[1].last_success_at_utc is not None
+        assert statuses[1].consecutive_failures == 0
+        assert statuses[2].consecutive_failures == 1
+        assert "unknown symbol" in statuses[2].last_error
+    finally:
+        db.close()
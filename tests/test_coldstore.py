@@ -0,0 +1,106 @@
+import importlib
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _setup_db(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.coldstore",
+        "app.services.ingest",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from app.db import Base, SessionLocal, engine
+    import app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    return SessionLocal()
+
+
+def _candle(symbol_id, ts, price):
+    from app.models import Candle
+
+    return Candle(
+        symbol_id=symbol_id,
+        interval="1h",
+        ts_utc=ts,
+        open=price,
+        high=price + 1.0,
+        low=price - 1.0,
+        close=price + 0.5,
+        volume=1000.0 + price,
+    )
+
+
+def test_block_roundtrip_is_lossless():
+    import numpy as np
+
+    from app.services.coldstore import CandleColumns, decode_block, encode_block
+
+    ts = np.arange(0, 500 * 3600, 3600, dtype="<i8") + 1_700_000_000
+    rng = np.random.default_rng(0)
+    prices = 100 + rng.standard_normal(500).cumsum()
+    cols = CandleColumns(ts, prices, prices + 1, prices - 1, prices + 0.25, rng.random(500) * 1e6)
+
+    blob = encode_block(cols)
+    decoded = decode_block(blob)
+
+    assert len(blob) < 500 * 6 * 8
+    np.testing.assert_array_equal(decoded.ts, cols.ts)
+    for name in ("open", "high", "low", "close", "volume"):
+        np.testing.assert_array_equal(getattr(decoded, name), getattr(cols, name))
+
+
+def test_compaction_moves_old_months_and_reads_merge(tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.models import Candle, CandleBlock, Symbol
+        from app.services.coldstore import compact_cold_candles, read_candles
+        from app.services.ingest import get_last_ts
+
+        sym = Symbol(symbol="AAPL", exchange=None, timezone=None, is_active=True)
+        db.add(sym)
+        db.commit()
+        db.refresh(sym)
+
+        base = datetime(2025, 1, 31, 22, 0, tzinfo=UTC)
+        db.add_all([_candle(sym.id, base + timedelta(hours=i), 10.0 + i) for i in range(4)])
+        db.commit()
+
+        now = datetime(2025, 2, 15, tzinfo=UTC)
+        moved = compact_cold_candles(db, older_than=timedelta(days=10), now=now)
+        assert moved == 2  # only January is entirely older than the cutoff
+        assert db.query(Candle).count() == 2
+        assert db.query(CandleBlock).count() == 1
+
+        rows = read_candles(db, sym.id, "1h")
+        assert [r["ts_utc"] for r in rows] == [base + timedelta(hours=i) for i in range(4)]
+        assert [r["open"] for r in rows] == [10.0, 11.0, 12.0, 13.0]
+
+        rows = read_candles(db, sym.id, "1h", start=base + timedelta(hours=1), end=base + timedelta(hours=3))
+        assert [r["open"] for r in rows] == [11.0, 12.0]
+
+        compact_cold_candles(db, older_than=timedelta(days=0), now=datetime(2025, 3, 1, tzinfo=UTC))
+        assert db.query(Candle).count() == 0
+        last_ts = get_last_ts(db, sym.id, "1h")
+        assert last_ts.replace(tzinfo=UTC) == base + timedelta(hours=3)
+
+        # A repaired gap lands in the hot table below the compacted blocks.
+        db.add(_candle(sym.id, base - timedelta(hours=5), 5.0))
+        db.commit()
+        last_ts = get_last_ts(db, sym.id, "1h")
+        assert last_ts.replace(tzinfo=UTC) == base + timedelta(hours=3)
+    finally:
+        db.close()
@@ -1,3 +1,4 @@
+import asyncio
 import importlib
 import os
 import sys
@@ -13,7 +14,13 @@ if str(REPO_ROOT) not in sys.path:
 def _make_client(tmp_path):
     os.environ["DB_PATH"] = str(tmp_path / "test.db")
 
-    for module_name in ("app.db", "app.models", "app.services.collector", "app.main"):
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.runlog",
+        "app.services.collector",
+        "app.main",
+    ):
         if module_name in sys.modules:
             importlib.reload(sys.modules[module_name])
 
@@ -23,6 +30,21 @@ def _make_client(tmp_path):
     return TestClient(app)
 
 
+def _status(client):
+    (status,) = client.get("/api/collector/status").json()
+    return status
+
+
+def _wait_until(predicate, timeout=2.0):
+    # The first tick claims shard leases before it fetches anything.
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
 def test_collector_status_toggles_with_mocked_ingest(monkeypatch, tmp_path):
     with _make_client(tmp_path) as client:
         from app.services.collector import COLLECTOR
@@ -55,9 +77,7 @@ def test_collector_status_toggles_with_mocked_ingest(monkeypatch, tmp_path):
         assert r.status_code == 200
         assert r.json()["is_running"] is True
 
-        time.sleep(0.05)
-
-        assert calls["count"] > 0
+        assert _wait_until(lambda: calls["count"] > 0)
 
         r = client.post("/api/collector/stop")
         assert r.status_code == 200
@@ -79,7 +99,7 @@ def test_collector_status_updates_on_success(monkeypatch, tmp_path):
 
         r = client.post("/api/collector/start")
         assert r.status_code == 200
-        time.sleep(0.05)
+        assert _wait_until(lambda: _status(client)["last_success_at_utc"] is not None)
 
         r = client.post("/api/collector/stop")
         assert r.status_code == 200
@@ -110,7 +130,7 @@ def test_collector_status_updates_on_failure(monkeypatch, tmp_path):
 
         r = client.post("/api/collector/start")
         assert r.status_code == 200
-        time.sleep(0.05)
+        assert _wait_until(lambda: _status(client)["last_error"] is not None)
 
         r = client.post("/api/collector/stop")
         assert r.status_code == 200
@@ -124,3 +144,111 @@ def test_collector_status_updates_on_failure(monkeypatch, tmp_path):
         assert status["last_success_at_utc"] is None
         assert "boom" in status["last_error"]
         assert status["consecutive_failures"] == 1
+
+
+def test_debug_traces_report_phases_and_profile(monkeypatch, tmp_path):
+    with _make_client(tmp_path) as client:
+        from app.services.collector import COLLECTOR
+        from app.services.tracing import span
+
+        r = client.post("/api/symbols", json={"symbol": "AAPL"})
+        assert r.status_code == 201
+
+        def fake_ingest(db, symbol, interval, now=None):
+            with span("fetch_candles"):
+                time.sleep(0.01)
+            return 0
+
+        monkeypatch.setattr("app.services.collector.ingest_symbol_interval", fake_ingest)
+        monkeypatch.setattr("app.services.tracing.TRACE_PROFILE_DIR", str(tmp_path / "profiles"))
+        COLLECTOR._poll_interval_seconds = 0.01
+
+        r = client.post("/api/debug/profile")
+        assert r.status_code == 202
+
+        client.post("/api/collector/start")
+        assert _wait_until(
+            lambda: any(t["profile_path"] for t in client.get("/api/debug/traces").json())
+        )
+        client.post("/api/collector/stop")
+
+        r = client.get("/api/debug/traces", params={"limit": 50})
+        assert r.status_code == 200
+        traces = r.json()
+        assert traces
+
+        fetched = [t for t in traces if any(p["name"] == "fetch_candles" for p in t["phases"])]
+        assert fetched[0]["slowest_symbols"][0]["symbol"] == "AAPL"
+        phases = {p["name"]: p for p in fetched[0]["phases"]}
+        assert phases["fetch_candles"]["total_ms"] >= 10
+        assert "status_update" in phases
+
+        profiled = [t["profile_path"] for t in traces if t["profile_path"]]
+        assert len(profiled) == 1
+        assert Path(profiled[0]).read_text().strip()
+
+        from app.services.tracing import TRACE_BUFFER_SIZE
+
+        too_many = TRACE_BUFFER_SIZE + 1
+        for params in ({"limit": 0}, {"limit": too_many}, {"top": 0}, {"top": 100000}):
+            assert client.get("/api/debug/traces", params=params).status_code == 422
+
+
+def test_locked_lease_renewal_is_retried_next_tick(monkeypatch, tmp_path):
+    with _make_client(tmp_path) as client:
+        import sqlite3
+
+        from sqlalchemy.exc import OperationalError
+
+        from app.services import collector as collector_module
+        from app.services.collector import Collector
+
+        r = client.post("/api/symbols", json={"symbol": "AAPL"})
+        assert r.status_code == 201
+
+        calls = {"count": 0}
+
+        def fake_ingest(db, symbol, interval, now=None):
+            calls["count"] += 1
+            return 0
+
+        acquire = collector_module.acquire_leases
+
+        def locked(*args, **kwargs):
+            raise OperationalError("UPDATE", {}, sqlite3.OperationalError("database is locked"))
+
+        monkeypatch.setattr("app.services.collector.ingest_symbol_interval", fake_ingest)
+        monkeypatch.setattr("app.services.collector.acquire_leases", locked)
+        collector = Collector(num_partitions=1)
+
+        # No lease yet: the tick is skipped instead of crashing the loop.
+        asyncio.run(collector._tick())
+        assert calls["count"] == 0
+
+        monkeypatch.setattr("app.services.collector.acquire_leases", acquire)
+        asyncio.run(collector._tick())
+        assert calls["count"] == 1
+        assert collector.state.partitions == [0]
+
+
+def test_idle_ticks_are_not_traced_and_profile_waits_for_work(monkeypatch, tmp_path):
+    from app.services.tracing import Tracer, mark_busy
+
+    monkeypatch.setattr("app.services.tracing.TRACE_PROFILE_DIR", str(tmp_path / "profiles"))
+    tracer = Tracer(capacity=5)
+    tracer.request_profile()
+
+    for _ in range(6):
+        with tracer.tick():
+            pass
+    assert tracer.recent() == []
+
+    with tracer.tick():
+        mark_busy()
+        time.sleep(0.02)
+    with tracer.tick():
+        mark_busy()
+
+    first, second = reversed(tracer.recent())
+    assert (first.tick_id, second.tick_id) == (1, 2)
+    assert first.profile_path is not None and second.profile_path is None
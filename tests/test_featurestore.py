@@ -0,0 +1,150 @@
+import importlib
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _setup_db(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.coldstore",
+        "app.services.featurestore",
+        "app.services.indicators",
+        "app.services.ingest",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from app.db import Base, SessionLocal, engine
+    import app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    return SessionLocal()
+
+
+def _rows(base, hours, price=1.0):
+    return [
+        {
+            "ts_utc": base + timedelta(hours=h),
+            "open": price + h,
+            "high": price + h,
+            "low": price + h,
+            "close": price + h,
+            "volume": 10.0 * h,
+        }
+        for h in hours
+    ]
+
+
+def test_append_is_incremental_and_ranges_resolve(tmp_path):
+    from app.services.featurestore import append_rows, open_series
+
+    root = tmp_path / "store"
+    base = datetime(2025, 1, 31, 20, tzinfo=UTC)
+
+    assert append_rows(root, "^N225", "1h", _rows(base, range(3))) == 3
+    # Overlap with the tail: one corrected row is patched, two rows appended.
+    corrected = _rows(base, range(2, 5))
+    corrected[0]["close"] = 99.0
+    assert append_rows(root, "^N225", "1h", corrected) == 2
+
+    series = open_series(root, "^N225", "1h")
+    assert isinstance(series.close, np.memmap)
+    assert len(series) == 5
+    assert series.close.tolist() == [1.0, 2.0, 99.0, 4.0, 5.0]
+    assert [m for m, _ in series.offsets] == [
+        int(datetime(2025, 1, 1, tzinfo=UTC).timestamp()),
+        int(datetime(2025, 2, 1, tzinfo=UTC).timestamp()),
+    ]
+
+    window = series.range(base + timedelta(hours=1), base + timedelta(hours=4))
+    assert window.open.tolist() == [2.0, 3.0, 4.0]
+    assert np.shares_memory(window.open, series.open)
+
+
+def test_ingest_writes_through_to_feature_store(monkeypatch, tmp_path):
+    root = tmp_path / "store"
+    monkeypatch.setenv("FEATURE_STORE_DIR", str(root))
+    db = _setup_db(tmp_path)
+    try:
+        from app.models import Symbol
+        from app.services import ingest as ingest_module
+        from app.services.featurestore import open_series
+
+        sym = Symbol(symbol="AAPL", exchange=None, timezone=None, is_active=True)
+        db.add(sym)
+        db.commit()
+        db.refresh(sym)
+
+        base = datetime(2025, 1, 1, tzinfo=UTC)
+        monkeypatch.setattr(
+            ingest_module,
+            "fetch_candles",
+            lambda symbol, interval, start, end: _rows(base, range(3)),
+        )
+        ingest_module.ingest_symbol_interval(db, sym, "1h", now=base + timedelta(hours=3))
+
+        series = open_series(root, "AAPL", "1h")
+        assert series.ts.tolist() == [int((base + timedelta(hours=h)).timestamp()) for h in range(3)]
+    finally:
+        db.close()
+
+
+def test_late_rows_are_merged_and_rebuild_resyncs(tmp_path):
+    from app.services.featurestore import append_rows, open_series
+
+    root = tmp_path / "store"
+    base = datetime(2025, 1, 31, 20, tzinfo=UTC)
+
+    assert append_rows(root, "AAPL", "1h", _rows(base, [0, 2, 4, 6])) == 4
+    # A repaired gap (hours 1 and 3) arrives after newer rows were exported,
+    # together with one new row.
+    assert append_rows(root, "AAPL", "1h", _rows(base, [3, 1, 7])) == 3
+
+    series = open_series(root, "AAPL", "1h")
+    expected = [0, 1, 2, 3, 4, 6, 7]
+    assert series.ts.tolist() == [int((base + timedelta(hours=h)).timestamp()) for h in expected]
+    assert series.close.tolist() == [1.0 + h for h in expected]
+    assert series.range(datetime(2025, 2, 1, tzinfo=UTC)).close.tolist() == [5.0, 7.0, 8.0]
+
+    # A merge that crashed midway is detected and its tail dropped.
+    import json
+
+    header_path = root / "1h" / "AAPL" / "header.json"
+    header = json.loads(header_path.read_text())
+    header_path.write_text(json.dumps({**header, "rewrite_from": 3}))
+    assert append_rows(root, "AAPL", "1h", _rows(base, [2])) == 0
+    assert open_series(root, "AAPL", "1h").close.tolist() == [1.0, 2.0, 3.0]
+
+    db = _setup_db(tmp_path)
+    try:
+        from app.models import Candle, Symbol
+        from app.services.featurestore import export_series
+
+        sym = Symbol(symbol="AAPL", exchange=None, timezone=None, is_active=True)
+        db.add(sym)
+        db.commit()
+        db.refresh(sym)
+        db.add_all(
+            [Candle(symbol_id=sym.id, interval="1h", **row) for row in _rows(base, range(8))]
+        )
+        db.commit()
+
+        # Re-export refills what the aborted merge dropped (hours 3 to 7).
+        assert export_series(db, root, sym, "1h") == 5
+        assert export_series(db, root, sym, "1h", rebuild=True) == 8
+        series = open_series(root, "AAPL", "1h")
+        assert series.close.tolist() == [1.0 + h for h in range(8)]
+    finally:
+        db.close()
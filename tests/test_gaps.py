@@ -0,0 +1,226 @@
+import asyncio
+import importlib
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+NY = ZoneInfo("America/New_York")
+NOW = datetime(2025, 3, 15, tzinfo=UTC)
+
+
+def _setup_db(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.ingest",
+        "app.services.gaps",
+        "app.services.leases",
+        "app.services.collector",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from app.db import Base, SessionLocal, engine
+    import app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    return SessionLocal()
+
+
+def _session_bars(day):
+    """Hourly NYSE bars of one local trading day (09:30 .. 15:30 New York)."""
+    return [datetime(2025, 3, day, 9 + h, 30, tzinfo=NY).astimezone(UTC) for h in range(7)]
+
+
+def _seed(db):
+    from app.models import Candle, Symbol
+
+    symbol = Symbol(symbol="AAPL", exchange="NASDAQ", timezone="America/New_York", is_active=True)
+    db.add(symbol)
+    db.commit()
+
+    # Two trading weeks across the US DST switch (2025-03-09).
+    days = [3, 4, 5, 6, 7, 10, 11, 12, 13, 14]
+    removed = {
+        *_session_bars(4)[2:4],  # intraday outage
+        *_session_bars(6),  # a whole day (holiday at the provider)
+        _session_bars(12)[1],
+    }
+    for day in days:
+        for ts in _session_bars(day):
+            if ts in removed:
+                continue
+            db.add(
+                Candle(
+                    symbol_id=symbol.id,
+                    interval="1h",
+                    ts_utc=ts,
+                    open=1.0,
+                    high=1.0,
+                    low=1.0,
+                    close=1.0,
+                    volume=1.0,
+                )
+            )
+    db.commit()
+    return symbol
+
+
+def test_find_gaps_follows_the_local_session_and_merges_nearby_gaps(tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.services.gaps import find_gaps, plan_windows
+
+        symbol = _seed(db)
+        gaps = find_gaps(db, symbol, "1h", now=NOW)
+
+        assert [(g.start_utc, len(g.missing)) for g in gaps] == [
+            (_session_bars(4)[2], 2),
+            (_session_bars(6)[0], 7),
+            (_session_bars(12)[1], 1),
+        ]
+        # Overnight and weekend breaks are not gaps, before or after the DST switch.
+        assert gaps[1].end_utc == _session_bars(6)[-1] + timedelta(hours=1)
+
+        windows = plan_windows(gaps, merge_within=timedelta(hours=72))
+        assert [(w.start_utc, w.end_utc, len(w.gaps)) for w in windows] == [
+            (gaps[0].start_utc, gaps[1].end_utc, 2),
+            (gaps[2].start_utc, gaps[2].end_utc, 1),
+        ]
+
+        split = plan_windows(gaps[1:2], max_window=timedelta(hours=3))
+        assert [len(w.gaps[0].missing) for w in split] == [3, 3, 1]
+    finally:
+        db.close()
+
+
+def test_repair_fills_only_missing_rows_and_records_unrepairable_ranges(monkeypatch, tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.models import Candle, UnrepairableRange
+        from app.services import gaps as gaps_module
+
+        symbol = _seed(db)
+        requests = []
+
+        def fake_fetch(symbol_name, interval, start, end, *, raise_errors=False):
+            assert raise_errors
+            requests.append((start, end))
+            rows = []
+            ts = start
+            while ts < end:
+                if ts.astimezone(NY).day != 6:
+                    rows.append(
+                        {
+                            "ts_utc": ts,
+                            "open": 2.0,
+                            "high": 2.0,
+                            "low": 2.0,
+                            "close": 999.0,
+                            "volume": 2.0,
+                        }
+                    )
+                ts += timedelta(hours=1)
+            return rows
+
+        monkeypatch.setattr(gaps_module, "fetch_candles", fake_fetch)
+        report = asyncio.run(gaps_module.repair_gaps(db, now=NOW, rate_per_second=1000))
+
+        assert (report.gaps, report.windows, report.errors) == (3, 2, 0)
+        assert report.rows_written == 3
+        assert report.unrepairable == 1
+        assert len(requests) == 2
+
+        # Stored candles inside the windows were not rewritten.
+        assert db.query(Candle).filter(Candle.close == 999.0).count() == 3
+        assert db.query(Candle).filter(Candle.revision > 0).count() == 0
+
+        (unrepairable,) = db.query(UnrepairableRange).all()
+        assert unrepairable.reason == "provider returned no data"
+        assert unrepairable.start_utc.replace(tzinfo=UTC) == _session_bars(6)[0]
+        assert unrepairable.end_utc - unrepairable.start_utc == timedelta(hours=7)
+
+        # Nothing is left to repair, so the next run makes no requests.
+        assert gaps_module.find_gaps(db, symbol, "1h", now=NOW) == []
+        report = asyncio.run(gaps_module.repair_gaps(db, now=NOW, rate_per_second=1000))
+        assert (report.gaps, report.windows) == (0, 0)
+        assert len(requests) == 2
+    finally:
+        db.close()
+
+
+def test_repair_counts_fetch_errors_and_retries_them(monkeypatch, tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.models import UnrepairableRange
+        from app.services import gaps as gaps_module
+
+        symbol = _seed(db)
+
+        def failing_fetch(symbol_name, interval, start, end, *, raise_errors=False):
+            raise RuntimeError("429 Too Many Requests")
+
+        monkeypatch.setattr(gaps_module, "fetch_candles", failing_fetch)
+        report = asyncio.run(gaps_module.repair_gaps(db, now=NOW, rate_per_second=1000))
+
+        assert (report.gaps, report.windows, report.errors) == (3, 2, 2)
+        assert (report.rows_written, report.unrepairable) == (0, 0)
+        assert db.query(UnrepairableRange).count() == 0
+
+        # The gaps stay open for the next run.
+        assert len(gaps_module.find_gaps(db, symbol, "1h", now=NOW)) == 3
+    finally:
+        db.close()
+
+
+def test_repair_skips_foreign_partitions_and_series_being_fetched(monkeypatch, tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.services import gaps as gaps_module
+        from app.services.collector import Collector
+        from app.services.leases import acquire_leases, release_leases
+
+        symbol = _seed(db)
+        requests = []
+
+        def fake_fetch(symbol_name, interval, start, end, *, raise_errors=False):
+            requests.append((start, end))
+            return []
+
+        monkeypatch.setattr(gaps_module, "fetch_candles", fake_fetch)
+        collector = Collector(worker_id="me", num_partitions=1)
+
+        def repair():
+            return asyncio.run(
+                gaps_module.repair_gaps(db, now=NOW, rate_per_second=1000, guard=collector)
+            )
+
+        # Another worker owns the partition: the symbol is its to repair.
+        acquire_leases(db, "other", now=datetime.now(tz=UTC), num_partitions=1)
+        report = repair()
+        assert (report.symbols, report.not_owned, report.windows) == (0, 1, 0)
+        release_leases(db, "other")
+
+        # The collector is fetching the series: its windows are skipped.
+        assert collector.begin_fetch(symbol.id, "1h")
+        report = repair()
+        assert (report.symbols, report.windows, report.busy) == (1, 2, 2)
+        assert requests == []
+        collector.end_fetch(symbol.id, "1h")
+
+        # Windows of one series are fetched one after another and released.
+        report = repair()
+        assert (report.windows, report.busy, report.errors) == (2, 0, 0)
+        assert len(requests) == 2
+        assert collector.begin_fetch(symbol.id, "1h")
+    finally:
+        db.close()
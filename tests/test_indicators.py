@@ -0,0 +1,188 @@
+import importlib
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+BASE = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+def _make_client(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.indicators",
+        "app.services.ingest",
+        "app.services.runlog",
+        "app.services.gaps",
+        "app.services.collector",
+        "app.services.refresh",
+        "app.main",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+def _rows(start, n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return [
+        {
+            "ts_utc": BASE + timedelta(hours=start + i),
+            "open": float(c),
+            "high": float(c * 1.01),
+            "low": float(c * 0.99),
+            "close": float(c),
+            "volume": float(rng.integers(1, 1000)),
+        }
+        for i, c in enumerate(close)
+    ]
+
+
+def _expected(rows, indicator, window):
+    df = pd.DataFrame(rows)
+    if indicator == "returns":
+        return df.close.pct_change(window).to_numpy()
+    if indicator == "volatility":
+        return np.log(df.close).diff().rolling(window).std().to_numpy()
+    typical = (df.high + df.low + df.close) / 3
+    return (
+        (typical * df.volume).rolling(window).sum() / df.volume.rolling(window).sum()
+    ).to_numpy()
+
+
+def test_indicators_extend_incrementally_after_ingest(monkeypatch, tmp_path):
+    with _make_client(tmp_path) as client:
+        from app.db import SessionLocal
+        from app.models import Symbol
+        from app.services import indicators
+        from app.services.indicators import INDICATOR_CACHE, IndicatorCache
+        from app.services.ingest import upsert_candles
+
+        db = SessionLocal()
+        try:
+            symbol = Symbol(symbol="AAPL", is_active=True)
+            db.add(symbol)
+            db.commit()
+            rows = _rows(0, 300)
+            upsert_candles(db, symbol, "1h", rows)
+
+            for indicator, window in (("returns", 5), ("volatility", 20), ("vwap", 24)):
+                series = INDICATOR_CACHE.get(db, symbol.id, "1h", indicator, window)
+                np.testing.assert_allclose(series.values, _expected(rows, indicator, window))
+            assert INDICATOR_CACHE.misses == 3
+
+            reads = []
+            read = indicators.read_candle_columns
+
+            def tracking_read(db, symbol_id, interval, *, start=None, end=None):
+                reads.append(start)
+                return read(db, symbol_id, interval, start=start, end=end)
+
+            monkeypatch.setattr(indicators, "read_candle_columns", tracking_read)
+
+            # New bars plus a late correction inside the ingest overlap.
+            corrected = dict(rows[-3], close=rows[-3]["close"] * 1.05)
+            new = _rows(300, 10, seed=1)
+            upsert_candles(db, symbol, "1h", [corrected, *new])
+            rows = [*rows[:-3], corrected, *rows[-2:], *new]
+
+            series = INDICATOR_CACHE.get(db, symbol.id, "1h", "volatility", 20)
+            np.testing.assert_allclose(series.values, _expected(rows, "volatility", 20))
+            # Only the tail was read back: one window before the corrected bar.
+            assert reads == [rows[300 - 3 - 20]["ts_utc"]]
+            assert (INDICATOR_CACHE.extensions, INDICATOR_CACHE.hits) == (1, 0)
+
+            INDICATOR_CACHE.get(db, symbol.id, "1h", "volatility", 20)
+            assert INDICATOR_CACHE.hits == 1
+
+            # A bar appended by another process (no invalidate call) is found too.
+            monkeypatch.setattr(indicators.INDICATOR_CACHE, "invalidate", lambda *a: None)
+            extra = _rows(310, 1, seed=2)
+            upsert_candles(db, symbol, "1h", extra)
+            rows = [*rows, *extra]
+            series = INDICATOR_CACHE.get(db, symbol.id, "1h", "vwap", 24)
+            np.testing.assert_allclose(series.values, _expected(rows, "vwap", 24))
+
+            # The byte limit evicts the least recently used series.
+            small = IndicatorCache(max_bytes=2 * series.nbytes + 1)
+            for window in (2, 3, 4):
+                small.get(db, symbol.id, "1h", "returns", window)
+            assert len(small._entries) == 2
+            assert small.bytes <= small.max_bytes
+            assert (symbol.id, "1h", "returns", 2) not in small._entries
+        finally:
+            db.close()
+
+
+def test_rolling_volatility_matches_pandas_for_long_series():
+    from app.services.coldstore import CandleColumns
+    from app.services.indicators import rolling_volatility
+
+    rows = _rows(0, 20000, seed=3)
+    rows[5000]["close"] = 0.0
+    close = np.array([r["close"] for r in rows])
+    cols = CandleColumns(np.arange(close.shape[0]), close, close, close, close, close)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_returns = pd.Series(np.log(close)).diff().replace([np.inf, -np.inf], np.nan)
+    for window in (2, 50, 5000):
+        expected = log_returns.rolling(window).std().to_numpy()
+        np.testing.assert_allclose(rolling_volatility(cols, window), expected, atol=1e-7)
+
+
+def test_indicator_endpoint(tmp_path):
+    with _make_client(tmp_path) as client:
+        from app.db import SessionLocal
+        from app.models import Symbol
+        from app.services.ingest import upsert_candles
+
+        db = SessionLocal()
+        try:
+            symbol = Symbol(symbol="AAPL", is_active=True)
+            db.add(symbol)
+            db.commit()
+            rows = _rows(0, 50)
+            upsert_candles(db, symbol, "1h", rows)
+        finally:
+            db.close()
+
+        params = {"symbol": "AAPL", "indicator": "returns", "window": 3}
+        r = client.get("/api/indicators", params=params)
+        assert r.status_code == 200
+        points = r.json()["points"]
+        assert len(points) == 50
+        assert [p["value"] for p in points[:3]] == [None, None, None]
+        assert points[3]["value"] == rows[3]["close"] / rows[0]["close"] - 1
+
+        r = client.get(
+            "/api/indicators",
+            params={
+                "symbol": "AAPL",
+                "indicator": "vwap",
+                "start": (BASE + timedelta(hours=40)).isoformat(),
+                "end": (BASE + timedelta(hours=45)).isoformat(),
+            },
+        )
+        assert [p["ts_utc"][11:13] for p in r.json()["points"]] == ["16", "17", "18", "19", "20"]
+
+        params = {"symbol": "AAPL", "indicator": "volatility", "window": 1}
+        assert client.get("/api/indicators", params=params).status_code == 400
+        params = {"symbol": "AAPL", "indicator": "sharpe"}
+        assert client.get("/api/indicators", params=params).status_code == 400
+        params = {"symbol": "MSFT", "indicator": "vwap"}
+        assert client.get("/api/indicators", params=params).status_code == 404
@@ -78,3 +78,153 @@ def test_ingest_is_idempotent(monkeypatch, tmp_path):
         assert calls[-1][2] == base + timedelta(hours=2)  # last_ts + 1h
     finally:
         db.close()
+
+
+def test_overlap_refetch_revises_only_changed_rows(monkeypatch, tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.models import Candle, Symbol
+        from app.services import ingest as ingest_module
+
+        sym = Symbol(symbol="AAPL", exchange=None, timezone=None, is_active=True)
+        db.add(sym)
+        db.commit()
+        db.refresh(sym)
+
+        base = datetime(2025, 1, 1, 0, 0, tzinfo=UTC)
+        returned = [
+            {
+                "ts_utc": base + timedelta(hours=i),
+                "open": 1.0 + i,
+                "high": 2.0 + i,
+                "low": 0.5 + i,
+                "close": 1.5 + i,
+                "volume": 100.0,
+            }
+            for i in range(3)
+        ]
+
+        calls = []
+
+        def fake_fetch(symbol, interval, start, end):
+            calls.append((symbol, interval, start, end))
+            return [dict(r) for r in returned]
+
+        monkeypatch.setattr(ingest_module, "fetch_candles", fake_fetch)
+
+        assert ingest_module.ingest_symbol_interval(
+            db, sym, "1h", now=base + timedelta(hours=3), overlap=2
+        ) == 3
+
+        # Late volume correction on the last bar plus one new bar.
+        returned[2]["volume"] = 250.0
+        returned.append({**returned[2], "ts_utc": base + timedelta(hours=3), "volume": 90.0})
+
+        written = ingest_module.ingest_symbol_interval(
+            db, sym, "1h", now=base + timedelta(hours=4), overlap=2
+        )
+        assert written == 2
+        assert calls[-1][2] == base + timedelta(hours=1)  # last_ts + 1h - 2 candles
+
+        candles = db.query(Candle).order_by(Candle.ts_utc.asc()).all()
+        assert [c.revision for c in candles] == [0, 0, 1, 0]
+        assert candles[2].volume == 250.0
+    finally:
+        db.close()
+
+
+def test_overlap_counts_stored_candles_across_closed_hours(tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.models import Candle, Symbol
+        from app.services.coldstore import compact_cold_candles
+        from app.services.ingest import plan_fetch
+
+        sym = Symbol(symbol="AAPL", exchange=None, timezone=None, is_active=True)
+        db.add(sym)
+        db.commit()
+        db.refresh(sym)
+
+        friday = datetime(2025, 1, 31, 19, 0, tzinfo=UTC)
+        monday = datetime(2025, 2, 3, 14, 0, tzinfo=UTC)
+        stored = [friday, friday + timedelta(hours=1), friday + timedelta(hours=2), monday]
+        db.add_all(
+            [
+                Candle(
+                    symbol_id=sym.id,
+                    interval="1h",
+                    ts_utc=ts,
+                    open=1.0,
+                    high=1.0,
+                    low=1.0,
+                    close=1.0,
+                    volume=1.0,
+                )
+                for ts in stored
+            ]
+        )
+        db.commit()
+
+        now = monday + timedelta(hours=3)
+        # Three stored candles back, not three hours back (which covers only Monday).
+        assert plan_fetch(db, sym, "1h", now=now, overlap=3)[0] == stored[1]
+
+        # January is compacted; the overlap reaches into its cold block.
+        compact_cold_candles(db, older_than=timedelta(days=0), now=datetime(2025, 2, 1, tzinfo=UTC))
+        assert db.query(Candle).count() == 1
+        assert plan_fetch(db, sym, "1h", now=now, overlap=3)[0] == stored[1]
+        assert plan_fetch(db, sym, "1h", now=now, overlap=10)[0] == stored[0]
+    finally:
+        db.close()
+
+
+def test_overlap_into_cold_blocks_skips_unchanged_candles(monkeypatch, tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.models import Candle, Symbol
+        from app.services import ingest as ingest_module
+        from app.services.coldstore import compact_cold_candles
+
+        sym = Symbol(symbol="AAPL", exchange=None, timezone=None, is_active=True)
+        db.add(sym)
+        db.commit()
+        db.refresh(sym)
+
+        base = datetime(2025, 1, 31, 21, 0, tzinfo=UTC)
+        returned = [
+            {
+                "ts_utc": base + timedelta(hours=i),
+                "open": 1.0 + i,
+                "high": 2.0 + i,
+                "low": 0.5 + i,
+                "close": 1.5 + i,
+                "volume": 100.0,
+            }
+            for i in range(3)
+        ]
+        monkeypatch.setattr(
+            ingest_module, "fetch_candles", lambda *a, **k: [dict(r) for r in returned]
+        )
+        ingest_module.upsert_candles(db, sym, "1h", returned)
+
+        # January is compacted; the overlap of the next fetch reaches into it.
+        compact_cold_candles(db, older_than=timedelta(days=0), now=datetime(2025, 2, 1, tzinfo=UTC))
+        assert db.query(Candle).count() == 0
+
+        returned.append({**returned[2], "ts_utc": base + timedelta(hours=3)})
+        written = ingest_module.ingest_symbol_interval(
+            db, sym, "1h", now=base + timedelta(hours=4), overlap=3
+        )
+        assert written == 1
+        assert db.query(Candle).count() == 1
+
+        # A changed cold candle is written as a hot revision.
+        returned[0]["volume"] = 250.0
+        written = ingest_module.ingest_symbol_interval(
+            db, sym, "1h", now=base + timedelta(hours=5), overlap=4
+        )
+        assert written == 1
+        revised = db.query(Candle).filter(Candle.ts_utc == base).one()
+        assert (revised.volume, revised.revision) == (250.0, 1)
+    finally:
+        db.close()
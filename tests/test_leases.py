@@ -0,0 +1,71 @@
+import importlib
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _setup_db(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in ("app.db", "app.models", "app.services.leases"):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from app.db import Base, SessionLocal, engine
+    import app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    return SessionLocal()
+
+
+def test_two_workers_split_partitions_without_overlap(tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.services.leases import acquire_leases
+
+        now = datetime(2025, 1, 1, tzinfo=UTC)
+        kwargs = {"num_partitions": 8, "ttl_seconds": 60}
+
+        a = acquire_leases(db, "a", now=now, **kwargs)
+        assert a == set(range(8))
+
+        # b joins: nothing is free yet, but a sees b and gives up its surplus.
+        b = acquire_leases(db, "b", now=now, **kwargs)
+        assert b == set()
+        a = acquire_leases(db, "a", now=now + timedelta(seconds=1), **kwargs)
+        assert len(a) == 4
+
+        b = acquire_leases(db, "b", now=now + timedelta(seconds=2), **kwargs)
+        assert len(b) == 4
+        assert a.isdisjoint(b)
+        assert a | b == set(range(8))
+    finally:
+        db.close()
+
+
+def test_expired_leases_are_taken_over(tmp_path):
+    db = _setup_db(tmp_path)
+    try:
+        from app.services.leases import acquire_leases, release_leases
+
+        now = datetime(2025, 1, 1, tzinfo=UTC)
+        kwargs = {"num_partitions": 4, "ttl_seconds": 60}
+
+        assert acquire_leases(db, "dead", now=now, **kwargs) == set(range(4))
+
+        # Still leased: a live worker cannot steal it.
+        assert acquire_leases(db, "b", now=now + timedelta(seconds=30), **kwargs) == set()
+
+        later = now + timedelta(seconds=61)
+        assert acquire_leases(db, "b", now=later, **kwargs) == set(range(4))
+
+        release_leases(db, "b")
+        assert acquire_leases(db, "c", now=later, **kwargs) == set(range(4))
+    finally:
+        db.close()
@@ -0,0 +1,111 @@
+import importlib
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _make_client(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.runlog",
+        "app.services.collector",
+        "app.main",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+def _seed(client):
+    from app.db import SessionLocal
+    from app.models import CollectorStatus
+
+    base = datetime(2025, 1, 1, tzinfo=UTC)
+    for i in range(10):
+        r = client.post(
+            "/api/symbols",
+            json={"symbol": f"S{i}", "exchange": "NYSE" if i % 2 else "XETRA"},
+        )
+        assert r.status_code == 201
+
+    db = SessionLocal()
+    try:
+        for status in db.query(CollectorStatus):
+            i = status.symbol_id
+            status.consecutive_failures = i % 3
+            # Every third symbol never succeeded; two symbols share a timestamp.
+            if i % 3:
+                status.last_success_at_utc = base + timedelta(hours=min(i, 5))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _collect(client, url):
+    ids, cursor, pages = [], None, 0
+    while True:
+        r = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert r.status_code == 200
+        ids.extend(row["id"] for row in r.json())
+        pages += 1
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_pagination_walks_every_sort_without_gaps(tmp_path):
+    with _make_client(tmp_path) as client:
+        _seed(client)
+
+        ids, pages = _collect(client, "/api/collector/status?limit=3")
+        assert ids == list(range(1, 11))
+        assert pages == 4
+
+        ids, _ = _collect(client, "/api/collector/status?sort=failures&limit=3")
+        assert ids == [8, 5, 2, 10, 7, 4, 1, 9, 6, 3]
+
+        ids, _ = _collect(client, "/api/collector/status?sort=stale&limit=2")
+        assert ids == [3, 6, 9, 1, 2, 4, 5, 7, 8, 10]
+
+
+def test_filters_and_summary_counts(tmp_path):
+    with _make_client(tmp_path) as client:
+        _seed(client)
+        r = client.delete("/api/symbols/1")
+        assert r.status_code == 200
+
+        r = client.get("/api/collector/status?exchange=NYSE&errors=true")
+        assert [row["id"] for row in r.json()] == [2, 4, 8, 10]
+
+        r = client.get("/api/symbols?exchange=XETRA&limit=2")
+        assert [row["id"] for row in r.json()] == [3, 5]
+        assert r.headers["X-Next-Cursor"]
+
+        r = client.get("/api/symbols?cursor=not-a-cursor")
+        assert r.status_code == 400
+
+        r = client.get("/api/collector/summary")
+        assert r.json() == {
+            "total": 9,
+            "active": 9,
+            "inactive": 0,
+            "failing": 6,
+            "by_exchange": {"NYSE": 5, "XETRA": 4},
+        }
+
+        r = client.get("/?sort=failures&limit=4&exchange=&active=&errors=")
+        assert r.status_code == 200
+        assert "Next page" in r.text
@@ -0,0 +1,93 @@
+import importlib
+import json
+import os
+import sqlite3
+import sys
+from datetime import UTC, datetime
+from pathlib import Path
+
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _reload(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "load.db")
+    for module_name in ("app.db", "app.models"):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+
+@pytest.mark.skipif(
+    os.getenv("RUN_LOAD_TEST") != "1",
+    reason="set RUN_LOAD_TEST=1 to run (starts uvicorn and a writer process)",
+)
+def test_load_test_reports_comparable_percentiles(tmp_path):
+    _reload(tmp_path)
+    from app.loadtest import LoadTestConfig, compare, format_report, run_load_test
+
+    config = LoadTestConfig(
+        db_path=str(tmp_path / "load.db"),
+        symbols=40,
+        history_days=2,
+        clients=4,
+        duration_seconds=1.0,
+        warmup_seconds=0.2,
+        writer_pause_ms=1.0,
+        label="smoke",
+    )
+    report = run_load_test(config)
+
+    assert set(report["endpoints"]) == {"symbols", "status", "summary", "dashboard", "all"}
+    total = report["endpoints"]["all"]
+    assert total["requests"] > 0
+    assert total["error_rate"] == 0.0
+    assert total["p50_ms"] <= total["p99_ms"] <= total["max_ms"]
+    assert report["writer"]["writes"] > 0
+
+    # Reports are plain JSON and can be compared with an earlier run.
+    baseline = json.loads(json.dumps(report))
+    assert len(compare(report, baseline)) == 5
+    assert "+0.0%" in compare(report, baseline)[0]
+    assert format_report(report)[0].startswith("endpoint")
+
+
+def test_seed_and_lock_timeouts_surface_as_503(monkeypatch, tmp_path):
+    _reload(tmp_path)
+    from app.loadtest import LoadTestConfig, seed_database
+
+    now = datetime(2025, 1, 10, tzinfo=UTC)
+    config = LoadTestConfig(db_path=str(tmp_path / "load.db"), symbols=16, history_days=1)
+    assert seed_database(config, now=now) == 16 * 24
+
+    # Seeding another path leaves the database app.db is bound to alone.
+    other = LoadTestConfig(db_path=str(tmp_path / "other.db"), symbols=2, history_days=1)
+    assert seed_database(other, now=now) == 2 * 24
+    with sqlite3.connect(other.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM symbols").fetchone() == (2,)
+
+    for module_name in ("app.services.runlog", "app.services.collector", "app.main"):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+    from fastapi.testclient import TestClient
+    from sqlalchemy.exc import OperationalError
+
+    import app.main
+    from app.main import app as fastapi_app
+
+    with TestClient(fastapi_app) as client:
+        summary = client.get("/api/collector/summary").json()
+        assert summary["total"] == 16
+        assert len(summary["by_exchange"]) == 8
+        assert client.get("/api/collector/status?errors=true").json()
+
+        def locked(*args, **kwargs):
+            raise OperationalError("SELECT 1", {}, Exception("database is locked"))
+
+        monkeypatch.setattr(app.main, "status_counts", locked)
+        r = client.get("/api/collector/summary")
+        assert r.status_code == 503
+        assert r.headers["Retry-After"] == "1"
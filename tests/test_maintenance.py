@@ -0,0 +1,147 @@
+import importlib
+import os
+import sqlite3
+import sys
+import threading
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _make_client(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+    os.environ["SNAPSHOT_DIR"] = str(tmp_path / "snapshots")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.runlog",
+        "app.services.collector",
+        "app.services.maintenance",
+        "app.main",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+def _insert_candles(db, symbol_id, n, offset=0):
+    from sqlalchemy import insert
+
+    from app.models import Candle
+
+    base = datetime(2025, 1, 1, tzinfo=UTC)
+    db.execute(
+        insert(Candle),
+        [
+            {
+                "symbol_id": symbol_id,
+                "interval": "1h",
+                "ts_utc": base + timedelta(hours=offset + i),
+                "open": 1.0,
+                "high": 1.0,
+                "low": 1.0,
+                "close": 1.0,
+                "volume": 1.0,
+            }
+            for i in range(n)
+        ],
+    )
+    db.commit()
+
+
+def test_snapshot_completes_while_collector_writes(tmp_path):
+    with _make_client(tmp_path) as client:
+        from app.db import SessionLocal
+        from app.models import Symbol
+        from app.services.maintenance import create_snapshot
+
+        db = SessionLocal()
+        symbol = Symbol(symbol="AAPL", is_active=True)
+        db.add(symbol)
+        db.commit()
+        _insert_candles(db, symbol.id, 5000)
+
+        stop = threading.Event()
+        written = []
+
+        def writer():
+            session = SessionLocal()
+            offset = 5000
+            while not stop.is_set():
+                _insert_candles(session, symbol.id, 10, offset)
+                offset += 10
+                written.append(offset)
+            session.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            results = [
+                create_snapshot(pages_per_step=32, step_sleep_seconds=0.001, keep=2)
+                for _ in range(3)
+            ]
+        finally:
+            stop.set()
+            thread.join()
+            db.close()
+
+        assert written, "writer made no progress during the snapshot"
+        result = results[-1]
+        assert result.steps > 1
+        assert result.bytes == result.pages * 4096
+        assert result.bytes_per_second > 0
+
+        snapshots = sorted((tmp_path / "snapshots").iterdir())
+        assert [p.name for p in snapshots] == sorted(Path(r.path).name for r in results[1:])
+        copy = sqlite3.connect(result.path)
+        try:
+            assert copy.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+            assert 5000 <= copy.execute("SELECT count(*) FROM candles").fetchone()[0]
+        finally:
+            copy.close()
+
+        r = client.post("/api/maintenance/snapshot")
+        assert r.status_code == 200
+        assert r.json()["bytes"] > 0
+        r = client.get("/api/maintenance/status")
+        assert r.json()["running"] is None
+        assert r.json()["last_snapshot"]["path"].startswith(str(tmp_path / "snapshots"))
+
+
+def test_optimize_frees_pages_incrementally_and_analyzes(tmp_path):
+    with _make_client(tmp_path) as client:
+        from app.db import SessionLocal, engine
+        from app.models import Candle, Symbol
+
+        db = SessionLocal()
+        try:
+            symbol = Symbol(symbol="AAPL", is_active=True)
+            db.add(symbol)
+            db.commit()
+            _insert_candles(db, symbol.id, 20000)
+            db.query(Candle).delete()
+            db.commit()
+        finally:
+            db.close()
+
+        r = client.post("/api/maintenance/optimize")
+        assert r.status_code == 200
+        payload = r.json()
+        assert payload["vacuum_supported"] is True
+        assert payload["freed_pages"] > 0
+        assert payload["freelist_pages"] == 0
+
+        with engine.connect() as conn:
+            tables = conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ).all()
+        assert tables
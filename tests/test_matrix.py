@@ -0,0 +1,141 @@
+import importlib
+import io
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _make_client(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in ("app.db", "app.models", "app.services.matrix", "app.main"):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+def _seed(closes_by_symbol_id, base):
+    from app.db import SessionLocal
+    from app.models import Candle
+
+    db = SessionLocal()
+    try:
+        for symbol_id, closes in closes_by_symbol_id.items():
+            for i, close in enumerate(closes):
+                if close is None:
+                    continue
+                db.add(
+                    Candle(
+                        symbol_id=symbol_id,
+                        interval="1h",
+                        ts_utc=base + timedelta(hours=i),
+                        open=close,
+                        high=close,
+                        low=close,
+                        close=close,
+                        volume=1.0,
+                    )
+                )
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_matrix_aligns_symbols_with_nan_for_missing_cells(tmp_path):
+    with _make_client(tmp_path) as client:
+        a = client.post("/api/symbols", json={"symbol": "AAA"}).json()["id"]
+        b = client.post("/api/symbols", json={"symbol": "BBB"}).json()["id"]
+
+        base = datetime(2025, 1, 1, tzinfo=UTC)
+        _seed({a: [10.0, 11.0, None, 12.1], b: [None, 20.0, 22.0, 24.2]}, base)
+
+        r = client.get("/api/matrix", params={"symbols": "BBB,AAA", "field": "close"})
+        assert r.status_code == 200
+        data = np.load(io.BytesIO(r.content))
+
+        assert data["symbols"].tolist() == ["BBB", "AAA"]
+        expected_ts = [int((base + timedelta(hours=i)).timestamp()) for i in range(4)]
+        assert data["timestamps"].tolist() == expected_ts
+        np.testing.assert_array_equal(
+            data["values"],
+            [[np.nan, 20.0, 22.0, 24.2], [10.0, 11.0, np.nan, 12.1]],
+        )
+
+        r = client.get(
+            "/api/matrix",
+            params={"symbols": "AAA,BBB", "field": "returns", "start": "2025-01-01T01:00:00Z"},
+        )
+        assert r.status_code == 200
+        values = np.load(io.BytesIO(r.content))["values"]
+        assert values.shape == (2, 3)
+        assert np.isnan(values[0]).all()
+        np.testing.assert_allclose(values[1, 1:], [0.1, 0.1])
+
+        r = client.get("/api/matrix", params={"symbols": "AAA,ZZZ"})
+        assert r.status_code == 404
+
+        r = client.get("/api/matrix", params={"symbols": "AAA", "field": "vwap"})
+        assert r.status_code == 400
+
+
+def test_matrix_prefers_hot_rows_over_cold_blocks(tmp_path):
+    with _make_client(tmp_path) as client:
+        from app.db import SessionLocal
+        from app.services.coldstore import compact_cold_candles
+        from app.services.matrix import build_matrix
+
+        a = client.post("/api/symbols", json={"symbol": "AAA"}).json()["id"]
+        base = datetime(2025, 1, 1, tzinfo=UTC)
+        _seed({a: [float(i) for i in range(48)]}, base)
+
+        db = SessionLocal()
+        try:
+            cutoff = datetime(2025, 2, 1, tzinfo=UTC)
+            compact_cold_candles(db, older_than=timedelta(days=0), now=cutoff)
+            # Corrections written after compaction land in the hot table.
+            _seed({a: [100.0 + i for i in range(48)]}, base)
+
+            matrix = build_matrix(db, ["AAA"], "close")
+            np.testing.assert_array_equal(matrix.values[0], [100.0 + i for i in range(48)])
+        finally:
+            db.close()
+
+
+def test_matrix_cache_is_bounded_by_bytes(monkeypatch, tmp_path):
+    with _make_client(tmp_path) as client:
+        from app.db import SessionLocal
+        from app.services import matrix
+
+        a = client.post("/api/symbols", json={"symbol": "AAA"}).json()["id"]
+        _seed({a: [float(i) for i in range(48)]}, datetime(2025, 1, 1, tzinfo=UTC))
+
+        db = SessionLocal()
+        try:
+            matrix.clear_matrix_cache()
+            size = len(matrix.get_matrix_npz(db, ["AAA"], "close"))
+            matrix.clear_matrix_cache()
+            monkeypatch.setattr(matrix, "MATRIX_CACHE_MAX_BYTES", 2 * size)
+            for field in ("open", "high", "close"):
+                matrix.get_matrix_npz(db, ["AAA"], field)
+            # The oldest payload was evicted to stay under the byte limit.
+            assert [key[1] for key in matrix._CACHE] == ["high", "close"]
+            assert matrix._CACHE_BYTES == sum(len(p) for _, p in matrix._CACHE.values())
+
+            # A payload above the limit is served but not cached.
+            monkeypatch.setattr(matrix, "MATRIX_CACHE_MAX_BYTES", size - 1)
+            matrix.get_matrix_npz(db, ["AAA"], "low")
+            assert "low" not in [key[1] for key in matrix._CACHE]
+        finally:
+            db.close()
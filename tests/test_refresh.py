@@ -0,0 +1,193 @@
+import asyncio
+import importlib
+import os
+import sys
+import time
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _make_client(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.runlog",
+        "app.services.collector",
+        "app.services.refresh",
+        "app.main",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+def test_concurrent_refreshes_coalesce_and_reuse_fresh_results(monkeypatch, tmp_path):
+    with _make_client(tmp_path) as client:
+        r = client.post("/api/symbols", json={"symbol": "AAPL"})
+        symbol_id = r.json()["id"]
+
+        from app.services.collector import Collector
+        from app.services.refresh import RefreshCoordinator
+
+        calls = {"count": 0}
+
+        def fake_ingest(db, symbol, interval, now=None):
+            calls["count"] += 1
+            time.sleep(0.05)
+            return 3
+
+        monkeypatch.setattr("app.services.refresh.ingest_symbol_interval", fake_ingest)
+        refresher = RefreshCoordinator(Collector(num_partitions=1), freshness_seconds=60)
+
+        async def run():
+            first = await asyncio.gather(*(refresher.refresh(symbol_id) for _ in range(5)))
+            again = await refresher.refresh(symbol_id)
+            return first, again
+
+        first, again = asyncio.run(run())
+
+        assert calls["count"] == 1
+        assert {r.rows_written for r in first} == {3}
+        assert again.cached is True
+        assert again.rows_written == 3
+
+
+def test_refresh_endpoints(monkeypatch, tmp_path):
+    with _make_client(tmp_path) as client:
+        a = client.post("/api/symbols", json={"symbol": "AAPL"}).json()["id"]
+        b = client.post("/api/symbols", json={"symbol": "MSFT"}).json()["id"]
+
+        def fake_ingest(db, symbol, interval, now=None):
+            if symbol.symbol == "MSFT":
+                raise RuntimeError("boom")
+            return 2
+
+        monkeypatch.setattr("app.services.refresh.ingest_symbol_interval", fake_ingest)
+
+        r = client.post(f"/api/symbols/{a}/refresh")
+        assert r.status_code == 200
+        assert r.json()["rows_written"] == 2
+        assert r.json()["cached"] is False
+
+        r = client.post(f"/api/symbols/{b}/refresh")
+        assert r.status_code == 502
+
+        r = client.post("/api/symbols/refresh", json={"symbol_ids": [a, b]})
+        assert r.status_code == 200
+        results = {item["symbol_id"]: item for item in r.json()}
+        assert results[a]["cached"] is True
+        assert "boom" in results[b]["error"]
+
+        r = client.post("/api/symbols/999/refresh")
+        assert r.status_code == 404
+
+        statuses = {s["id"]: s for s in client.get("/api/collector/status").json()}
+        assert statuses[a]["last_success_at_utc"] is not None
+        assert statuses[b]["consecutive_failures"] == 2
+
+
+def test_refresh_survives_owner_cancel_and_hands_off_leased_symbols(monkeypatch, tmp_path):
+    with _make_client(tmp_path) as client:
+        a = client.post("/api/symbols", json={"symbol": "AAPL"}).json()["id"]
+        b = client.post("/api/symbols", json={"symbol": "MSFT"}).json()["id"]
+
+        from datetime import UTC, datetime, timedelta
+
+        from app.db import SessionLocal
+        from app.models import RefreshRequest, ShardLease
+        from app.services.collector import Collector
+        from app.services.leases import acquire_leases, release_leases
+        from app.services.refresh import RefreshCoordinator
+
+        def fake_ingest(db, symbol, interval, now=None):
+            time.sleep(0.05)
+            return 1
+
+        monkeypatch.setattr("app.services.refresh.ingest_symbol_interval", fake_ingest)
+        collector = Collector(num_partitions=2)
+        refresher = RefreshCoordinator(collector, freshness_seconds=60)
+
+        async def run():
+            owner = asyncio.create_task(refresher.refresh(a))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(refresher.refresh(a))
+            await asyncio.sleep(0.01)
+            owner.cancel()
+            return await waiter
+
+        # The requester that started the fetch goes away; the other one still gets it.
+        assert asyncio.run(run()).rows_written == 1
+        # Unowned partition: fetched here without taking its lease.
+        db = SessionLocal()
+        try:
+            assert all(lease.owner is None for lease in db.query(ShardLease).all())
+        finally:
+            db.close()
+
+        # Stale results are pruned when new ones are stored.
+        refresher._freshness = refresher._freshness * 0
+        asyncio.run(refresher.refresh(b))
+        assert list(refresher._recent) == [(b, "1h")]
+
+        # The collector of this process is fetching the series already.
+        assert collector.begin_fetch(a, "1h")
+        result = asyncio.run(refresher.refresh(a))
+        assert result.conflict and "collector" in result.error
+        collector.end_fetch(a, "1h")
+
+        # Another live worker holds both partitions: the refresh is handed to it.
+        db = SessionLocal()
+        try:
+            release_leases(db, collector.state.worker_id)
+            acquire_leases(db, "other", now=datetime.now(tz=UTC), num_partitions=2)
+        finally:
+            db.close()
+        refresher._recent.clear()
+        result = asyncio.run(refresher.refresh(b))
+        assert result.queued and result.error is None and result.rows_written == 0
+
+        monkeypatch.setattr("app.main.REFRESHER", refresher)
+        r = client.post(f"/api/symbols/{a}/refresh")
+        assert r.status_code == 202 and r.json()["queued"] is True
+
+        db = SessionLocal()
+        try:
+            # No lease was taken from the owner.
+            owners = {lease.owner for lease in db.query(ShardLease).all()}
+            assert owners == {"other"}
+            assert {(q.symbol_id, q.interval) for q in db.query(RefreshRequest).all()} == {
+                (a, "1h"),
+                (b, "1h"),
+            }
+        finally:
+            db.close()
+
+        # The owner fetches queued series on its next tick, even if not due yet.
+        fetched = []
+
+        def owner_ingest(db, symbol, interval, now=None):
+            fetched.append(symbol.id)
+            return 0
+
+        monkeypatch.setattr("app.services.collector.ingest_symbol_interval", owner_ingest)
+        owner = Collector(worker_id="other", num_partitions=2)
+        later = datetime.now(tz=UTC) + timedelta(hours=1)
+        owner._next_run.update({(a, "1h"): later, (b, "1h"): later})
+        asyncio.run(owner._tick())
+        assert sorted(fetched) == [a, b]
+
+        db = SessionLocal()
+        try:
+            assert db.query(RefreshRequest).count() == 0
+        finally:
+            db.close()
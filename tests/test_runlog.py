@@ -0,0 +1,132 @@
+import asyncio
+import importlib
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def _make_client(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.runlog",
+        "app.services.collector",
+        "app.main",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+def test_collector_fetches_are_logged_and_queryable(monkeypatch, tmp_path):
+    with _make_client(tmp_path) as client:
+        from app.services.collector import Collector
+        from app.services.runlog import RUN_LOG
+
+        client.post("/api/symbols", json={"symbol": "AAPL", "exchange": "NASDAQ"})
+        client.post("/api/symbols", json={"symbol": "SAP", "exchange": "XETRA"})
+
+        def fake_ingest(db, symbol, interval, now=None):
+            if symbol.symbol == "SAP":
+                raise RuntimeError("boom")
+            return 5
+
+        monkeypatch.setattr("app.services.collector.ingest_symbol_interval", fake_ingest)
+        asyncio.run(Collector(num_partitions=1)._tick())
+
+        # Nothing is written until the buffer is flushed.
+        assert client.get("/api/collector/runs").json() == []
+        assert RUN_LOG.flush() == 2
+
+        runs = client.get("/api/collector/runs").json()
+        assert [(r["exchange"], r["outcome"], r["rows_written"]) for r in runs] == [
+            ("XETRA", "failure", 0),
+            ("NASDAQ", "success", 5),
+        ]
+        assert runs[0]["error"] == "boom"
+        assert all(r["source"] == "collector" and r["duration_ms"] >= 0 for r in runs)
+
+        r = client.get("/api/collector/runs?outcome=success&limit=1")
+        assert [run["exchange"] for run in r.json()] == ["NASDAQ"]
+        r = client.get(f"/api/collector/runs?cursor={r.headers['X-Next-Cursor']}")
+        assert r.json() == []
+
+
+def test_compaction_rolls_up_expired_runs_per_hour_and_exchange(tmp_path):
+    with _make_client(tmp_path) as client:
+        from app.db import SessionLocal
+        from app.models import CollectorRun, CollectorRunHourly
+        from app.services.runlog import RUN_LOG, compact_runs
+
+        now = datetime(2025, 3, 10, 12, 30, tzinfo=UTC)
+        old = now - timedelta(days=10)
+
+        def record(started, exchange, duration_ms, error=None):
+            RUN_LOG.record(
+                symbol_id=1,
+                exchange=exchange,
+                interval="1h",
+                source="collector",
+                started_at_utc=started,
+                duration_ms=duration_ms,
+                rows_written=2,
+                error=error,
+            )
+
+        record(old.replace(minute=5), "NYSE", 100.0)
+        record(old.replace(minute=50), "NYSE", 300.0, error=RuntimeError("x"))
+        record(old.replace(minute=55), None, 50.0)
+        record(now - timedelta(hours=1), "NYSE", 10.0)
+        RUN_LOG.flush()
+
+        db = SessionLocal()
+        try:
+            assert compact_runs(db, now=now, retention=timedelta(days=7)) == 3
+            assert db.query(CollectorRun).count() == 1
+
+            # A late flush into an already compacted hour is added to its rollup.
+            record(old.replace(minute=59), "NYSE", 500.0)
+            RUN_LOG.flush()
+            assert compact_runs(db, now=now, retention=timedelta(days=7)) == 1
+
+            rollups = {r.exchange: r for r in db.query(CollectorRunHourly)}
+        finally:
+            db.close()
+
+        nyse = rollups["NYSE"]
+        assert (nyse.runs, nyse.failures, nyse.rows_written) == (3, 1, 6)
+        assert nyse.total_duration_ms == 900.0
+        assert nyse.max_duration_ms == 500.0
+        assert rollups[""].runs == 1
+
+        r = client.get("/api/collector/runs/stats?bucket=day&exchange=NYSE")
+        assert r.status_code == 200
+        stats = r.json()
+        assert [(s["bucket_start_utc"][:10], s["runs"], s["failures"]) for s in stats] == [
+            ("2025-02-28", 3, 1),
+            ("2025-03-10", 1, 0),
+        ]
+        assert stats[0]["avg_duration_ms"] == 300.0
+
+        r = client.get(
+            "/api/collector/runs/stats",
+            params={
+                "start": (old - timedelta(hours=2)).isoformat(),
+                "end": old.replace(minute=0).isoformat(),
+            },
+        )
+        assert r.json() == []
+
+        assert client.get("/api/collector/runs/stats?bucket=week").status_code == 400
@@ -0,0 +1,221 @@
+import asyncio
+import importlib
+import os
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+NOW = datetime(2025, 3, 10, 15, 20, tzinfo=UTC)
+NY = ZoneInfo("America/New_York")
+
+
+def _make_client(tmp_path):
+    os.environ["DB_PATH"] = str(tmp_path / "test.db")
+
+    for module_name in (
+        "app.db",
+        "app.models",
+        "app.services.runlog",
+        "app.services.collector",
+        "app.main",
+    ):
+        if module_name in sys.modules:
+            importlib.reload(sys.modules[module_name])
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+def test_fair_order_interleaves_exchanges_by_weight_and_deadline():
+    from app.models import Symbol
+    from app.services.scheduling import WorkItem, fair_order, parse_exchange_weights
+
+    def item(symbol_id, exchange, hours_ago):
+        symbol = Symbol(id=symbol_id, symbol=f"S{symbol_id}", exchange=exchange)
+        return WorkItem(symbol=symbol, interval="1h", deadline=NOW - timedelta(hours=hours_ago))
+
+    items = [
+        *(item(i, "NYSE", 1) for i in range(1, 9)),
+        item(9, "XETRA", 1),
+        item(10, "XETRA", 5),  # added later but stalest: first within XETRA
+        item(11, "XETRA", 1),
+        item(12, "NYSE", -1),  # next candle not available yet
+    ]
+    weights = parse_exchange_weights("NYSE=2, XETRA=1")
+    ordered = fair_order(items, now=NOW, weights=weights)
+
+    ids = [i.symbol.id for i in ordered]
+    assert ids[-1] == 12
+    # XETRA does not wait behind all of NYSE: it gets a third of the slots.
+    assert [i.exchange for i in ordered[:6]].count("XETRA") == 2
+    assert [i.symbol.id for i in ordered if i.exchange == "XETRA"] == [10, 9, 11]
+    assert [i.symbol.id for i in ordered if i.exchange == "NYSE"][:8] == list(range(1, 9))
+
+    # Per-exchange cost also counts: a slow exchange gets fewer items per tick.
+    ordered = fair_order(items, now=NOW, weights={}, costs={"NYSE": 3.0, "XETRA": 1.0})
+    assert [i.exchange for i in ordered[:4]] == ["XETRA", "XETRA", "NYSE", "XETRA"]
+
+
+def test_tick_budget_defers_work_and_lag_is_exported(monkeypatch, tmp_path):
+    with _make_client(tmp_path) as client:
+        import app.main
+        from app.db import SessionLocal
+        from app.models import Candle, Symbol
+        from app.services.collector import Collector
+        from app.services.ingest import upsert_candles
+
+        last_full_hour = datetime.now(tz=UTC).replace(minute=0, second=0, microsecond=0)
+        db = SessionLocal()
+        try:
+            symbols = [Symbol(symbol=f"US{i}", exchange="NYSE", is_active=True) for i in range(6)]
+            symbols.append(Symbol(symbol="DE0", exchange="XETRA", is_active=True))
+            db.add_all(symbols)
+            db.commit()
+            for age, symbol in enumerate(symbols):
+                db.add(
+                    Candle(
+                        symbol_id=symbol.id,
+                        interval="1h",
+                        ts_utc=last_full_hour - timedelta(hours=3 + age % 2),
+                        open=1.0,
+                        high=1.0,
+                        low=1.0,
+                        close=1.0,
+                        volume=1.0,
+                    )
+                )
+            db.commit()
+        finally:
+            db.close()
+
+        order = []
+
+        def fake_ingest(db, symbol, interval, now=None):
+            order.append(symbol.symbol)
+            rows = [
+                {
+                    "ts_utc": last_full_hour - timedelta(hours=h),
+                    "open": 2.0,
+                    "high": 2.0,
+                    "low": 2.0,
+                    "close": 2.0,
+                    "volume": 2.0,
+                }
+                for h in (2, 1)
+            ]
+            return upsert_candles(db, symbol, interval, rows)
+
+        class ThreeItemBudget:
+            def __init__(self, seconds):
+                self.left = 3 if seconds else None
+
+            def exhausted(self):
+                if self.left is None:
+                    return False
+                self.left -= 1
+                return self.left < 0
+
+        monkeypatch.setattr("app.services.collector.ingest_symbol_interval", fake_ingest)
+        monkeypatch.setattr("app.services.collector.TickBudget", ThreeItemBudget)
+        collector = Collector(num_partitions=1, tick_budget_seconds=30)
+        monkeypatch.setattr(app.main, "COLLECTOR", collector)
+
+        asyncio.run(collector._tick())
+        # Stalest first within NYSE; XETRA is not stuck behind every NYSE symbol.
+        assert order == ["US1", "DE0", "US3"]
+
+        lag = {row["exchange"]: row for row in client.get("/api/collector/lag").json()}
+        assert lag["NYSE"]["backlog"] == 4
+        assert lag["XETRA"]["samples"] == 1
+        # The first new candle (2h before the last full hour) closed 1h before it.
+        assert lag["XETRA"]["p99_seconds"] >= 3600
+        assert lag["NYSE"]["samples"] == 2
+
+        collector._tick_budget_seconds = None
+        asyncio.run(collector._tick())
+        assert sorted(order) == ["DE0", *(f"US{i}" for i in range(6))]
+        lag = {row["exchange"]: row for row in client.get("/api/collector/lag").json()}
+        assert lag["NYSE"]["backlog"] == 0
+        assert lag["NYSE"]["samples"] == 6
+
+
+def test_idle_series_wait_for_their_next_session(tmp_path):
+    with _make_client(tmp_path):
+        from app.db import SessionLocal
+        from app.models import Candle, Symbol
+        from app.services.collector import Collector
+        from app.services.scheduling import WorkItem, idle_until
+
+        db = SessionLocal()
+        try:
+            closed = Symbol(
+                symbol="AAPL", exchange="NYSE", timezone="America/New_York", is_active=True
+            )
+            live = Symbol(symbol="BTC", exchange="CCC", is_active=True)
+            db.add_all([closed, live])
+            db.commit()
+            # Two weeks of regular sessions up to Friday 2025-03-14 15:30 New York.
+            day = datetime(2025, 3, 3)
+            while day <= datetime(2025, 3, 14):
+                if day.weekday() < 5:
+                    for hour in range(9, 16):
+                        ts = datetime(day.year, day.month, day.day, hour, 30, tzinfo=NY)
+                        db.add(
+                            Candle(
+                                symbol_id=closed.id,
+                                interval="1h",
+                                ts_utc=ts.astimezone(UTC),
+                                open=1.0,
+                                high=1.0,
+                                low=1.0,
+                                close=1.0,
+                                volume=1.0,
+                            )
+                        )
+                day += timedelta(days=1)
+            db.commit()
+            last_ts = datetime(2025, 3, 14, 15, 30, tzinfo=NY)
+            monday_open = datetime(2025, 3, 17, 9, 30, tzinfo=NY)
+
+            # Over the weekend: the first Monday candle, once it has closed.
+            friday_evening = datetime(2025, 3, 14, 17, 0, tzinfo=NY)
+            until = idle_until(db, closed, "1h", last_ts, now=friday_evening, idle_runs=1)
+            assert until == monday_open + timedelta(hours=1)
+
+            # In session without new candles (halted): back off, up to the cap.
+            monday_noon = datetime(2025, 3, 17, 12, 0, tzinfo=NY)
+            for runs, hours in ((1, 1), (3, 4), (10, 6)):
+                until = idle_until(db, closed, "1h", last_ts, now=monday_noon, idle_runs=runs)
+                assert until == monday_noon + timedelta(hours=hours)
+
+            # No session known: plain backoff.
+            assert idle_until(db, live, "1h", None, now=monday_noon, idle_runs=2) == (
+                monday_noon + timedelta(hours=2)
+            )
+
+            collector = Collector(num_partitions=1)
+            now = friday_evening.astimezone(UTC)
+            assert [i.symbol.id for i in collector._schedule(db, [closed], now)] == [closed.id]
+            item = WorkItem(symbol=closed, interval="1h", deadline=now)
+            collector._after_run(db, item, 0.1, 0, now=now)
+            # Not fetched again before Monday...
+            assert collector._schedule(db, [closed], now + timedelta(hours=12)) == []
+            # ...and then it is not the most overdue series either.
+            later = monday_open + timedelta(hours=1, minutes=5)
+            (scheduled,) = collector._schedule(db, [closed], later)
+            assert scheduled.deadline == monday_open + timedelta(hours=1)
+
+            # A failed fetch is retried on the regular schedule.
+            collector = Collector(num_partitions=1)
+            collector._after_run(db, item, 0.1, 0, now=now, failed=True)
+            assert collector._schedule(db, [closed], now + timedelta(hours=1))
+        finally:
+            db.close()
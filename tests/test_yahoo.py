@@ -0,0 +1,68 @@
+import logging
+import sys
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+START = datetime(2025, 3, 3, 14, 30, tzinfo=UTC)
+
+
+def _frame():
+    # Exchange-local timestamps, as yfinance returns for intraday bars.
+    index = pd.date_range(START, periods=2, freq="h").tz_convert("America/New_York")
+    columns = pd.MultiIndex.from_product(
+        [["Open", "High", "Low", "Close", "Adj Close", "Volume"], ["AAPL"]],
+        names=["Price", "Ticker"],
+    )
+    return pd.DataFrame([[1.0, 2.0, 0.5, 1.5, 1.5, 100.0]] * 2, index=index, columns=columns)
+
+
+def _fake_download(frame, error=None, failed="AAPL"):
+    def download(tickers, **kwargs):
+        if error is not None:
+            # How yf.download reports failed tickers: logged, not raised.
+            logging.getLogger("yfinance").error("['%s']: %s", failed, error)
+        return frame
+
+    return download
+
+
+@pytest.mark.parametrize("raise_errors", [False, True])
+def test_fetch_candles_uses_one_download_path(monkeypatch, raise_errors):
+    from app.services import yahoo
+
+    monkeypatch.setattr(yahoo.yf, "download", _fake_download(_frame()))
+    rows = yahoo.fetch_candles(
+        "AAPL", "1h", START, START + timedelta(days=1), raise_errors=raise_errors
+    )
+
+    assert [r["ts_utc"] for r in rows] == [START, START + timedelta(hours=1)]
+    assert rows[0]["close"] == 1.5 and rows[0]["volume"] == 100.0
+
+
+def test_fetch_candles_raises_download_errors_only_on_request(monkeypatch):
+    from app.services import yahoo
+
+    end = START + timedelta(days=1)
+    error = "ConnectionError('network down')"
+    monkeypatch.setattr(yahoo.yf, "download", _fake_download(pd.DataFrame(), error))
+
+    assert yahoo.fetch_candles("AAPL", "1h", START, end) == []
+    with pytest.raises(RuntimeError, match="network down"):
+        yahoo.fetch_candles("AAPL", "1h", START, end, raise_errors=True)
+
+    # A range Yahoo has no prices for is empty, not a failure.
+    missing = "YFPricesMissingError('$AAPL: possibly delisted; no price data found')"
+    monkeypatch.setattr(yahoo.yf, "download", _fake_download(pd.DataFrame(), missing))
+    assert yahoo.fetch_candles("AAPL", "1h", START, end, raise_errors=True) == []
+
+    # Errors logged for other tickers do not count.
+    monkeypatch.setattr(yahoo.yf, "download", _fake_download(pd.DataFrame(), error, "AAPL"))
+    assert yahoo.fetch_candles("MSFT", "1h", START, end, raise_errors=True) == []